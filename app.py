@@ -1,13 +1,20 @@
 import streamlit as st
-from src.sheets_handler import SheetsHandler
+from src.sheets_handler import get_sheets_handler
+from src.sheets_client import SheetsClientPool
 from src.ai_generator import AIGenerator
+from src.response_cache import ResponseCache
+from src.translation_memory import TranslationMemory
+from src.llm_metrics import LLMMetrics
+from src.model_router import ModelRouter
 from src.auth_manager import AuthManager
 from src.automation import MJAutomation, VrewAutomation
 from src.config import Config
 from src.draft_manager import DraftManager
 import os
 import pyperclip
+import socket
 import time
+import uuid
 
 st.set_page_config(
     page_title="ArcSmith | Production Console",
@@ -46,7 +53,61 @@ if "current_page" not in st.session_state:
 if "selected_model" not in st.session_state:
     st.session_state.selected_model = "gemini-3-flash-preview"
 
+if "ai_cache_enabled" not in st.session_state:
+    st.session_state.ai_cache_enabled = Config.AI_CACHE_ENABLED
+
+# 表示中のシーンだけを翻訳する（生成時には翻訳しない）
+if "lazy_translation" not in st.session_state:
+    st.session_state.lazy_translation = Config.TRANSLATION_LAZY
+
+# 用途ごとのモデルの振り分け（空欄は「AI Generation Model」と同じモデル）
+if "routing_enabled" not in st.session_state:
+    st.session_state.routing_enabled = Config.AI_ROUTING_ENABLED
+    st.session_state.model_ideas = Config.AI_MODEL_IDEAS
+    st.session_state.model_script = Config.AI_MODEL_SCRIPT
+    st.session_state.fallback_models = [m.strip() for m in Config.AI_FALLBACK_MODELS.split(",") if m.strip()]
+
+# 制作キューの行をリースで確保する際のワーカーID（ブラウザセッションごと）
+if "worker_id" not in st.session_state:
+    st.session_state.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
 # AIGeneratorへのプロンプト同期
+def get_model_router():
+    """System Config の設定から ModelRouter を作る（振り分けが無効なら None）"""
+    if not st.session_state.routing_enabled:
+        return None
+    default_model = st.session_state.selected_model
+    return ModelRouter(
+        task_models={
+            "ideas": st.session_state.model_ideas or default_model,
+            "script": st.session_state.model_script or default_model,
+        },
+        fallback_models=st.session_state.fallback_models,
+    )
+
+def translate_scenes(vrew_script, script_jp_list, indices):
+    """
+    指定したシーン（0始まり）のうち未翻訳の行だけをまとめて翻訳し、script_jp_list に書き込む
+    Returns:
+        int: 新しく翻訳できた行数
+    """
+    missing = [i for i in indices if i < len(vrew_script) and vrew_script[i].strip() and not script_jp_list[i]]
+    if not missing:
+        return 0
+    from src.deepl_translator import DeepLTranslator, PartialTranslationError
+    try:
+        translated = DeepLTranslator().translate_batch([vrew_script[i].strip() for i in missing])
+    except PartialTranslationError as e:
+        # 翻訳できた行だけ書き込む（失敗した行は空欄のままにして、次に表示したときに再送する）
+        translated = e.results
+        st.warning(f"一部のシーンを翻訳できませんでした: {e}")
+    except Exception as e:
+        st.error(f"オンデマンド翻訳エラー: {e}")
+        return 0
+    for i, text in zip(missing, translated):
+        script_jp_list[i] = text
+    return sum(1 for text in translated if text)
+
 def get_persona_str():
     p = st.session_state.persona_prompts
     return f"1. **{p['marketer']}**\n2. **{p['writer']}**\n3. **{p['director']}**"
@@ -217,18 +278,25 @@ if st.session_state.current_page == "Production Console":
             with status_box:
                 try:
                     st.write("👥 エキスパートを召喚中...")
-                    handler = SheetsHandler()
-                    existing = handler.get_all_titles()
+                    handler = get_sheets_handler()
+                    # 直近のネタはシート上のものから選び、アーカイブ済みのタイトルは重複判定にだけ使う
+                    all_titles = handler.get_all_titles()
+                    existing = handler.get_all_titles(include_archived=False)
+                    archived = all_titles[len(existing):]
                     
                     st.write("📊 トレンドと既存コンテンツを分析中...")
-                    ai = AIGenerator(model_name=st.session_state.selected_model)
+                    ai = AIGenerator(model_name=st.session_state.selected_model, use_cache=st.session_state.ai_cache_enabled, router=get_model_router())
                     
                     st.write("💡 新しい概念を鍛造（フォージ）中...")
                     persona_str = get_persona_str()
                     # 詳細設定を考慮して企画案を出す（タイトル等が入力されていればそれを反映）
                     # Note: ctx_title, ctx_hook, ctx_outline are defined later, so they will be empty here if not manually set.
                     # This is fine as the AI generation logic doesn't strictly depend on them for initial ideas.
-                    ideas_data, full_response = ai.generate_new_ideas(existing, expert_persona=persona_str)
+                    ideas_data, full_response = ai.generate_new_ideas(
+                        existing, expert_persona=persona_str,
+                        force_regenerate=st.session_state.get("force_ideas", False),
+                        archived_titles=archived,
+                    )
                     
                     st.session_state.new_ideas = list(ideas_data.keys())
                     st.session_state.all_ideas_data = ideas_data
@@ -240,6 +308,8 @@ if st.session_state.current_page == "Production Console":
                 except Exception as e:
                     status_box.update(label="❌ エラーが発生しました", state="error")
                     st.error(f"Error: {e}")
+        if st.session_state.ai_cache_enabled:
+            st.checkbox("🔁 キャッシュを使わず新しく生成", key="force_ideas", help="同じ条件での前回の提案を再利用せず、AIに新しく生成させます")
 
         st.markdown("---")
 
@@ -282,7 +352,11 @@ if st.session_state.current_page == "Production Console":
                 st.markdown(st.session_state.ideation_full)
             
             st.markdown("#### 🎯 採用するアイディアを選択")
-            selected_idea = st.radio("生成されたアイディア", st.session_state.new_ideas, label_visibility="collapsed", key="idea_selector")
+            # 既存ネタと似ているアイディアには印を付ける
+            def format_idea(idea):
+                duplicate_of = st.session_state.all_ideas_data.get(idea, {}).get("duplicate_of")
+                return f"⚠️ {idea}（類似: {duplicate_of}）" if duplicate_of else idea
+            selected_idea = st.radio("生成されたアイディア", st.session_state.new_ideas, label_visibility="collapsed", key="idea_selector", format_func=format_idea)
             
             if st.button("🚀 選択したアイディアで台本作成へ進む", use_container_width=True, type="primary"):
                 st.session_state.selected_title = selected_idea
@@ -329,24 +403,54 @@ if st.session_state.current_page == "Production Console":
         if target_title:
             mode_label = "🎬 Shorts" if current_mode == "Shorts" else "📽️ Long-form"
             st.success(f"Selected: **{target_title}** ({mode_label})")
+
+            # キャッシュを使わずに台本を作り直す
+            if st.session_state.ai_cache_enabled and not st.session_state.get("auto_script"):
+                if st.button("🔁 台本を再生成（キャッシュを使わない）", key="force_regen_script", use_container_width=True):
+                    st.session_state.auto_script = True
+                    st.session_state.force_regenerate = True
             
             # 自動生成フラグがある場合のみ実行
             if st.session_state.get("auto_script"):
-                with st.status("🖋️ 台本作成中...", expanded=True):
+                with st.status("🖋️ 台本作成中...", expanded=True) as script_status:
                     try:
-                        ai = AIGenerator(model_name=st.session_state.selected_model)
+                        ai = AIGenerator(model_name=st.session_state.selected_model, use_cache=st.session_state.ai_cache_enabled, router=get_model_router())
                         
                         # アイディアのメタデータとユーザー入力のコンテキストを統合
                         full_context = st.session_state.get("selected_metadata", {}).copy()
                         if "user_script_context" in st.session_state:
                             full_context.update(st.session_state.user_script_context)
 
-                        res = ai.generate_script_and_prompts(
+                        # 生成中の要素を届いた順に表示する
+                        title_placeholder = st.empty()
+                        scene_area = st.container()
+                        scene_placeholders = {}
+                        res = {}
+                        for kind, idx, value in ai.generate_script_and_prompts_stream(
                             target_title, 
                             context=full_context,
                             expert_persona=get_persona_str(),
-                            video_mode=current_mode
-                        )
+                            video_mode=current_mode,
+                            force_regenerate=st.session_state.pop("force_regenerate", False),
+                            translate=not st.session_state.lazy_translation
+                        ):
+                            if kind == "title_en":
+                                title_placeholder.markdown(f"**{value}**")
+                            elif kind in ("vrew_script", "script_jp", "mj_prompts"):
+                                if idx not in scene_placeholders:
+                                    with scene_area:
+                                        scene_placeholders[idx] = {"box": st.empty()}
+                                scene = scene_placeholders[idx]
+                                scene[kind] = value.get("prompt", "") if isinstance(value, dict) else value
+                                scene["box"].markdown(
+                                    f"**Scene {idx + 1}** {scene.get('vrew_script', '')}  \n"
+                                    f"<span style='color:#64748b'>{scene.get('script_jp', '')}</span>  \n"
+                                    f"<span style='color:#94a3b8; font-size:0.8rem'>{scene.get('mj_prompts', '')}</span>",
+                                    unsafe_allow_html=True
+                                )
+                                script_status.update(label=f"🖋️ 台本作成中... ({len(scene_placeholders)} シーン)")
+                            elif kind == "result":
+                                res = value
                         # 新しい構造でセッションに保存
                         st.session_state.title_en = res.get("title_en", "")
                         st.session_state.title_jp = res.get("title_jp", "")
@@ -358,6 +462,16 @@ if st.session_state.current_page == "Production Console":
                         st.session_state.mj_prompts_list = res.get("mj_prompts_list", [])
                         st.session_state.auto_script = False # 実行完了
 
+                        # 台本とプロンプトのズレを補正した場合は通知
+                        sync_report = res.get("sync_report") or {}
+                        if sync_report.get("inserted") or sync_report.get("missing") or sync_report.get("merged"):
+                            st.toast(
+                                f"🔗 シーンのズレを補正しました（余分なプロンプト {len(sync_report.get('inserted', []))} 件除外、"
+                                f"欠けたシーン {len(sync_report.get('missing', []) + sync_report.get('merged', []))} 件 → "
+                                f"{len(sync_report.get('filled', []))} 件を追加生成、信頼度 {sync_report.get('confidence', 0):.0%}）",
+                                icon="⚠️"
+                            )
+
                         # 【新規追加】生成完了直後の自動保存
                         if st.session_state.get("auto_save_enabled"):
                             try:
@@ -489,30 +603,38 @@ if st.session_state.current_page == "Production Console":
             vrew_script = st.session_state.get("current_script", "").split("\n") if st.session_state.get("current_script") else []
             
             # --- オンデマンド翻訳ロジック ---
-            # シーン数に対して翻訳が足りない場合の補完
-            if vrew_script and len(script_jp_list) < len(vrew_script):
+            # 未翻訳のシーンは空欄（""）として行数を揃えておく
+            if len(script_jp_list) < len(vrew_script):
+                script_jp_list = script_jp_list + [""] * (len(vrew_script) - len(script_jp_list))
+                st.session_state.script_jp_list = script_jp_list
+            if vrew_script and not st.session_state.lazy_translation:
+                # 全シーンを先にまとめて翻訳
                 with st.spinner("未翻訳のシーンをDeepLで翻訳中..."):
-                    try:
-                        from src.deepl_translator import DeepLTranslator
-                        translator = DeepLTranslator()
-                        # 足りない分だけ翻訳
-                        for i in range(len(script_jp_list), len(vrew_script)):
-                            line = vrew_script[i].strip()
-                            if line:
-                                script_jp_list.append(translator.translate(line))
-                            else:
-                                script_jp_list.append("")
-                        st.session_state.script_jp_list = script_jp_list
-                    except Exception as e:
-                        st.error(f"オンデマンド翻訳エラー: {e}")
+                    translate_scenes(vrew_script, script_jp_list, range(len(vrew_script)))
+
+            # シーン数が多い場合はページに分けて表示する
+            page_size = max(1, Config.SCENES_PER_PAGE)
+            page_count = max(1, -(-len(mj_list) // page_size))
+            page = 0
+            if page_count > 1:
+                page = st.selectbox(
+                    "表示するシーン",
+                    options=list(range(page_count)),
+                    format_func=lambda p: f"Scene {p * page_size + 1}–{min((p + 1) * page_size, len(mj_list))}",
+                    key="scene_page"
+                )
+            visible = range(page * page_size, min((page + 1) * page_size, len(mj_list)))
 
             if mj_list:
-                for i, prompt in enumerate(mj_list, 1):
+                for i in [n + 1 for n in visible]:
+                    prompt = mj_list[i-1]
                     # 翻訳と原文のコンテンツを作成
                     mid_html = ""
-                    if i <= len(script_jp_list):
-                        ja_text = script_jp_list[i-1]
-                        en_text = vrew_script[i-1] if i <= len(vrew_script) else ""
+                    if i <= len(vrew_script):
+                        ja_text = script_jp_list[i-1] if i <= len(script_jp_list) else ""
+                        if not ja_text and vrew_script[i-1].strip():
+                            ja_text = "<span style='color: #94a3b8;'>（翻訳中…）</span>" if st.session_state.lazy_translation else ""
+                        en_text = vrew_script[i-1]
                         mid_html = f"""
                         <div style='margin-bottom: 0.8rem; font-size: 0.9rem;'>
                             <strong>シーン{i}の翻訳:</strong><br>
@@ -534,6 +656,61 @@ if st.session_state.current_page == "Production Console":
                     # 更新された値をリストに反映
                     mj_list[i-1] = updated_prompt
                 st.session_state.mj_prompts_list = mj_list
+
+                # 表示中のページのシーンだけを翻訳し、届いた訳で描画し直す（先にプレースホルダー付きで表示済み）
+                if st.session_state.lazy_translation:
+                    with st.spinner("表示中のシーンをDeepLで翻訳中..."):
+                        translated_count = translate_scenes(vrew_script, script_jp_list, visible)
+                    if translated_count:
+                        st.session_state.script_jp_list = script_jp_list
+                        st.rerun()
+
+                # --- シーン単位の再生成（台本全体は作り直さない） ---
+                with st.expander("🔁 選択したシーンだけ再生成", expanded=False):
+                    if len(vrew_script) != len(mj_list):
+                        st.warning(f"台本の行数（{len(vrew_script)}）とプロンプト数（{len(mj_list)}）が一致していないため、部分再生成はできません。")
+                    else:
+                        regen_scenes = st.multiselect(
+                            "再生成するシーン",
+                            options=list(range(1, len(mj_list) + 1)),
+                            format_func=lambda n: f"Scene {n}",
+                            key="regen_scenes"
+                        )
+                        regen_target = st.radio(
+                            "再生成する内容",
+                            options=["both", "script", "prompt"],
+                            format_func=lambda t: {"both": "台本とプロンプト", "script": "台本のみ", "prompt": "プロンプトのみ"}[t],
+                            horizontal=True,
+                            key="regen_target"
+                        )
+                        regen_instruction = st.text_input("追加の指示（任意）", placeholder="例: もっと不穏な雰囲気に", key="regen_instruction")
+                        if st.button("🔁 選択したシーンを再生成", disabled=not regen_scenes):
+                            with st.spinner("選択したシーンを再生成中..."):
+                                try:
+                                    ai = AIGenerator(model_name=st.session_state.selected_model, use_cache=st.session_state.ai_cache_enabled, router=get_model_router())
+                                    regen = ai.regenerate_scenes(
+                                        target_title or st.session_state.get("title_en", ""),
+                                        vrew_script,
+                                        mj_list,
+                                        regen_scenes,
+                                        target=regen_target,
+                                        instruction=regen_instruction or None,
+                                        script_jp_list=script_jp_list,
+                                        video_mode=current_mode
+                                    )
+                                except Exception as e:
+                                    regen = {"error": str(e)}
+                            if regen.get("error"):
+                                st.error(f"再生成エラー: {regen['error']}")
+                            else:
+                                st.session_state.current_script = "\n".join(regen["script_lines"])
+                                st.session_state.mj_prompts_list = regen["mj_prompts_list"]
+                                st.session_state.script_jp_list = regen["script_jp_list"]
+                                # テキストエリアはキーの値が優先されるため、変更分を直接書き換える
+                                st.session_state["area_vrew_script"] = st.session_state.current_script
+                                for n in regen["changed_scenes"]:
+                                    st.session_state[f"area_mj_scene_{n}"] = regen["mj_prompts_list"][n - 1]
+                                st.rerun()
             else:
                 st.info("Midjourneyプロンプトが生成されていません。")
             
@@ -645,26 +822,17 @@ if st.session_state.current_page == "Production Console":
             if st.button("Finalize & Publish to Production", key="publish_to_prod", use_container_width=True):
                 with st.spinner("Publishing to Sheets..."):
                     try:
-                        handler = SheetsHandler()
-                        
-                        # 重複チェック: A列（タイトル）をすべて取得
-                        existing_titles = handler.get_all_titles()
-                        
-                        # 既にある場合は、新規追加（append）せずに、その行のインデックスを取得
-                        if target_title in existing_titles:
-                            # 1-indexed (Header is 1, data starts from 2)
-                            new_row_idx = existing_titles.index(target_title) + 2
-                            st.info(f"Existing title found at row {new_row_idx}. Updating existing record.")
-                        else:
-                            # A列に新しい行として追加し、同時にB,C列を書き込む
-                            handler.append_new_titles([target_title])
-                            # 今追加した行のインデックスを取得（最後尾）
-                            all_titles_after = handler.worksheet.col_values(1)
-                            new_row_idx = len(all_titles_after)
+                        handler = get_sheets_handler()
                         
                         # プロンプトを連結して保存
                         combined_prompts = "\n\n".join(st.session_state.mj_prompts_list)
-                        handler.update_row_data(new_row_idx, st.session_state.current_script, combined_prompts)
+                        
+                        # 既にあるタイトルはその行を更新し、無ければ新しい行として追加（A〜C列を一度に書き込む）
+                        new_row_idx, created = handler.upsert_title_row(
+                            target_title, st.session_state.current_script, combined_prompts
+                        )
+                        if not created:
+                            st.info(f"Existing title found at row {new_row_idx}. Updating existing record.")
                         
                         st.success("Published! Moving to Production...")
                         # データをクリアしてMode Cへ移動
@@ -837,8 +1005,11 @@ if st.session_state.current_page == "Production Console":
             if st.button("✅ Finish & Mark as Complete", key="mark_final", use_container_width=True):
                 with st.spinner("シートを更新中..."):
                     try:
-                        handler = SheetsHandler()
+                        handler = get_sheets_handler()
                         handler.mark_as_completed(st.session_state.prod_row)
+                        handler.release_lease(st.session_state.prod_row, st.session_state.worker_id)
+                        # 自動アーカイブ（SHEETS_ARCHIVE_AFTER_DAYS 設定時のみ、1日1回まで）
+                        handler.maybe_auto_archive()
                         st.snow()
                         st.toast(f"Completed: {st.session_state.prod_title}", icon="🎊")
                         
@@ -861,8 +1032,9 @@ if st.session_state.current_page == "Production Console":
             if st.button("📥 Load Next from Sheets Queue", use_container_width=True):
                 with st.spinner("Fetching data from Google Sheets..."):
                     try:
-                        handler = SheetsHandler()
-                        row_idx, row_data = handler.get_unprocessed_row()
+                        handler = get_sheets_handler()
+                        # 他のワーカーと同じ行を取らないようにリース付きで確保
+                        row_idx, row_data = handler.claim_next_row(st.session_state.worker_id)
                         if row_idx and len(row_data) >= 3:
                             st.session_state.production_ready = True
                             st.session_state.prod_title = row_data[0]
@@ -876,6 +1048,42 @@ if st.session_state.current_page == "Production Console":
                     except Exception as e:
                         st.error(f"Queue Loading Error: {e}")
 
+            # 台本が未作成の行（A列のみ）をまとめて生成し、B列・C列に書き戻す
+            with st.expander("📦 キューの台本をまとめて生成", expanded=False):
+                batch_count = st.number_input("対象にする未処理行の数", min_value=1, max_value=50, value=10, step=1)
+                batch_workers = st.slider("同時実行数", min_value=1, max_value=10, value=Config.AI_BATCH_MAX_WORKERS)
+                if st.button("🚀 バッチ生成を開始", use_container_width=True):
+                    try:
+                        handler = get_sheets_handler()
+                        rows = [(row_idx, row) for row_idx, row in handler.get_unprocessed_rows(int(batch_count)) if not row[1]]
+                        if not rows:
+                            st.info("台本が未作成の行はありません。")
+                        else:
+                            ai = AIGenerator(model_name=st.session_state.selected_model, use_cache=st.session_state.ai_cache_enabled, router=get_model_router())
+                            jobs = [{"title": row[0], "row": row_idx} for row_idx, row in rows]
+                            progress = st.progress(0.0, text=f"0 / {len(jobs)}")
+                            completed, updates = 0, []
+                            for item in ai.generate_scripts_batch(
+                                jobs,
+                                expert_persona=get_persona_str(),
+                                video_mode=st.session_state.get("video_mode", "Shorts"),
+                                max_workers=int(batch_workers)
+                            ):
+                                completed += 1
+                                progress.progress(completed / len(jobs), text=f"{completed} / {len(jobs)}")
+                                title = item["job"]["title"]
+                                if item["error"]:
+                                    st.error(f"❌ {title}: {item['error'][:200]}")
+                                    continue
+                                res = item["result"]
+                                updates.append((item["job"]["row"], res["vrew_script"], "\n\n".join(res["mj_prompts_list"])))
+                                st.write(f"✅ {title} ({item['elapsed']:.1f}s)")
+                            if updates:
+                                handler.update_rows_data(updates)
+                                st.success(f"{len(updates)} 行の台本をシートに書き込みました。")
+                    except Exception as e:
+                        st.error(f"Batch Generation Error: {e}")
+
 
 elif st.session_state.current_page == "📋 Draft List":
     st.markdown('<p style="font-size: 0.8rem; color: #64748b; margin-bottom: 2rem;">Production Hub > Draft List</p>', unsafe_allow_html=True)
@@ -1074,9 +1282,139 @@ elif st.session_state.current_page == "⚙️ System Configuration":
         index=2 if st.session_state.selected_model == "gemini-3-flash-preview" else (1 if st.session_state.selected_model == "gemini-2.5-pro" else 0),
         help="生成に使用するGeminiモデルを選択します。gemini-3-flash-previewが最新のプレビューモデルです。"
     )
+
+    st.session_state.routing_enabled = st.toggle(
+        "用途ごとにモデルを振り分ける",
+        value=st.session_state.routing_enabled,
+        help="企画・台本で別のモデルを使い、応答が遅い・エラーが続くモデルは代替モデルへ自動で切り替えます。"
+    )
+    if st.session_state.routing_enabled:
+        model_options = ["", "gemini-2.5-flash", "gemini-2.5-pro", "gemini-3-flash-preview"]
+        col_ideas, col_script = st.columns(2)
+        st.session_state.model_ideas = col_ideas.selectbox(
+            "企画（Mode A）のモデル", model_options,
+            index=model_options.index(st.session_state.model_ideas) if st.session_state.model_ideas in model_options else 0,
+            format_func=lambda m: m or "（AI Generation Model と同じ）"
+        )
+        st.session_state.model_script = col_script.selectbox(
+            "台本（Mode B）のモデル", model_options,
+            index=model_options.index(st.session_state.model_script) if st.session_state.model_script in model_options else 0,
+            format_func=lambda m: m or "（AI Generation Model と同じ）"
+        )
+        st.session_state.fallback_models = st.multiselect(
+            "代替モデル（上から順に使用）", model_options[1:],
+            default=[m for m in st.session_state.fallback_models if m in model_options],
+            help=f"応答が予算（企画 {Config.AI_LATENCY_BUDGET_IDEAS:.0f}秒 / 台本 {Config.AI_LATENCY_BUDGET_SCRIPT:.0f}秒）を超えたら並行して呼び、エラー時は切り替えます。"
+        )
+        router = get_model_router()
+        health_rows = []
+        for task in ("ideas", "script"):
+            models, demoted = router.candidates(task, st.session_state.selected_model)
+            for model in models:
+                health = router.health(model, task).snapshot()
+                health_rows.append({
+                    "task": task,
+                    "model": model,
+                    "calls": health["calls"],
+                    "error rate": round(health["error_rate"], 2) if health["error_rate"] is not None else None,
+                    "p95 latency (s)": round(health["p95_latency"], 2) if health["p95_latency"] is not None else None,
+                    "status": demoted.get(model, "ok"),
+                })
+        st.dataframe(health_rows, use_container_width=True, hide_index=True)
+
+    st.session_state.ai_cache_enabled = st.toggle(
+        "レスポンスキャッシュを使う",
+        value=st.session_state.ai_cache_enabled,
+        help="同じプロンプト・モデル・生成設定での結果をローカルに保存し、再実行時はGeminiを呼ばずに即座に返します。"
+    )
+    if st.session_state.ai_cache_enabled:
+        cache = ResponseCache()
+        cache_stats = cache.stats()
+        col_hit, col_rate, col_size = st.columns(3)
+        col_hit.metric("Cache Hits", cache_stats["hits"], help=f"Misses: {cache_stats['misses']}")
+        col_rate.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        col_size.metric("Entries", cache_stats["entries"], help=f"{cache_stats['bytes'] / 1024:.1f} KiB")
+        if st.button("🧹 キャッシュをクリア", use_container_width=True):
+            cache.clear()
+            st.success("レスポンスキャッシュをクリアしました。")
+
+    st.session_state.lazy_translation = st.toggle(
+        "表示中のシーンだけ翻訳する",
+        value=st.session_state.lazy_translation,
+        help="台本の生成時には翻訳せず、Mode B のシーン一覧で表示しているページのシーンだけをDeepLで翻訳します。長尺の台本でも一覧がすぐに表示されます。"
+    )
+
+    # DeepL の翻訳メモリ（TRANSLATION_MEMORY_ENABLED=1 のときに使われる）
+    if Config.TRANSLATION_MEMORY_ENABLED:
+        st.markdown("**Translation Memory (DeepL)**")
+        memory = TranslationMemory()
+        memory_stats = memory.stats()
+        col_hit, col_rate, col_size = st.columns(3)
+        col_hit.metric("Memory Hits", memory_stats["hits"], help=f"Misses: {memory_stats['misses']}")
+        col_rate.metric("Hit Rate", f"{memory_stats['hit_rate']:.0%}")
+        col_size.metric("Entries", memory_stats["entries"], help=f"{memory_stats['bytes'] / 1024:.1f} KiB")
+        if st.button("🧹 翻訳メモリをクリア", use_container_width=True):
+            memory.clear()
+            st.success("翻訳メモリをクリアしました。")
+
+
+    # Gemini 呼び出しの計測値（LLM_METRICS_ENABLED=1 のときに記録される）
+    if Config.LLM_METRICS_ENABLED:
+        st.markdown("**LLM Usage**")
+        period = st.selectbox("集計期間", ["直近24時間", "直近7日", "全期間"], index=1)
+        since = {"直近24時間": time.time() - 86400, "直近7日": time.time() - 7 * 86400}.get(period)
+        usage = LLMMetrics().summary(since=since)
+        total = usage["total"]
+        col_calls, col_latency, col_tokens, col_cost = st.columns(4)
+        col_calls.metric("Calls", total["calls"], help=f"Cache hits: {total['cache_hits']} / Errors: {total['errors']} / Retries: {total['retries']} / JSON repaired: {total['repaired']} / Hedged: {total['hedged']} / Failovers: {total['failovers']}")
+        col_latency.metric("Avg Latency", f"{total['avg_wall_time']:.1f}s" if total["avg_wall_time"] is not None else "-",
+                           help=f"p95: {total['p95_wall_time'] or 0:.1f}s / TTFT (stream): {total['avg_ttft'] or 0:.1f}s")
+        col_tokens.metric("Tokens (in/out)", f"{total['prompt_tokens']:,} / {total['response_tokens']:,}")
+        col_cost.metric("Est. Cost", f"${total['cost_usd']:.3f}")
+        if usage["by_model"]:
+            st.dataframe(
+                [
+                    {
+                        "model": model,
+                        "calls": stats["calls"],
+                        "avg latency (s)": round(stats["avg_wall_time"], 2) if stats["avg_wall_time"] is not None else None,
+                        "p95 latency (s)": round(stats["p95_wall_time"], 2) if stats["p95_wall_time"] is not None else None,
+                        "prompt tokens": stats["prompt_tokens"],
+                        "response tokens": stats["response_tokens"],
+                        "errors": stats["errors"],
+                        "failovers": stats["failovers"],
+                        "cost (USD)": round(stats["cost_usd"], 4),
+                    }
+                    for model, stats in usage["by_model"].items()
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
     
     st.divider()
 
+    st.markdown('<div class="section-header">Google Sheets API</div>', unsafe_allow_html=True)
+    sheets_stats = SheetsClientPool.limiter().stats()
+    col_calls, col_wait, col_retry = st.columns(3)
+    col_calls.metric("API Calls", sheets_stats["calls"], help=f"Read: {sheets_stats['read_calls']} / Write: {sheets_stats['write_calls']}")
+    col_wait.metric("Throttled Waits", sheets_stats["throttled_waits"], help=f"クォータ待機の合計: {sheets_stats['throttled_seconds']:.1f}秒")
+    col_retry.metric("Retries (429/5xx)", sheets_stats["retries"], help=f"リトライ上限到達による失敗: {sheets_stats['failures']}")
+
+    col_days, col_archive_btn = st.columns([1, 2])
+    with col_days:
+        archive_days = st.number_input("アーカイブ対象（完了から何日経過）", min_value=0, value=Config.SHEETS_ARCHIVE_AFTER_DAYS or 30, step=1)
+    with col_archive_btn:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("🗄️ 完了済みの行をアーカイブへ移動", use_container_width=True, help="「データ」タブから完了済みの古い行を「アーカイブ」タブへまとめて移動します"):
+            with st.spinner("アーカイブ中..."):
+                try:
+                    archived_rows = get_sheets_handler().archive_completed(int(archive_days))
+                    st.success(f"{len(archived_rows)} 行をアーカイブしました。")
+                except Exception as e:
+                    st.error(f"アーカイブエラー: {e}")
+
+    st.divider()
+
     st.markdown('<div class="section-header">External Auth Sessions</div>', unsafe_allow_html=True)
     st.markdown('<p style="font-size: 0.85rem; color: #64748b; margin-bottom: 1rem;">自動化エンジンのセッションを保存します。</p>', unsafe_allow_html=True)
     
@@ -1095,10 +1433,10 @@ elif st.session_state.current_page == "⚙️ System Configuration":
 with status_placeholder:
     try:
         with st.spinner("Checking..."):
-            handler = SheetsHandler()
-            _, row_data = handler.get_unprocessed_row()
-            if row_data:
-                st.markdown(f'<div class="status-container"><span style="color: #94a3b8; font-size: 0.8rem;">Ready for Production:</span><br/><b style="color: #f8fafc;">{row_data[0]}</b></div>', unsafe_allow_html=True)
+            handler = get_sheets_handler()
+            _, next_title = handler.peek_unprocessed_title()
+            if next_title:
+                st.markdown(f'<div class="status-container"><span style="color: #94a3b8; font-size: 0.8rem;">Ready for Production:</span><br/><b style="color: #f8fafc;">{next_title}</b></div>', unsafe_allow_html=True)
             else:
                 st.markdown('<div class="status-container" style="color: #10b981;">✅ All processed.</div>', unsafe_allow_html=True)
     except:
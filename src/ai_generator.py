@@ -1,17 +1,228 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from src.config import Config
 import json
+import random
 import re
-from src.deepl_translator import DeepLTranslator
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.deepl_translator import DeepLTranslator, PartialTranslationError
+from src.translation_pipeline import TranslationPipeline
+from src.response_cache import ResponseCache
+from src.json_stream import IncrementalJSONParser
+from src.title_index import TitleIndex
+from src.scene_aligner import align_scenes
+from src.json_repair import IDEAS_SCHEMA, LOSSY_REPAIRS, SCENES_SCHEMA, SCRIPT_SCHEMA, extract_json
+from src.llm_metrics import LLMCall, LLMMetrics
+from src.backends import gemini_model
+from src.model_router import ModelRouter, task_of
+
+# JSONのみを出力させる生成設定（キャッシュキーにも含まれる）
+GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# ストリーミング時に要素ごとに通知する配列フィールド
+STREAM_ITEM_FIELDS = ("vrew_script", "mj_prompts")
+
+# Midjourney のパラメータ部分（" --ar 9:16 --v 6.0" など）
+MJ_PARAMS_PATTERN = re.compile(r"\s--[a-z].*$")
+DEFAULT_MJ_PARAMS = " --ar 9:16 --v 6.0"
+
+# 部分再生成の対象
+REGENERATE_TARGETS = {
+    "both": "台本の行とMidjourneyプロンプトの両方",
+    "script": "台本の行のみ（プロンプトは変更しない）",
+    "prompt": "Midjourneyプロンプトのみ（台本の行は変更しない）",
+}
+
+# 再試行する一時的なエラー（429・5xx・タイムアウト）
+TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+)
 
 class AIGenerator:
-    def __init__(self, model_name='gemini-3-flash-preview'):
+    def __init__(self, model_name='gemini-3-flash-preview', use_cache=None, cache=None, metrics=None, router=None):
         genai.configure(api_key=Config.GEMINI_API_KEY)
         # 2025年12月現在の最新プレビュー版（gemini-3-flash-preview）
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+        # BACKEND_MODE が record / replay の場合は応答を記録・再生するモデルに差し替える
+        self.model = gemini_model(genai.GenerativeModel(model_name), model_name)
+        # レスポンスキャッシュ（use_cache 未指定時は Config.AI_CACHE_ENABLED に従う）
+        if use_cache is None:
+            use_cache = Config.AI_CACHE_ENABLED
+        self.cache = cache if cache is not None else (ResponseCache() if use_cache else None)
+        # 呼び出しごとの計測値の記録先（LLM_METRICS_ENABLED が無効なら記録しない）
+        if metrics is None and Config.LLM_METRICS_ENABLED:
+            metrics = LLMMetrics()
+        self.metrics = metrics
+        # 用途ごとのモデルの振り分け・代替モデルへの切り替え（AI_ROUTING_ENABLED が無効なら model_name のみ）
+        if router is None and Config.AI_ROUTING_ENABLED:
+            router = ModelRouter.from_config(model_name)
+        self.router = router
+        self._models = {}
+
+    def _get_model(self, model_name=None):
+        """モデル名に対応する GenerativeModel（model_name 以外は初回に作成）"""
+        if model_name is None or model_name == self.model_name:
+            return self.model
+        if model_name not in self._models:
+            self._models[model_name] = gemini_model(genai.GenerativeModel(model_name), model_name)
+        return self._models[model_name]
+
+    def _start_call(self, operation, prompt):
+        """1回の生成呼び出しの計測を開始"""
+        return LLMCall(self.metrics, operation, self.model_name, prompt)
+
+    def _call_model(self, prompt, call, model_name=None, max_retries=None, **kwargs):
+        """generate_content を実行し、一時的なエラーは指数バックオフ（ジッター付き）で再試行する"""
+        model = self._get_model(model_name)
+        max_retries = Config.AI_MAX_RETRIES if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            try:
+                return model.generate_content(prompt, generation_config=GENERATION_CONFIG, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= max_retries:
+                    raise
+                delay = random.uniform(0, min(30.0, 2 ** attempt))
+                attempt += 1
+                call.retried()
+                print(f"Gemini API error ({type(e).__name__}). Retrying in {delay:.1f}s ({attempt}/{max_retries}).")
+                time.sleep(delay)
+
+    def _call_routed(self, prompt, call, stream=False, **kwargs):
+        """
+        ルーター経由で generate_content を実行し (レスポンス, 応答したモデル) を返す
+        代替モデルが残っている間はリトライせずに切り替える（最後のモデルだけ通常どおり再試行）
+        """
+        if self.router is None:
+            return self._call_model(prompt, call, stream=stream, **kwargs), self.model_name
+
+        def attempt(model_name, is_last):
+            return self._call_model(prompt, call, model_name=model_name, max_retries=None if is_last else 0,
+                                    stream=stream, **kwargs)
+
+        response, model_name, decision = self.router.run(
+            call.entry["operation"], self.model_name, attempt, hedge=not stream, record_success=not stream
+        )
+        call.routed(model_name, decision)
+        return response, model_name
+
+    def _lookup(self, prompt, force_regenerate=False):
+        """キャッシュを引き (キャッシュキー, キャッシュ済みの本文 or None) を返す"""
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(prompt, self.model_name, GENERATION_CONFIG)
+        if force_regenerate:
+            return key, None
+        try:
+            return key, self.cache.get(key)
+        except Exception as e:
+            print(f"Response cache read error: {e}")
+            return key, None
+
+    def _generate(self, prompt, call, force_regenerate=False, timeout=None):
+        """
+        プロンプトを実行し (レスポンス本文, キャッシュキー) を返す
+        キャッシュにヒットした場合はキーを None で返す（再保存不要）
+        """
+        key, cached = self._lookup(prompt, force_regenerate)
+        if cached is not None:
+            call.cache_hit()
+            return cached, None
+
+        options = {"request_options": {"timeout": timeout}} if timeout else {}
+        try:
+            response, _ = self._call_routed(prompt, call, **options)
+            text = response.text
+        except Exception as e:
+            call.failed(e)
+            call.finish()
+            raise
+        call.usage(getattr(response, "usage_metadata", None))
+        return text, key
+
+    def _generate_stream(self, prompt, call, force_regenerate=False):
+        """_generate のストリーミング版。(テキスト片のイテレータ, キャッシュキー) を返す"""
+        key, cached = self._lookup(prompt, force_regenerate)
+        if cached is not None:
+            call.cache_hit()
+            return iter([cached]), None
+
+        started = time.perf_counter()
+        try:
+            response, model_name = self._call_routed(prompt, call, stream=True)
+        except Exception as e:
+            call.failed(e)
+            call.finish()
+            raise
+
+        def record_health(ok):
+            if self.router is not None:
+                self.router.record(model_name, task_of(call.entry["operation"]), time.perf_counter() - started, ok)
 
-    def generate_new_ideas(self, existing_titles, expert_persona=None):
-        """【モードA：企画会議】新しいネタを5つ提案"""
+        def chunks():
+            try:
+                for chunk in response:
+                    text = chunk.text
+                    if text:
+                        call.first_token()
+                    yield text
+            except Exception as e:
+                record_health(False)
+                call.failed(e)
+                call.finish()
+                raise
+            record_health(True)
+            # ストリーミングではトークン数は最後まで読んだ後に確定する
+            call.usage(getattr(response, "usage_metadata", None))
+        return chunks(), key
+
+    @staticmethod
+    def _parse_json(raw_text, schema=None, call=None):
+        """
+        レスポンス本文からJSONを取り出して解析し (データ, 適用した修復) を返す
+        ```json の囲み・前後の解説文・末尾カンマ・途切れなどはローカルで修復する（json_repair）
+        """
+        data, repairs = extract_json(raw_text, schema)
+        if repairs:
+            print(f"Repaired model JSON: {', '.join(repairs)}")
+        if call is not None:
+            call.parsed(repairs, lossy=any(r in LOSSY_REPAIRS for r in repairs))
+        return data, repairs
+
+    def _remember(self, key, raw_text, repairs=()):
+        """解析に成功したレスポンスだけをキャッシュに保存（途切れ・部分回収したものは保存しない）"""
+        if key is None or self.cache is None:
+            return
+        if any(r in LOSSY_REPAIRS for r in repairs):
+            return
+        try:
+            self.cache.set(key, raw_text, model_name=self.model_name)
+        except Exception as e:
+            print(f"Response cache write error: {e}")
+
+    def cache_stats(self):
+        """キャッシュのヒット/ミス統計（キャッシュ無効時は None）"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def generate_new_ideas(self, existing_titles, expert_persona=None, force_regenerate=False, drop_duplicates=False,
+                           archived_titles=None):
+        """
+        【モードA：企画会議】新しいネタを5つ提案（force_regenerate=True でキャッシュを使わない）
+
+        既存ネタは全件ではなく、existing_titles（シートの行順）の末尾から TitleIndex で選んだ
+        最大 AI_IDEAS_TITLE_SAMPLE 件だけをプロンプトに載せる。archived_titles（アーカイブ済み）は
+        プロンプトには載せず、重複判定にだけ使う。生成されたアイディアは既存ネタとの類似度をローカルで判定し、
+        類似したアイディアには "duplicate_of" / "similarity" を付ける（drop_duplicates=True なら除外）。
+        """
+        archived_titles = list(archived_titles or [])
+        title_index = TitleIndex.shared(archived_titles + list(existing_titles))
+        sampled_titles = title_index.sample(Config.AI_IDEAS_TITLE_SAMPLE, titles=existing_titles)
         # パーソナ設定の適用
         persona_logic = expert_persona if expert_persona else """
 1. **Viral Architect (YouTube Shortsマーケター)**: 冒頭1秒の「めくり」と視聴維持率に異常にこだわる。
@@ -25,7 +236,7 @@ class AIGenerator:
 ### 👥 召喚するエキスパート
 {persona_logic}
 
-現在の管理表にある既存ネタ：{json.dumps(existing_titles, ensure_ascii=False)}
+現在の管理表にある既存ネタ（全{len(existing_titles) + len(archived_titles)}件のうち直近の{len(sampled_titles)}件）：{json.dumps(sampled_titles, ensure_ascii=False)}
 
 ### 【モードA：企画会議】
 1. **論議**: 3人がそれぞれの視点から議論する。
@@ -44,34 +255,345 @@ class AIGenerator:
   ]
 }}
 """
-        response = self.model.generate_content(
-            prompt, 
-            generation_config={"response_mime_type": "application/json"}
-        )
+        call = self._start_call("ideas", prompt)
+        raw_text, cache_key = self._generate(prompt, call, force_regenerate)
         
         try:
-            # AIがマークダウンでJSONを囲って出力した場合のクリーニング
-            raw_text = response.text
-            # 正規表現で一番最初に見つかる ```json ... ``` または ``` ... ``` を抽出
-            match = re.search(r'```(?:json)?\s*(.*?)\s*```', raw_text, re.DOTALL)
-            if match:
-                clean_json = match.group(1)
-            else:
-                clean_json = raw_text.strip("` \n")
-                
-            data = json.loads(clean_json)
-            ideas_data = {item["title"]: {"overview": item["overview"], "horror_point": item["horror_point"]} for item in data.get("ideas", [])}
+            data, repairs = self._parse_json(raw_text, IDEAS_SCHEMA, call)
+            ideas_data = {}
             full_text = f"### 👥 エキスパートによる議論\n{data.get('discussion', '')}\n\n"
             for item in data.get("ideas", []):
-                full_text += f"#### {item['title']}\n- **概要**: {item['overview']}\n- **恐怖ポイント**: {item['horror_point']}\n\n"
+                if not isinstance(item, dict) or not item.get("title"):
+                    continue
+                item.setdefault("overview", "")
+                item.setdefault("horror_point", "")
+                idea = {"overview": item["overview"], "horror_point": item["horror_point"]}
+                # 既存ネタとの近似重複チェック（APIは呼ばない）
+                duplicate_of, similarity = title_index.find_duplicate(item["title"], Config.TITLE_DUPLICATE_THRESHOLD)
+                if duplicate_of:
+                    if drop_duplicates:
+                        print(f"Dropped near-duplicate idea: {item['title']} ~ {duplicate_of} ({similarity:.2f})")
+                        continue
+                    idea["duplicate_of"] = duplicate_of
+                    idea["similarity"] = similarity
+                ideas_data[item["title"]] = idea
+                full_text += f"#### {item['title']}\n- **概要**: {item['overview']}\n- **恐怖ポイント**: {item['horror_point']}\n"
+                if duplicate_of:
+                    full_text += f"- ⚠️ **既存ネタと類似**: {duplicate_of}（類似度 {similarity:.0%}）\n"
+                full_text += "\n"
         except Exception as e:
-            return {}, f"JSON解析エラー: {e}\nRaw Response: {response.text}"
+            call.failed(e)
+            call.finish()
+            return {}, f"JSON解析エラー: {e}\nRaw Response: {raw_text}"
 
+        call.finish()
+        self._remember(cache_key, raw_text, repairs)
         return ideas_data, full_text
 
-    def generate_script_and_prompts(self, title, context=None, expert_persona=None, video_mode="Shorts"):
-        """【モードB：制作実行】3人のエキスパートによる共同制作"""
+    def generate_script_and_prompts(self, title, context=None, expert_persona=None, video_mode="Shorts",
+                                    force_regenerate=False, timeout=None, translate=True):
+        """
+        【モードB：制作実行】3人のエキスパートによる共同制作（force_regenerate=True でキャッシュを使わない）
+        translate=False なら日本語訳は行わず、script_jp_list は空欄のまま返す（画面側で表示するシーンだけ翻訳する）
+        """
+        prompt = self._build_script_prompt(title, context, expert_persona, video_mode)
+        call = self._start_call("script", prompt)
+        raw_text, cache_key = self._generate(prompt, call, force_regenerate, timeout)
         
+        try:
+            data, repairs = self._parse_json(raw_text, SCRIPT_SCHEMA, call)
+            call.finish()
+            self._remember(cache_key, raw_text, repairs)
+            return self._build_script_result(data, video_mode=video_mode, translate=translate)
+        except Exception as e:
+            call.failed(e)
+            call.finish()
+            return self._script_error_result(e, raw_text)
+
+    def generate_script_and_prompts_stream(self, title, context=None, expert_persona=None, video_mode="Shorts",
+                                           force_regenerate=False, translate=True):
+        """
+        【モードB：制作実行】generate_script_and_prompts のストリーミング版
+        生成中のJSONを逐次解析し、完成した要素から順に (種類, 番号, 値) を yield する
+          ("title_en", None, "...")   トップレベルのフィールド（title_jp, description なども同様）
+          ("vrew_script", i, "...")   台本の各行（届いた時点で翻訳も行う）
+          ("script_jp", i, "...")     台本の各行の日本語訳（translate=False なら返さない）
+          ("mj_prompts", i, {...})    Midjourneyプロンプトの各シーン
+          ("result", None, {...})     最後に generate_script_and_prompts と同じ形式の結果
+        """
+        prompt = self._build_script_prompt(title, context, expert_persona, video_mode)
+        call = self._start_call("script_stream", prompt)
+        chunks, cache_key = self._generate_stream(prompt, call, force_regenerate)
+
+        translator = None
+        if translate:
+            try:
+                translator = DeepLTranslator()
+            except Exception as e:
+                print(f"Translation integration error: {e}")
+
+        # パイプラインでは届いた行を別スレッドで翻訳し、生成の続きを待たない
+        pipeline = TranslationPipeline(translator) if translate and Config.AI_TRANSLATION_PIPELINE else None
+        parser = IncrementalJSONParser()
+        raw_text = ""
+        script_jp_list = []
+        for chunk in chunks:
+            raw_text += chunk
+            for path, value in parser.feed(chunk):
+                field = path[0]
+                if field in STREAM_ITEM_FIELDS:
+                    if len(path) == 1:
+                        continue  # 配列全体は各要素で通知済み
+                    yield field, path[1], value
+                    if field == "vrew_script" and translate:
+                        if pipeline is not None:
+                            pipeline.submit(path[1], value)
+                            continue
+                        line_jp = self._translate_line(translator, value)
+                        script_jp_list.append(line_jp)
+                        yield "script_jp", path[1], line_jp
+                elif len(path) == 1:
+                    yield field, None, value
+            if pipeline is not None:
+                for i, line_jp in pipeline.poll():
+                    yield "script_jp", i, line_jp
+
+        try:
+            # 最終的な全文は非ストリーミング版と同じ修復（囲み・末尾カンマ・途切れ・型の補正）を通す
+            data, repairs = self._parse_json(raw_text, SCRIPT_SCHEMA, call)
+            call.finish()
+            self._remember(cache_key, raw_text, repairs)
+            if pipeline is not None:
+                # 残りの翻訳はプロンプトの補完と並行して進め、結果を組み立てる最後に待つ
+                result = self._build_script_result(data, video_mode=video_mode, translation=pipeline)
+                for i, line_jp in pipeline.poll():
+                    yield "script_jp", i, line_jp
+            else:
+                result = self._build_script_result(data, script_jp_list, video_mode, translate=translate)
+            yield "result", None, result
+        except Exception as e:
+            call.failed(e)
+            call.finish()
+            if pipeline is not None:
+                pipeline.join(timeout=0)
+            yield "result", None, self._script_error_result(e, raw_text)
+
+    def generate_scripts_batch(self, jobs, expert_persona=None, video_mode="Shorts", max_workers=None, timeout=None,
+                               force_regenerate=False):
+        """
+        【モードB：バッチ制作】複数タイトルの台本をスレッドプールで並行生成する
+
+        Args:
+            jobs: [{"title": ..., "context": {...}, "video_mode": ...(任意)}, ...]
+            max_workers: 同時に実行するリクエスト数の上限（既定は Config.AI_BATCH_MAX_WORKERS）
+            timeout: 1リクエストあたりのタイムアウト秒数（既定は Config.AI_REQUEST_TIMEOUT）
+
+        Yields:
+            完了した順に {"index", "job", "result", "error", "elapsed"}。
+            1件の失敗は他の件に影響せず、その件の error に理由が入る（result は None）。
+        """
+        max_workers = max_workers or Config.AI_BATCH_MAX_WORKERS
+        timeout = timeout or Config.AI_REQUEST_TIMEOUT
+
+        def run(job):
+            started = time.monotonic()
+            result = self.generate_script_and_prompts(
+                job["title"],
+                context=job.get("context"),
+                expert_persona=expert_persona,
+                video_mode=job.get("video_mode", video_mode),
+                force_regenerate=force_regenerate,
+                timeout=timeout,
+            )
+            return result, time.monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run, job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                item = {"index": i, "job": jobs[i], "result": None, "error": None, "elapsed": None}
+                try:
+                    result, item["elapsed"] = future.result()
+                    if result.get("vrew_script"):
+                        item["result"] = result
+                    else:
+                        item["error"] = result.get("editorial_notes") or "Empty script"
+                except Exception as e:
+                    print(f"Batch generation error ({jobs[i].get('title')}): {e}")
+                    item["error"] = str(e)
+                yield item
+
+    def regenerate_scenes(self, title, script_lines, mj_prompts, scene_numbers, target="both", instruction=None,
+                          script_jp_list=None, video_mode="Shorts", context_window=2, force_regenerate=False):
+        """
+        【モードB：部分修正】指定したシーンだけを再生成する（台本全体は作り直さない）
+
+        プロンプトには対象シーンと前後 context_window シーン、全シーン共通のスタイル指定だけを載せる。
+        シーン番号と「台本の行数 = プロンプトの数」は維持し、翻訳は変更された行だけやり直す。
+
+        Args:
+            script_lines: 台本の各行のリスト
+            mj_prompts: 各シーンのMidjourneyプロンプトのリスト（script_lines と同じ長さ）
+            scene_numbers: 再生成するシーン番号（1始まり）
+            target: "both" / "script" / "prompt"
+            instruction: 修正の方向性などの追加指示（任意）
+
+        Returns:
+            dict: {"script_lines", "mj_prompts_list", "script_jp_list", "changed_scenes", "error"}
+            解析に失敗した場合は元の内容のまま error に理由が入る
+        """
+        if target not in REGENERATE_TARGETS:
+            raise ValueError(f"Unknown regeneration target: {target}")
+        if len(script_lines) != len(mj_prompts):
+            raise ValueError(f"Script has {len(script_lines)} lines but {len(mj_prompts)} prompts")
+        scene_numbers = sorted(set(scene_numbers))
+        if not scene_numbers or not all(1 <= n <= len(script_lines) for n in scene_numbers):
+            raise ValueError(f"Scene numbers must be between 1 and {len(script_lines)}: {scene_numbers}")
+
+        script_lines = list(script_lines)
+        mj_prompts = list(mj_prompts)
+        script_jp_list = list(script_jp_list or [])
+        script_jp_list += [""] * (len(script_lines) - len(script_jp_list))
+        result = {
+            "script_lines": script_lines,
+            "mj_prompts_list": mj_prompts,
+            "script_jp_list": script_jp_list[:len(script_lines)],
+            "changed_scenes": [],
+            "error": None,
+        }
+
+        prompt = self._build_regenerate_prompt(title, script_lines, mj_prompts, scene_numbers, target, instruction,
+                                               video_mode, context_window)
+        call = self._start_call("regenerate_scenes", prompt)
+        raw_text, cache_key = self._generate(prompt, call, force_regenerate)
+
+        try:
+            data, repairs = self._parse_json(raw_text, SCENES_SCHEMA, call)
+            scenes = {}
+            for item in data["scenes"]:
+                if isinstance(item, dict) and str(item.get("scene", "")).isdigit():
+                    scenes[int(item["scene"])] = item
+        except Exception as e:
+            call.failed(e)
+            call.finish()
+            result["error"] = f"JSON解析エラー: {e}\nRaw Response: {raw_text}"
+            return result
+
+        call.finish()
+        self._remember(cache_key, raw_text, repairs)
+
+        params = self._mj_params(mj_prompts)
+        translator = None
+        for n in scene_numbers:
+            item = scenes.get(n)
+            if item is None:
+                print(f"Scene {n} was not regenerated (missing in model output). Keeping the original.")
+                continue
+            i = n - 1
+            changed = False
+            line = str(item.get("script") or "").strip()
+            if target in ("both", "script") and line and line != script_lines[i]:
+                script_lines[i] = line
+                if translator is None:
+                    try:
+                        translator = DeepLTranslator()
+                    except Exception as e:
+                        print(f"Translation integration error: {e}")
+                result["script_jp_list"][i] = self._translate_line(translator, line)
+                changed = True
+            mj_prompt = str(item.get("prompt") or "").strip()
+            if target in ("both", "prompt") and mj_prompt:
+                if "--ar" not in mj_prompt:
+                    mj_prompt += params
+                if mj_prompt != mj_prompts[i]:
+                    mj_prompts[i] = mj_prompt
+                    changed = True
+            if changed:
+                result["changed_scenes"].append(n)
+        return result
+
+    @staticmethod
+    def _mj_params(mj_prompts):
+        """既存プロンプトのパラメータ部分（--ar など）。見つからなければ既定値"""
+        for p in mj_prompts:
+            match = MJ_PARAMS_PATTERN.search(p)
+            if match:
+                return match.group(0)
+        return DEFAULT_MJ_PARAMS
+
+    @staticmethod
+    def _style_anchors(mj_prompts, limit=12):
+        """全シーンの半数以上のプロンプトに共通して現れる語句（画風・技術指定）を抽出"""
+        counts = {}
+        for p in mj_prompts:
+            phrases = {s.strip().lower() for s in MJ_PARAMS_PATTERN.sub("", p).split(",")}
+            for phrase in phrases:
+                if phrase:
+                    counts[phrase] = counts.get(phrase, 0) + 1
+        threshold = max(2, (len(mj_prompts) + 1) // 2)
+        anchors = [phrase for phrase, count in counts.items() if count >= threshold]
+        anchors.sort(key=lambda phrase: -counts[phrase])
+        return anchors[:limit]
+
+    def _build_regenerate_prompt(self, title, script_lines, mj_prompts, scene_numbers, target, instruction,
+                                 video_mode, context_window):
+        """部分再生成のプロンプトを組み立てる（対象と前後のシーンのみ）"""
+        targets = set(scene_numbers)
+        context_numbers = sorted({
+            n for t in scene_numbers
+            for n in range(max(1, t - context_window), min(len(script_lines), t + context_window) + 1)
+        } - targets)
+
+        def scene_text(n):
+            return f"Scene {n}:\n- script: {script_lines[n - 1]}\n- prompt: {mj_prompts[n - 1]}"
+
+        anchors = self._style_anchors(mj_prompts)
+        anchors_str = ", ".join(anchors) if anchors else "（既存プロンプトの画風・光源・質感に合わせる）"
+        context_str = "\n".join(scene_text(n) for n in context_numbers) or "（なし）"
+        targets_str = "\n".join(scene_text(n) for n in scene_numbers)
+        instruction_str = f"\n### 📝 修正の指示\n{instruction}\n" if instruction else ""
+        example = ", ".join(
+            f'{{"scene": {n}, "script": "English line", "prompt": "Technical prompt in English"}}'
+            for n in scene_numbers
+        )
+
+        return f"""
+あなたはYouTube動画制作特化の「Jホラー動画制作スタジオ」の統括AIです。
+「{title}」（{video_mode}モード、全{len(script_lines)}シーン）の完成済み台本のうち、指定したシーンだけを書き直してください。
+
+### ✏️ 書き直すシーン
+{targets_str}
+
+書き直す対象: **{REGENERATE_TARGETS[target]}**
+{instruction_str}
+### 📍 前後のシーン（文脈の参考。変更しない）
+{context_str}
+
+### 🎨 全シーン共通のスタイル指定（プロンプトに必ず含める）
+{anchors_str}
+
+**規則:**
+1. 前後のシーンと物語・映像が自然につながるようにする
+2. 台本の行は純粋なナレーション文のみ（句点(.)・引用符・`[...]`・`SFX:` は含めない）
+3. プロンプトは対応する台本の行の内容・感情・重要なキーワード（名詞）を視覚化する
+4. シーン番号は変更しない。指定したシーン以外は出力しない
+
+**出力形式 (JSONのみ):**
+{{"scenes": [{example}]}}
+"""
+
+    @staticmethod
+    def _translate_line(translator, line):
+        if translator is None:
+            return ""
+        try:
+            return translator.translate(line)
+        except Exception as e:
+            print(f"Translation integration error: {e}")
+            return ""
+
+    def _build_script_prompt(self, title, context=None, expert_persona=None, video_mode="Shorts"):
+        """モードBのプロンプトを組み立てる"""
         # パーソナ設定の適用
         persona_logic = expert_persona if expert_persona else """
 1. **Viral Architect (YouTube Shortsマーケター)**: 視聴維持率とクリック率（CTR）の鬼。冒頭1秒の「フック」と、スマホ表示で途切れない魅力的なタイトルの作成に命をかける。
@@ -233,118 +755,146 @@ class AIGenerator:
   ]
 }}
 """
-        response = self.model.generate_content(
-            prompt,
-            generation_config={"response_mime_type": "application/json"}
-        )
+        return prompt
+
+    def _build_script_result(self, data, script_jp_list=None, video_mode="Shorts", translation=None, translate=True):
+        """
+        解析済みのJSONから画面表示・保存用の結果を組み立てる
+        translation: 翻訳中の TranslationPipeline（ストリーミング時）。無ければここで翻訳を始める
+        translate: False なら翻訳せず、script_jp_list は行数分の空欄にする
+        """
+        # 修復したJSONでは要素の型が崩れていることがあるため揃えておく
+        data['vrew_script'] = [str(line) for line in data.get('vrew_script', []) if line]
+        # 翻訳は別スレッドで始め、同期ズレの補正・欠けたプロンプトの生成と並行させる
+        if not translate:
+            script_jp_list = ["" for _ in data['vrew_script']]
+        elif script_jp_list is None and translation is None and Config.AI_TRANSLATION_PIPELINE:
+            try:
+                translation = TranslationPipeline(DeepLTranslator())
+                translation.submit_all(data['vrew_script'])
+            except Exception as e:
+                print(f"Translation integration error: {e}")
+        data['hashtags'] = [str(tag) for tag in data.get('hashtags', [])]
+        data['mj_prompts'] = [
+            item if isinstance(item, dict) else {"scene": i, "prompt": str(item)}
+            for i, item in enumerate(data.get('mj_prompts', []), 1)
+        ]
+
+        # UI表示用のテキストを構築
+        full_display_text = f"## 🎬 Production Notes\n{data.get('editorial_notes', '')}\n\n"
+        full_display_text += f"## 📝 Video Info\n- **Title (EN)**: {data.get('title_en', '')}\n- **Title (JP)**: {data.get('title_jp', '')}\n"
+        full_display_text += f"- **Hashtags**: {' '.join(data.get('hashtags', []))}\n\n"
+        full_display_text += "## 📜 Script (EN)\n" + "\n".join(data.get('vrew_script', []))
+
+        # --- 同期ズレの補正 (New!) ---
+        raw_prompts = data.get('mj_prompts', [])
+        vrew_script = data.get('vrew_script', [])
+        title_en = data.get('title_en', '')
         
-        try:
-            # AIがマークダウンでJSONを囲って出力した場合のクリーニング
-            raw_text = response.text
-            match = re.search(r'```(?:json)?\s*(.*?)\s*```', raw_text, re.DOTALL)
-            if match:
-                clean_json = match.group(1)
-            else:
-                clean_json = raw_text.strip("` \n")
+        raw_prompts = [item for item in raw_prompts if item.get('prompt')]
+        sync_report = {}
+        fixed_prompts = self._fix_sync_issues(vrew_script, raw_prompts, title_en, report=sync_report)
+
+        # Midjourneyプロンプトをシーンごとにリスト化
+        prompt_list = []
+        for item in fixed_prompts:
+            p = item.get('prompt', '')
+            # 共通キーワードの付与
+            if p and "--ar" not in p:
+                p += DEFAULT_MJ_PARAMS
+            prompt_list.append(p)
+
+        # プロンプトが欠けている・兼用されているシーンだけを追加で生成する（全体の再生成はしない）
+        gaps = sorted(set(sync_report.get("missing", []) + sync_report.get("merged", [])))
+        sync_report["filled"] = []
+        if gaps and Config.AI_FILL_MISSING_PROMPTS:
+            try:
+                filled = self.regenerate_scenes(title_en, vrew_script, prompt_list, gaps, target="prompt",
+                                                video_mode=video_mode)
+                if filled["error"]:
+                    print(f"Missing prompt generation error: {filled['error']}")
+                else:
+                    prompt_list = filled["mj_prompts_list"]
+                    sync_report["filled"] = filled["changed_scenes"]
+            except Exception as e:
+                print(f"Missing prompt generation error: {e}")
 
-            data = json.loads(clean_json)
-            
-            # UI表示用のテキストを構築
-            full_display_text = f"## 🎬 Production Notes\n{data.get('editorial_notes', '')}\n\n"
-            full_display_text += f"## 📝 Video Info\n- **Title (EN)**: {data.get('title_en', '')}\n- **Title (JP)**: {data.get('title_jp', '')}\n"
-            full_display_text += f"- **Hashtags**: {' '.join(data.get('hashtags', []))}\n\n"
-            full_display_text += "## 📜 Script (EN)\n" + "\n".join(data.get('vrew_script', []))
-
-            # --- 同期ズレの補正 (New!) ---
-            raw_prompts = data.get('mj_prompts', [])
-            vrew_script = data.get('vrew_script', [])
-            title_en = data.get('title_en', '')
-            
-            fixed_prompts = self._fix_sync_issues(vrew_script, raw_prompts, title_en)
-
-            # Midjourneyプロンプトをシーンごとにリスト化
-            prompt_list = []
-            for item in fixed_prompts:
-                p = item.get('prompt', '')
-                if p:
-                    # 共通キーワードの付与
-                    if "--ar" not in p:
-                        p += " --ar 9:16 --v 6.0"
-                    prompt_list.append(p)
-
-            # --- 日本語翻訳の追加 ---
-            script_jp_list = []
+        # --- 日本語翻訳の追加（ストリーミング時・パイプラインで翻訳済みならそれを使う） ---
+        if translation is not None:
+            script_jp_list = translation.join()
+        if script_jp_list is None or len(script_jp_list) != len(vrew_script):
             try:
-                translator = DeepLTranslator()
-                for line in data.get('vrew_script', []):
-                    script_jp_list.append(translator.translate(line))
+                # 全行を1リクエスト（上限を超える場合は数リクエスト）でまとめて翻訳
+                script_jp_list = DeepLTranslator().translate_batch(data.get('vrew_script', []))
+            except PartialTranslationError as e:
+                # 翻訳できた行だけ使う（失敗した行は空欄）
+                print(f"Translation integration error: {e}")
+                script_jp_list = e.results
             except Exception as e:
                 print(f"Translation integration error: {e}")
                 script_jp_list = ["" for _ in data.get('vrew_script', [])]
 
-            return {
-                "title_en": data.get('title_en', ''),
-                "title_jp": data.get('title_jp', ''),
-                "description": data.get('description', ''),
-                "hashtags": ' '.join(data.get('hashtags', [])),
-                "editorial_notes": data.get('editorial_notes', ''),
-                "vrew_script": "\n".join(data.get('vrew_script', [])),
-                "script_jp_list": script_jp_list, # シーンごとの翻訳リスト
-                "mj_prompts_list": prompt_list,  # シーンごとのリスト
-                "full_text": full_display_text  # 従来の表示用（後方互換性）
-            }
-        except Exception as e:
-            return {
-                "title_en": "",
-                "title_jp": "",
-                "description": "",
-                "hashtags": "",
-                "editorial_notes": f"JSON解析エラー: {e}\\nRaw Response: {response.text}",
-                "vrew_script": "",
-                "mj_prompts_list": [],
-                "full_text": f"JSON解析エラー: {e}\\nRaw Response: {response.text}"
-            }
-
-    def _fix_sync_issues(self, vrew_script, mj_prompts, title_en):
+        return {
+            "title_en": data.get('title_en', ''),
+            "title_jp": data.get('title_jp', ''),
+            "description": data.get('description', ''),
+            "hashtags": ' '.join(data.get('hashtags', [])),
+            "editorial_notes": data.get('editorial_notes', ''),
+            "vrew_script": "\n".join(data.get('vrew_script', [])),
+            "script_jp_list": script_jp_list, # シーンごとの翻訳リスト
+            "mj_prompts_list": prompt_list,  # シーンごとのリスト
+            "sync_report": sync_report,  # 台本とプロンプトの対応付けの結果
+            "full_text": full_display_text  # 従来の表示用（後方互換性）
+        }
+
+    @staticmethod
+    def _script_error_result(e, raw_text):
+        return {
+            "title_en": "",
+            "title_jp": "",
+            "description": "",
+            "hashtags": "",
+            "editorial_notes": f"JSON解析エラー: {e}\\nRaw Response: {raw_text}",
+            "vrew_script": "",
+            "mj_prompts_list": [],
+            "full_text": f"JSON解析エラー: {e}\\nRaw Response: {raw_text}"
+        }
+
+    def _fix_sync_issues(self, vrew_script, mj_prompts, title_en, report=None):
         """
         AIが生成したスクリプトとプロンプトの同期ズレを補正する内部メソッド
-        よくあるパターン: プロンプトが1つ多い（タイトルカード用が含まれている）
+        キーワードの重なりで各行とプロンプトを対応付け（scene_aligner）、
+        余分なプロンプト（タイトルカードなど）は除き、プロンプトの無い行には仮のプロンプトを入れて
+        "missing": True を付ける（兼用されていたプロンプト、無ければ直前のシーンのもの）。
+        report に dict を渡すと対応付けの結果（inserted / missing / merged / confidence）を書き込む。
         """
-        len_script = len(vrew_script)
-        len_prompts = len(mj_prompts)
-
-        if len_script == len_prompts:
-            return mj_prompts
-
-        # パターンA: プロンプトが1つ多い (タイトルカードが先頭に含まれている可能性が高い)
-        if len_prompts == len_script + 1:
-            # 先頭のプロンプトがタイトルやイントロっぽいかチェック
-            first_prompt = mj_prompts[0].get('prompt', '').lower()
-            suspicious_keywords = ['title', 'intro', 'text', 'typography', title_en.lower()]
-            
-            is_title_card = any(k in first_prompt for k in suspicious_keywords)
-            
-            if is_title_card:
-                print("DEBUG: Detected possible Title Card prompt. Removing 1st prompt to sync with script.")
-                # シーン番号を振り直して返す
-                fixed_prompts = []
-                for i, p_data in enumerate(mj_prompts[1:], 1):
-                    p_data['scene'] = i
-                    fixed_prompts.append(p_data)
-                return fixed_prompts
-            
-            # 末尾が多い場合もあるかもしれないが、まずは先頭を疑う。
-            # それでもダメなら単純に長さ合わせを行う（下部）
-
-        # パターンB: どうしても合わない場合は、短い方に合わせる（クラッシュ防止）
-        print(f"WARNING: Sync mismatch detected. Script: {len_script}, Prompts: {len_prompts}. Truncating to min length.")
-        min_len = min(len_script, len_prompts)
-        
-        # プロンプトをスライスしてシーン番号を振り直し
+        prompt_texts = [p.get('prompt', '') if isinstance(p, dict) else str(p) for p in mj_prompts]
+        alignment = align_scenes(vrew_script, prompt_texts, title_en)
+        if report is not None:
+            report.update(alignment)
+
+        if alignment["inserted"] or alignment["missing"] or alignment["merged"]:
+            print(
+                f"WARNING: Sync mismatch detected. Script: {len(vrew_script)}, Prompts: {len(mj_prompts)}. "
+                f"Dropped prompts: {alignment['inserted']}, missing scenes: {alignment['missing']}, "
+                f"merged scenes: {alignment['merged']} (confidence {alignment['confidence']:.2f})"
+            )
+
+        # シーン番号を振り直して返す
         fixed_prompts = []
-        for i in range(min_len):
-            p_data = mj_prompts[i]
+        previous = ""
+        for i, j in enumerate(alignment["prompts"]):
+            if j is None:
+                fixed_prompts.append({"scene": i + 1, "prompt": previous, "missing": True})
+                continue
+            p_data = mj_prompts[j] if isinstance(mj_prompts[j], dict) else {"prompt": prompt_texts[j]}
             p_data['scene'] = i + 1
             fixed_prompts.append(p_data)
-            
+            previous = prompt_texts[j]
+        # 先頭から欠けている場合は最初に見つかったプロンプトで埋める
+        first = next((p["prompt"] for p in fixed_prompts if p["prompt"]), "")
+        for p_data in fixed_prompts:
+            if p_data["prompt"]:
+                break
+            p_data["prompt"] = first
         return fixed_prompts
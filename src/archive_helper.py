@@ -0,0 +1,28 @@
+import os
+import sys
+
+# `python src/archive_helper.py` で直接実行した場合でも src パッケージを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sheets_handler import get_sheets_handler
+
+
+def run_archive(days, dry_run=False):
+    """完了から days 日以上経過した行を「アーカイブ」タブへ移動"""
+    handler = get_sheets_handler()
+    rows = handler.archive_completed(days, dry_run=dry_run)
+    if dry_run:
+        print(f"[DRY RUN] {len(rows)} rows would be archived: {rows}")
+    else:
+        print(f"Archived {len(rows)} rows.")
+    return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python archive_helper.py <days> [--dry-run]")
+        sys.exit(1)
+
+    cmd_days = int(sys.argv[1])
+    cmd_dry_run = "--dry-run" in sys.argv[2:]
+    run_archive(cmd_days, dry_run=cmd_dry_run)
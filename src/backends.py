@@ -0,0 +1,389 @@
+"""
+外部サービス（Gemini・DeepL・Google Sheets）の接続方式の切り替え
+
+BACKEND_MODE:
+  live    通常どおり実際のサービスに接続する
+  record  実際のサービスに接続し、応答をフィクスチャ（BACKEND_FIXTURES_DIR）に保存する
+  replay  フィクスチャの応答を再生する（ネットワーク・APIキー不要）。
+          記録時の所要時間 × BACKEND_LATENCY_SCALE だけ待つので、処理時間の計測にも使える
+
+Gemini・DeepL はリクエスト内容（プロンプト・翻訳対象など）のハッシュごとに1ファイル、
+Sheets はスプレッドシートを開いた時点の全タブの値を1ファイルに保存する。
+Sheets の replay は保存した値を初期状態とするメモリ上のスプレッドシートで、書き込みもメモリ上に反映される。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+from src.config import Config
+
+BACKEND_MODES = ("live", "record", "replay")
+# Sheets のスナップショットに所要時間が無い場合の1呼び出しあたりの待ち時間（秒）
+DEFAULT_SHEETS_LATENCY = 0.2
+
+
+class ReplayMissError(LookupError):
+    """replay モードで、リクエストに対応するフィクスチャが無い場合の例外"""
+
+
+def backend_mode():
+    mode = (Config.BACKEND_MODE or "live").lower()
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Unknown BACKEND_MODE: {mode} (expected one of {', '.join(BACKEND_MODES)})")
+    return mode
+
+
+def simulate_latency(seconds):
+    """記録時の所要時間に BACKEND_LATENCY_SCALE を掛けた時間だけ待つ"""
+    delay = (seconds or 0) * Config.BACKEND_LATENCY_SCALE
+    if delay > 0:
+        time.sleep(delay)
+
+
+class FixtureStore:
+    """リクエストのハッシュをファイル名にして、サービスごとのディレクトリに応答を保存する"""
+
+    def __init__(self, service, root=None):
+        self.dir = os.path.join(root or Config.BACKEND_FIXTURES_DIR, service)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(request):
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, request):
+        return os.path.join(self.dir, f"{self.make_key(request)[:32]}.json")
+
+    def load(self, request):
+        path = self._path(request)
+        if not os.path.exists(path):
+            raise ReplayMissError(f"No recorded response in {self.dir} for request {self.make_key(request)[:12]}")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, request, response, latency):
+        entry = {"request": request, "response": response, "latency": latency, "recorded_at": time.time()}
+        with self.lock:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(self._path(request), "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+
+
+# --- Gemini ---
+
+def _usage_dict(usage_metadata):
+    usage = {}
+    for attr in ("prompt_token_count", "candidates_token_count"):
+        value = getattr(usage_metadata, attr, None)
+        usage[attr] = value if isinstance(value, int) else None
+    return usage
+
+
+def _gemini_request(model_name, prompt, generation_config):
+    return {"model": model_name, "prompt": prompt, "generation_config": generation_config}
+
+
+class RecordingGeminiModel:
+    """実際のモデルを呼び出し、応答（テキスト・チャンク・トークン数・所要時間）を保存する"""
+
+    def __init__(self, model, model_name, store=None):
+        self.model = model
+        self.model_name = model_name
+        self.store = store or FixtureStore("gemini")
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        request = _gemini_request(self.model_name, prompt, generation_config)
+        started = time.perf_counter()
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        if not stream:
+            self.store.save(request, {
+                "text": response.text,
+                "chunks": [response.text],
+                "usage": _usage_dict(getattr(response, "usage_metadata", None)),
+                "ttft": None,
+            }, time.perf_counter() - started)
+            return response
+        return _RecordingStream(response, request, started, self.store)
+
+
+class _RecordingStream:
+    """ストリーミング応答を読み進めながらチャンクを記録し、最後まで読んだ時点で保存する"""
+
+    def __init__(self, response, request, started, store):
+        self.response = response
+        self.request = request
+        self.started = started
+        self.store = store
+
+    def __iter__(self):
+        chunks, ttft = [], None
+        for chunk in self.response:
+            if ttft is None:
+                ttft = time.perf_counter() - self.started
+            chunks.append(chunk.text or "")
+            yield chunk
+        self.store.save(self.request, {
+            "text": "".join(chunks),
+            "chunks": chunks,
+            "usage": _usage_dict(self.usage_metadata),
+            "ttft": ttft,
+        }, time.perf_counter() - self.started)
+
+    @property
+    def usage_metadata(self):
+        return getattr(self.response, "usage_metadata", None)
+
+
+class ReplayGeminiResponse:
+    """記録した応答を generate_content のレスポンスと同じ形で返す"""
+
+    def __init__(self, entry):
+        response = entry["response"]
+        self.text = response["text"]
+        self.chunks = response.get("chunks") or [self.text]
+        self.usage_metadata = SimpleNamespace(**response.get("usage", {}))
+        self.latency = entry.get("latency") or 0.0
+        self.ttft = response.get("ttft")
+
+    def __iter__(self):
+        # 最初のチャンクまでは記録時の TTFT、残りは所要時間を均等に割って待つ
+        ttft = self.ttft if self.ttft is not None else self.latency
+        rest = max(0.0, self.latency - ttft) / max(1, len(self.chunks) - 1)
+        for i, chunk in enumerate(self.chunks):
+            simulate_latency(ttft if i == 0 else rest)
+            yield SimpleNamespace(text=chunk)
+
+
+class ReplayGeminiModel:
+    """保存した応答を再生するモデル（ネットワークに接続しない）"""
+
+    def __init__(self, model_name, store=None):
+        self.model_name = model_name
+        self.store = store or FixtureStore("gemini")
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        response = ReplayGeminiResponse(self.store.load(_gemini_request(self.model_name, prompt, generation_config)))
+        if not stream:
+            simulate_latency(response.latency)
+        return response
+
+
+def gemini_model(model, model_name):
+    """BACKEND_MODE に応じて genai.GenerativeModel をそのまま・記録付き・再生用のいずれかで返す"""
+    mode = backend_mode()
+    if mode == "record":
+        return RecordingGeminiModel(model, model_name)
+    if mode == "replay":
+        return ReplayGeminiModel(model_name)
+    return model
+
+
+# --- HTTP（DeepL） ---
+
+class ReplayHTTPResponse:
+    """記録した HTTP 応答（requests.Response の必要な部分だけ）"""
+
+    def __init__(self, entry):
+        response = entry["response"]
+        self.status_code = response["status_code"]
+        self.text = response["text"]
+        self.headers = response.get("headers", {})
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error (replayed)", response=self)
+
+
+def http_post(service, url, data, key_fields, session=None, **kwargs):
+    """
+    requests.post の代わりに使う（BACKEND_MODE に応じて記録・再生する）
+    key_fields: data のうちフィクスチャの照合に使う項目（APIキーなどは含めない）
+    session: 接続を使い回す requests.Session（省略時は requests.post）
+    """
+    post = session.post if session is not None else requests.post
+    mode = backend_mode()
+    if mode == "live":
+        return post(url, data=data, **kwargs)
+    store = FixtureStore(service)
+    # エンドポイント（Free/Pro）やAPIキーが違っても同じ内容なら同じフィクスチャを使う
+    request = {field: data.get(field) for field in key_fields}
+    if mode == "replay":
+        entry = store.load(request)
+        simulate_latency(entry.get("latency"))
+        return ReplayHTTPResponse(entry)
+    started = time.perf_counter()
+    response = post(url, data=data, **kwargs)
+    store.save(request, {
+        "status_code": response.status_code,
+        "text": response.text,
+        "headers": {k: v for k, v in response.headers.items() if k.lower() == "retry-after"},
+    }, time.perf_counter() - started)
+    return response
+
+
+# --- Google Sheets ---
+
+def _sheets_fixture_path(spreadsheet_id):
+    return os.path.join(Config.BACKEND_FIXTURES_DIR, "sheets", f"{spreadsheet_id or 'default'}.json")
+
+
+def record_spreadsheet(spreadsheet, spreadsheet_id):
+    """開いたスプレッドシートの全タブの値と、1回の読み取りの平均所要時間を保存する"""
+    worksheets, elapsed = [], []
+    for worksheet in spreadsheet.worksheets():
+        started = time.perf_counter()
+        values = worksheet.get_all_values()
+        elapsed.append(time.perf_counter() - started)
+        worksheets.append({"title": worksheet.title, "id": worksheet.id, "values": values})
+    path = _sheets_fixture_path(spreadsheet_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "worksheets": worksheets,
+            "latency": sum(elapsed) / len(elapsed) if elapsed else None,
+            "recorded_at": time.time(),
+        }, f, ensure_ascii=False, indent=2)
+
+
+class OfflineWorksheet:
+    """gspread の Worksheet のうち SheetsHandler が使う読み書きをメモリ上で再現する"""
+
+    def __init__(self, spreadsheet, title, sheet_id, values):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.values = [list(row) for row in values]
+
+    def _cell(self, row, col):
+        if row < len(self.values) and col < len(self.values[row]):
+            return self.values[row][col]
+        return ""
+
+    def _read(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        width = max((len(row) for row in self.values), default=0)
+        start_row = grid.get("startRowIndex", 0)
+        end_row = min(grid.get("endRowIndex", len(self.values)), len(self.values))
+        cols = range(grid.get("startColumnIndex", 0), grid.get("endColumnIndex", width))
+        rows = [[self._cell(r, c) for c in cols] for r in range(start_row, end_row)]
+        # Sheets API と同様に末尾の空セル・空行を詰める
+        rows = [row[:max([i + 1 for i, v in enumerate(row) if v] or [0])] for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def get(self, range_name, **kwargs):
+        self.spreadsheet.wait()
+        return self._read(range_name)
+
+    def batch_get(self, ranges, **kwargs):
+        self.spreadsheet.wait()
+        return [self._read(a1) for a1 in ranges]
+
+    def get_all_values(self, **kwargs):
+        self.spreadsheet.wait()
+        return [list(row) for row in self.values]
+
+    def batch_update(self, data, **kwargs):
+        self.spreadsheet.wait()
+        with self.spreadsheet.lock:
+            for item in data:
+                grid = a1_range_to_grid_range(item["range"])
+                for dr, row in enumerate(item["values"]):
+                    for dc, value in enumerate(row):
+                        r, c = grid.get("startRowIndex", 0) + dr, grid.get("startColumnIndex", 0) + dc
+                        while len(self.values) <= r:
+                            self.values.append([])
+                        while len(self.values[r]) <= c:
+                            self.values[r].append("")
+                        self.values[r][c] = value
+            self.spreadsheet.touch()
+        return {"totalUpdatedCells": sum(len(row) for item in data for row in item["values"])}
+
+    def append_rows(self, rows, **kwargs):
+        self.spreadsheet.wait()
+        with self.spreadsheet.lock:
+            # 末尾の空行の後ろに追加する（Sheets の append と同じ）
+            while self.values and not any(self.values[-1]):
+                self.values.pop()
+            start = len(self.values) + 1
+            self.values.extend(list(row) for row in rows)
+            self.spreadsheet.touch()
+        return {"updates": {"updatedRange": f"'{self.title}'!A{start}:F{len(self.values)}", "updatedRows": len(rows)}}
+
+
+class OfflineSpreadsheet:
+    """記録したスナップショットを初期状態とするメモリ上のスプレッドシート（書き込みは保存しない）"""
+
+    def __init__(self, worksheets, latency=None):
+        self.lock = threading.RLock()
+        self.latency = DEFAULT_SHEETS_LATENCY if latency is None else latency
+        self.revision = 0
+        self._worksheets = {}
+        for item in worksheets:
+            self._worksheets[item["title"]] = OfflineWorksheet(self, item["title"], item.get("id", 0), item["values"])
+
+    @classmethod
+    def from_fixture(cls, spreadsheet_id):
+        path = _sheets_fixture_path(spreadsheet_id)
+        if not os.path.exists(path):
+            raise ReplayMissError(f"No recorded spreadsheet at {path}")
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return cls(snapshot["worksheets"], snapshot.get("latency"))
+
+    def wait(self):
+        simulate_latency(self.latency)
+
+    def touch(self):
+        self.revision += 1
+
+    def worksheet(self, title):
+        self.wait()
+        if title not in self._worksheets:
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows, cols):
+        self.wait()
+        with self.lock:
+            sheet_id = max((ws.id for ws in self._worksheets.values()), default=-1) + 1
+            self._worksheets[title] = OfflineWorksheet(self, title, sheet_id, [])
+            self.touch()
+            return self._worksheets[title]
+
+    def get_lastUpdateTime(self):
+        self.wait()
+        return f"offline-{self.revision}"
+
+    def batch_update(self, body):
+        """行削除（deleteDimension）だけに対応"""
+        self.wait()
+        with self.lock:
+            sheets = {ws.id: ws for ws in self._worksheets.values()}
+            for request in body.get("requests", []):
+                r = request["deleteDimension"]["range"]
+                del sheets[r["sheetId"]].values[r["startIndex"]:r["endIndex"]]
+            self.touch()
+        return {}
+
+
+class OfflineSheetsClient:
+    """replay モードで gspread のクライアントの代わりに使う"""
+
+    def open_by_key(self, spreadsheet_id):
+        return OfflineSpreadsheet.from_fixture(spreadsheet_id)
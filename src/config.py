@@ -9,9 +9,79 @@ class Config:
     GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     AUTH_STATE_PATH = os.getenv("AUTH_STATE_PATH", "auth/state.json")
     DEEPL_API_KEY = os.getenv("DEEPL_API_KEY")
+    # シートの値のスナップショット（プロセス共有・読み取り範囲ごと）を確認なしで再利用する秒数。
+    # 経過後はスプレッドシートの更新時刻を確認し、変化が無ければ再ダウンロードせずに使い続ける（0で毎回確認）。
+    # 未処理行インデックスの差分読み取りの間隔にも使う
+    SHEETS_CACHE_TTL = float(os.getenv("SHEETS_CACHE_TTL", "60"))
+    # 未処理行インデックスを全体から作り直す間隔（秒）
+    SHEETS_INDEX_REBUILD_SEC = float(os.getenv("SHEETS_INDEX_REBUILD_SEC", "1800"))
+    # ローカルSQLiteミラー（1で有効）と同期間隔（秒）
+    SHEETS_MIRROR_ENABLED = os.getenv("SHEETS_MIRROR_ENABLED", "0") == "1"
+    SHEETS_MIRROR_SYNC_SEC = float(os.getenv("SHEETS_MIRROR_SYNC_SEC", "60"))
+    # Sheets API のクォータ（1分あたり・ユーザーごと）と 429/5xx の最大リトライ回数
+    SHEETS_READ_QUOTA_PER_MIN = int(os.getenv("SHEETS_READ_QUOTA_PER_MIN", "60"))
+    SHEETS_WRITE_QUOTA_PER_MIN = int(os.getenv("SHEETS_WRITE_QUOTA_PER_MIN", "60"))
+    SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+    # 完了から指定日数が過ぎた行を自動でアーカイブタブへ移動（0で無効）
+    SHEETS_ARCHIVE_AFTER_DAYS = int(os.getenv("SHEETS_ARCHIVE_AFTER_DAYS", "0"))
+    # 複数ワーカーで行を確保する際のリース期間と、書き込み後の確認までの待機（秒）
+    SHEETS_LEASE_SECONDS = int(os.getenv("SHEETS_LEASE_SECONDS", "3600"))
+    SHEETS_LEASE_SETTLE_SEC = float(os.getenv("SHEETS_LEASE_SETTLE_SEC", "1.0"))
+    # Gemini レスポンスのディスクキャッシュ（1で有効）と上限（件数・合計バイト数）
+    AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "0") == "1"
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "500"))
+    AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+    # バッチ生成の同時実行数と、Gemini 1リクエストあたりのタイムアウト（秒）
+    AI_BATCH_MAX_WORKERS = int(os.getenv("AI_BATCH_MAX_WORKERS", "4"))
+    AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "180"))
+    # 企画会議のプロンプトに載せる既存ネタの最大件数と、近似重複とみなす類似度（0〜1）
+    AI_IDEAS_TITLE_SAMPLE = int(os.getenv("AI_IDEAS_TITLE_SAMPLE", "100"))
+    TITLE_DUPLICATE_THRESHOLD = float(os.getenv("TITLE_DUPLICATE_THRESHOLD", "0.6"))
+    # Gemini の一時的なエラー（429/5xx/タイムアウト）の最大リトライ回数
+    AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+    # 用途ごとのモデルの振り分け（1で有効）: 企画・台本の優先モデル（空なら画面で選んだモデル）と代替モデル（カンマ区切り）
+    AI_ROUTING_ENABLED = os.getenv("AI_ROUTING_ENABLED", "0") == "1"
+    AI_MODEL_IDEAS = os.getenv("AI_MODEL_IDEAS", "")
+    AI_MODEL_SCRIPT = os.getenv("AI_MODEL_SCRIPT", "")
+    AI_FALLBACK_MODELS = os.getenv("AI_FALLBACK_MODELS", "gemini-2.5-flash")
+    # 応答待ちの予算（秒）。超えたら代替モデルも並行して呼ぶ（0で待つだけ）
+    AI_LATENCY_BUDGET_IDEAS = float(os.getenv("AI_LATENCY_BUDGET_IDEAS", "30"))
+    AI_LATENCY_BUDGET_SCRIPT = float(os.getenv("AI_LATENCY_BUDGET_SCRIPT", "90"))
+    # 直近のエラー率がこれを超えたモデルは後回しにする
+    AI_ROUTING_MAX_ERROR_RATE = float(os.getenv("AI_ROUTING_MAX_ERROR_RATE", "0.3"))
+    # 台本とプロンプトの対応付けで欠けたシーンのプロンプトだけを追加で生成する（0で無効）
+    AI_FILL_MISSING_PROMPTS = os.getenv("AI_FILL_MISSING_PROMPTS", "1") == "1"
+    # Gemini 呼び出しごとの計測値（トークン数・所要時間など）を JSONL に記録する（0で無効）
+    LLM_METRICS_ENABLED = os.getenv("LLM_METRICS_ENABLED", "1") == "1"
+    LLM_METRICS_PATH = os.getenv("LLM_METRICS_PATH", os.path.join("data", "llm_metrics.jsonl"))
+    # 台本の翻訳を別スレッドで生成と並行して行う（0で生成の後にまとめて翻訳）
+    AI_TRANSLATION_PIPELINE = os.getenv("AI_TRANSLATION_PIPELINE", "1") == "1"
+    # Mode B のシーン一覧で、表示中のページのシーンだけを翻訳する（0で全シーンを先に翻訳）と1ページのシーン数
+    TRANSLATION_LAZY = os.getenv("TRANSLATION_LAZY", "1") == "1"
+    SCENES_PER_PAGE = int(os.getenv("SCENES_PER_PAGE", "10"))
+    # DeepL API のタイムアウト（接続・読み取り、秒）、429/456/5xx・通信エラーの最大リトライ回数、接続プールの大きさ
+    DEEPL_CONNECT_TIMEOUT = float(os.getenv("DEEPL_CONNECT_TIMEOUT", "5"))
+    DEEPL_READ_TIMEOUT = float(os.getenv("DEEPL_READ_TIMEOUT", "30"))
+    DEEPL_MAX_RETRIES = int(os.getenv("DEEPL_MAX_RETRIES", "3"))
+    DEEPL_POOL_SIZE = int(os.getenv("DEEPL_POOL_SIZE", "4"))
+    # DeepL の翻訳メモリ（SQLite、0で無効）と上限（件数・合計バイト数）
+    TRANSLATION_MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "1") == "1"
+    TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join("data", "translation_memory.db"))
+    TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "20000"))
+    TRANSLATION_MEMORY_MAX_BYTES = int(os.getenv("TRANSLATION_MEMORY_MAX_BYTES", str(20 * 1024 * 1024)))
+    # 用語集の版（変更すると、それ以前に保存した訳は翻訳メモリから使われなくなる）
+    DEEPL_GLOSSARY_VERSION = os.getenv("DEEPL_GLOSSARY_VERSION", "")
+    # 外部サービス（Gemini・DeepL・Sheets）の接続方式: live / record（応答をフィクスチャに保存）/ replay（フィクスチャを再生）
+    BACKEND_MODE = os.getenv("BACKEND_MODE", "live")
+    BACKEND_FIXTURES_DIR = os.getenv("BACKEND_FIXTURES_DIR", os.path.join("data", "fixtures"))
+    # replay 時に記録時の所要時間に掛ける倍率（0で待たない）
+    BACKEND_LATENCY_SCALE = float(os.getenv("BACKEND_LATENCY_SCALE", "1.0"))
 
     @classmethod
     def validate(cls):
+        # replay モードではAPIキー・認証情報を使わない
+        if cls.BACKEND_MODE == "replay":
+            return
         missing = []
         if not cls.GEMINI_API_KEY:
             missing.append("GEMINI_API_KEY")
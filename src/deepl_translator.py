@@ -1,31 +1,249 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote_plus
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from src.backends import http_post
 from src.config import Config
+from src.translation_memory import TranslationMemory
+
+# DeepL API の1リクエストあたりの上限（text パラメータの数・リクエスト全体のサイズ）
+MAX_TEXTS_PER_REQUEST = 50
+MAX_REQUEST_BYTES = 128 * 1024
+# auth_key・target_lang などテキスト以外の分として見込むバイト数
+REQUEST_OVERHEAD_BYTES = 1024
+# 再試行する HTTP ステータス（429: レート制限 / 456: 文字数クォータ超過 / 5xx: サーバーエラー）
+RETRY_STATUSES = {429, 456, 500, 502, 503, 504, 529}
+# リクエストの内容を受け付けなかったことを示す HTTP ステータス（400: 不正なパラメータ / 413: 大きすぎる / 414: URI が長すぎる）
+# このときだけ1行ずつ送り直す（障害・クォータ超過で送り直してもリクエストが増えるだけ）
+REJECTED_STATUSES = {400, 413, 414}
+# 再試行の待ち時間の上限（秒）。Retry-After がこれより長い場合も切り詰める
+MAX_RETRY_DELAY = 60.0
+
+
+class TranslationError(Exception):
+    """
+    DeepL での翻訳の失敗（status_code は HTTP ステータス、通信エラー時は None）
+    rejected: 送った内容そのものが受け付けられなかった（行を分けて送り直せば通る可能性がある）
+    """
+
+    def __init__(self, message, status_code=None, rejected=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.rejected = status_code in REJECTED_STATUSES if rejected is None else rejected
+
+
+class PartialTranslationError(TranslationError):
+    """translate_batch で一部の行だけ翻訳できなかった（results は失敗した行を "" にした結果）"""
+
+    def __init__(self, message, results, failed, status_code=None):
+        super().__init__(message, status_code=status_code, rejected=False)
+        self.results = results
+        self.failed = failed
+
+
+def retry_after_seconds(response):
+    """Retry-After ヘッダー（秒数または HTTP 日付）を秒数にする（無い・解釈できない場合は None）"""
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 class DeepLTranslator:
-    def __init__(self):
-        self.api_key = Config.DEEPL_API_KEY
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, use_memory=None, memory=None, glossary_version=None):
+        self.api_key = Config.DEEPL_API_KEY or ""
+        # 翻訳メモリ（同じ原文は DeepL を呼ばずに保存済みの訳を返す）
+        if use_memory is None:
+            use_memory = Config.TRANSLATION_MEMORY_ENABLED
+        self.memory = memory if memory is not None else (TranslationMemory() if use_memory else None)
+        self.glossary_version = Config.DEEPL_GLOSSARY_VERSION if glossary_version is None else glossary_version
         # Free API endpoints usually end with :fx
         if self.api_key.endswith(":fx"):
             self.url = "https://api-free.deepl.com/v2/translate"
         else:
             self.url = "https://api.deepl.com/v2/translate"
 
+    @classmethod
+    def session(cls):
+        """
+        プロセス全体で共有する requests.Session
+        Keep-Alive で TLS 接続を使い回す（Streamlit の再実行・複数スレッドからの呼び出しでも共有）
+        """
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=Config.DEEPL_POOL_SIZE)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+
+    def _post(self, params):
+        """
+        DeepL API に POST し、429/456/5xx・通信エラーは指数バックオフ（ジッター付き）で再試行する
+        Retry-After があればその秒数だけ待つ。
+        Raises:
+            TranslationError: 再試行しても成功しない、または再試行しないエラー（400/403 など）
+        """
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = http_post(
+                    "deepl", self.url, params, key_fields=("text", "target_lang"), session=self.session(),
+                    timeout=(Config.DEEPL_CONNECT_TIMEOUT, Config.DEEPL_READ_TIMEOUT),
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = TranslationError(f"DeepL request failed: {type(e).__name__}: {e}")
+            else:
+                if response.status_code < 400:
+                    return response
+                error = TranslationError(f"DeepL API returned {response.status_code}", status_code=response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+            if attempt >= Config.DEEPL_MAX_RETRIES:
+                raise error
+            attempt += 1
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempt))
+            delay = min(delay, MAX_RETRY_DELAY)
+            print(f"{error}. Retrying in {delay:.1f}s ({attempt}/{Config.DEEPL_MAX_RETRIES}).")
+            time.sleep(delay)
+
     def translate(self, text, target_lang="JA"):
-        """Translate text using DeepL API."""
+        """
+        Translate text using DeepL API.
+        Raises:
+            TranslationError: 翻訳できなかった場合
+        """
         if not text:
             return ""
-        
+        cached = self._recall([text], target_lang)
+        if text in cached:
+            return cached[text]
+        return self._translate_one(text, target_lang)
+
+    def _translate_one(self, text, target_lang):
         params = {
             "auth_key": self.api_key,
             "text": text,
             "target_lang": target_lang
         }
         
+        response = self._post(params)
+        try:
+            translated = response.json()["translations"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise TranslationError(f"Unexpected DeepL response: {e}", status_code=response.status_code) from e
+        self._memorize({text: translated}, target_lang)
+        return translated
+
+    def translate_batch(self, lines, target_lang="JA"):
+        """
+        複数行をまとめて翻訳（text パラメータを複数付けて1リクエストで送る）
+        入力と同じ順序・長さのリストを返す。空行は翻訳せず "" のまま。
+        翻訳メモリにある行と、同じ行の2回目以降は送らない。
+        DeepL がチャンクの内容を受け付けなかった場合（400/413 など）だけ、そのチャンクを1行ずつ送り直す。
+        Raises:
+            PartialTranslationError: 翻訳できなかった行がある場合（翻訳できた行は results に入る）。
+                通信エラーや 429/456/5xx で再試行を使い切った場合は、残りの行を送らずにすぐに送出する
+        """
+        texts = list(dict.fromkeys(line for line in lines if line and line.strip()))
+        translations = self._recall(texts, target_lang)
+        errors = {}
+        try:
+            for chunk in self._chunks([text for text in texts if text not in translations]):
+                try:
+                    translations.update(zip(chunk, self._translate_texts(chunk, target_lang)))
+                    continue
+                except TranslationError as e:
+                    if not e.rejected:
+                        raise
+                    print(f"DeepL Batch Translation Error: {e}. Falling back to per-line translation.")
+                for text in chunk:
+                    try:
+                        translations[text] = self._translate_one(text, target_lang)
+                    except TranslationError as e:
+                        # その行だけの問題なら残りの行は続ける（障害なら打ち切る）
+                        if not e.rejected:
+                            raise
+                        errors[text] = e
+        except TranslationError as e:
+            results = [translations.get(line, "") if line and line.strip() else "" for line in lines]
+            failed = [i for i, line in enumerate(lines) if line and line.strip() and line not in translations]
+            raise PartialTranslationError(
+                f"Translation aborted with {len(failed)} of {len(lines)} lines untranslated ({e})",
+                results, failed, status_code=e.status_code,
+            ) from e
+        results = [translations.get(line, "") if line and line.strip() else "" for line in lines]
+        if errors:
+            failed = [i for i, line in enumerate(lines) if line in errors]
+            raise PartialTranslationError(
+                f"{len(failed)} of {len(lines)} lines could not be translated ({next(iter(errors.values()))})",
+                results, failed,
+            )
+        return results
+
+    def _recall(self, texts, target_lang):
+        """翻訳メモリから保存済みの訳を取得（メモリの障害時は空として扱う）"""
+        if self.memory is None or not texts:
+            return {}
+        try:
+            return self.memory.lookup(texts, target_lang, self.glossary_version)
+        except Exception as e:
+            print(f"Translation memory error: {e}")
+            return {}
+
+    def _memorize(self, translations, target_lang):
+        if self.memory is None:
+            return
         try:
-            response = requests.post(self.url, data=params)
-            response.raise_for_status()
-            result = response.json()
-            return result["translations"][0]["text"]
+            self.memory.store(translations, target_lang, self.glossary_version)
         except Exception as e:
-            print(f"DeepL Translation Error: {e}")
-            return f"[Translation Error] {text}"
+            print(f"Translation memory error: {e}")
+
+    def _translate_texts(self, texts, target_lang):
+        params = {
+            "auth_key": self.api_key,
+            "text": texts,
+            "target_lang": target_lang
+        }
+        response = self._post(params)
+        try:
+            translations = [t["text"] for t in response.json()["translations"]]
+        except (ValueError, KeyError, TypeError) as e:
+            raise TranslationError(f"Unexpected DeepL response: {e}", status_code=response.status_code,
+                                   rejected=True) from e
+        if len(translations) != len(texts):
+            raise TranslationError(f"Expected {len(texts)} translations, got {len(translations)}", rejected=True)
+        self._memorize(dict(zip(texts, translations)), target_lang)
+        return translations
+
+    @staticmethod
+    def _chunks(texts):
+        """テキストのリストを件数・サイズの上限内のチャンクに分ける（上限を超える1行はそれだけで送る）"""
+        chunk, size = [], REQUEST_OVERHEAD_BYTES
+        for item in texts:
+            item_size = len("&text=") + len(quote_plus(item))
+            if chunk and (len(chunk) >= MAX_TEXTS_PER_REQUEST or size + item_size > MAX_REQUEST_BYTES):
+                yield chunk
+                chunk, size = [], REQUEST_OVERHEAD_BYTES
+            chunk.append(item)
+            size += item_size
+        if chunk:
+            yield chunk
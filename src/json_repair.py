@@ -0,0 +1,245 @@
+import json
+import re
+
+
+class JSONRepairError(ValueError):
+    """モデル出力からJSONを復元できなかった場合の例外"""
+
+
+# 文字列中にそのまま入っていた制御文字の置き換え
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+# 内容の一部が失われる修復（このレスポンスはキャッシュしない）
+LOSSY_REPAIRS = ("truncated", "salvaged")
+# 各モデル出力のスキーマ（フィールド -> 型）
+IDEAS_SCHEMA = {"discussion": str, "ideas": list}
+SCRIPT_SCHEMA = {
+    "editorial_notes": str,
+    "title_en": str,
+    "title_jp": str,
+    "description": str,
+    "hashtags": list,
+    "vrew_script": list,
+    "mj_prompts": list,
+}
+SCENES_SCHEMA = {"scenes": list}
+
+
+def _next_significant(text, i):
+    """i 以降で最初の空白以外の文字（無ければ空文字）"""
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return text[i] if i < len(text) else ""
+
+
+def repair_json(text):
+    """
+    text の先頭の { または [ から始まるJSONを、括弧の対応を追いながら1パスで修復する
+
+    - ルートの値が閉じた時点で終了（後ろに続く解説文などは無視）
+    - 閉じ括弧の直前のカンマを削除
+    - 文字列中の改行・タブをエスケープ、文字列中のエスケープされていない引用符をエスケープ
+    - 途中で途切れている場合は、最後に完成した値の位置まで戻して括弧を閉じる
+      （配列の要素のオブジェクトが途中までしか無い場合は、その要素ごと捨てる）
+
+    Returns:
+        Tuple[str, List[str]]: (修復後のJSONテキスト, 適用した修復の名前のリスト)
+    """
+    out = []
+    stack = []  # [括弧の種類, キー待ちか]
+    repairs = []
+    in_string = False
+    escape = False
+    string_is_key = False
+    safe = None  # (出力の長さ, スタックの括弧の並び)
+
+    def mark_safe():
+        nonlocal safe
+        brackets = [frame[0] for frame in stack]
+        # 配列の中のオブジェクトの途中は戻り先にしない
+        if "[" in brackets and "{" in brackets[brackets.index("[") + 1:]:
+            return
+        safe = (len(out), brackets)
+
+    def strip_trailing_comma():
+        while out and out[-1] in " \t\r\n":
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+            repairs.append("trailing_comma")
+
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(c)
+            elif c == "\\":
+                escape = True
+                out.append(c)
+            elif c == '"':
+                # 閉じ引用符の後ろが区切り文字でなければ、文字列中の引用符とみなしてエスケープ
+                following = _next_significant(text, i + 1)
+                expected = ":" if string_is_key else ",}]"
+                if following and following not in expected:
+                    out.append('\\"')
+                    repairs.append("unescaped_quote")
+                else:
+                    out.append(c)
+                    in_string = False
+                    if not string_is_key:
+                        mark_safe()
+            elif c in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[c])
+                repairs.append("control_char")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1][0] == "{" and stack[-1][1]
+            out.append(c)
+        elif c in "{[":
+            stack.append([c, c == "{"])
+            out.append(c)
+            mark_safe()
+        elif c in "}]":
+            if not stack or _CLOSERS[stack[-1][0]] != c:
+                i += 1
+                continue  # 対応しない閉じ括弧は捨てる
+            strip_trailing_comma()
+            stack.pop()
+            out.append(c)
+            if not stack:
+                return "".join(out), repairs
+            mark_safe()
+        elif c == ",":
+            if stack and stack[-1][0] == "{":
+                stack[-1][1] = True
+            mark_safe()
+            out.append(c)
+        elif c == ":":
+            if stack and stack[-1][0] == "{":
+                stack[-1][1] = False
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+
+    # 途中で途切れている：最後に完成した値の位置まで戻して閉じる
+    if safe is None:
+        raise JSONRepairError("No complete JSON value found")
+    length, open_brackets = safe
+    del out[length:]
+    strip_trailing_comma()
+    out.extend(_CLOSERS[b] for b in reversed(open_brackets))
+    repairs.append("truncated")
+    return "".join(out), repairs
+
+
+def _scan(text, schema=None, max_starts=5):
+    """{ が現れる位置から順に修復を試し、最初に解析できたもの（schema があればそのフィールドを含むもの）を返す"""
+    start = text.find("{")
+    attempts = 0
+    while start != -1 and attempts < max_starts:
+        attempts += 1
+        try:
+            repaired, repairs = repair_json(text[start:])
+            data = json.loads(repaired)
+            if isinstance(data, dict) and (not schema or any(field in data for field in schema)):
+                # 前後に解説文や ``` の囲みがあった
+                if text[:start].strip() or ("truncated" not in repairs and not text.rstrip().endswith("}")):
+                    repairs.insert(0, "extracted")
+                return data, repairs
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None, []
+
+
+def _string_literal(text):
+    """text の先頭の文字列リテラルを閉じ引用符まで切り出す（途切れていれば閉じる）"""
+    escape = False
+    for i in range(1, len(text)):
+        if escape:
+            escape = False
+        elif text[i] == "\\":
+            escape = True
+        elif text[i] == '"':
+            return text[:i + 1]
+    return text.rstrip("\\") + '"'
+
+
+def _salvage_fields(text, schema):
+    """全体を解析できない場合に、スキーマのフィールドを1つずつ探して取り出す"""
+    data = {}
+    for field in schema:
+        match = re.search(r'"%s"\s*:\s*' % re.escape(field), text)
+        if not match:
+            continue
+        rest = text[match.end():]
+        try:
+            if rest.startswith('"'):
+                repaired, _ = repair_json("[" + _string_literal(rest) + "]")
+                data[field] = json.loads(repaired)[0]
+            elif rest[:1] in ("[", "{"):
+                data[field] = json.loads(repair_json(rest)[0])
+        except ValueError:
+            continue
+    return data or None
+
+
+def _conform(data, schema):
+    """スキーマに合わせて欠けたフィールドを補い、型の違いを直す"""
+    repairs = []
+    for field, field_type in schema.items():
+        value = data.get(field)
+        if value is None:
+            data[field] = field_type()
+            repairs.append(f"missing:{field}")
+        elif not isinstance(value, field_type):
+            if field_type is list and isinstance(value, str):
+                data[field] = [line.strip() for line in value.splitlines() if line.strip()]
+            elif field_type is str and isinstance(value, list):
+                data[field] = "\n".join(str(v) for v in value)
+            else:
+                data[field] = field_type(value) if field_type is str else [value]
+            repairs.append(f"coerced:{field}")
+    return repairs
+
+
+def extract_json(text, schema=None):
+    """
+    モデル出力からJSONオブジェクトを取り出す（前後の解説文・```json の囲み・軽微な崩れに対応）
+
+    1. そのまま json.loads
+    2. 括弧の対応を追って抽出し、末尾カンマ・改行・途切れなどを修復
+    3. それでも駄目なら schema のフィールドを個別に回収
+    最後に schema に合わせて欠けたフィールドを補う。
+
+    Returns:
+        Tuple[dict, List[str]]: (データ, 適用した修復の名前のリスト。そのまま読めた場合は空)
+    Raises:
+        JSONRepairError: 何も回収できなかった場合
+    """
+    text = text or ""
+    data, repairs = None, []
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        data, repairs = _scan(text, schema)
+    if data is None and schema:
+        data = _salvage_fields(text, schema)
+        repairs = ["salvaged"]
+    if data is None:
+        raise JSONRepairError(f"Could not extract JSON from model output ({len(text)} chars)")
+    if schema:
+        repairs += _conform(data, schema)
+    return data, list(dict.fromkeys(repairs))
@@ -0,0 +1,137 @@
+import json
+
+
+class IncrementalJSONParser:
+    """
+    ストリームで少しずつ届くJSONテキストを逐次解析し、完成した値から順に取り出すパーサー
+
+    ルートのオブジェクトの各フィールドと、フィールドが配列の場合はその各要素を
+    完成した時点で (path, value) として返す。
+      - ("title_en",)      -> "English Title"
+      - ("vrew_script", 0) -> "English line 1"
+      - ("vrew_script",)   -> 配列全体（閉じ括弧が届いた時点）
+    ルートより前の文字（```json など）は読み飛ばす。
+    末尾カンマなど JSON として解釈できない箇所に達した場合は failed を True にして以降の解析をやめる
+    （result は None のまま。全文の修復は呼び出し側で json_repair.extract_json に任せる）。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.string_is_key = False
+        self.prim_start = None
+        self.root_start = None
+        self.done = False
+        self.failed = False
+        self.result = None
+
+    def feed(self, chunk):
+        """テキスト片を追加し、新たに完成した (path, value) のリストを返す"""
+        self.buffer += chunk
+        events = []
+        while self.pos < len(self.buffer) and not self.done:
+            try:
+                self._step(self.buffer[self.pos], self.pos, events)
+            except (ValueError, IndexError, KeyError):
+                # 壊れたJSON（末尾カンマ・不正なエスケープ・括弧の不一致など）：以降は何も返さない
+                self.failed = True
+                self.done = True
+                self.result = None
+                break
+            self.pos += 1
+        return events
+
+    def _path(self):
+        """現在のコンテナ内で完成した値のパス（取り出し対象外なら None）"""
+        if len(self.stack) == 1 and self.stack[0]["type"] == "{":
+            return (self.stack[0]["key"],)
+        if len(self.stack) == 2 and self.stack[0]["type"] == "{" and self.stack[1]["type"] == "[":
+            return (self.stack[0]["key"], self.stack[1]["index"])
+        return None
+
+    def _begin_value(self, i):
+        if self.stack:
+            self.stack[-1]["start"] = i
+
+    def _end_value(self, end, events):
+        """値の末尾（end は排他的）に達したときの処理"""
+        if not self.stack:
+            return
+        frame = self.stack[-1]
+        path = self._path()
+        if path is not None and frame["start"] is not None:
+            try:
+                events.append((path, json.loads(self.buffer[frame["start"]:end])))
+            except ValueError:
+                pass
+        frame["start"] = None
+
+    def _end_primitive(self, i, events):
+        if self.prim_start is not None:
+            self.prim_start = None
+            self._end_value(i, events)
+
+    def _step(self, c, i, events):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif c == "\\":
+                self.escape = True
+            elif c == '"':
+                self.in_string = False
+                if self.string_is_key:
+                    self.stack[-1]["key"] = json.loads(self.buffer[self.string_start:i + 1])
+                else:
+                    self._end_value(i + 1, events)
+            return
+
+        if self.root_start is None:
+            # ルートのオブジェクトが始まるまでは読み飛ばす
+            if c == "{":
+                self.root_start = i
+                self.stack.append({"type": "{", "key": None, "start": None})
+            return
+
+        if c in " \t\r\n":
+            self._end_primitive(i, events)
+            return
+        if c in ",}]":
+            self._end_primitive(i, events)
+            frame = self.stack[-1]
+            if c == ",":
+                if frame["type"] == "[":
+                    frame["index"] += 1
+                else:
+                    frame["key"] = None
+                return
+            self.stack.pop()
+            if not self.stack:
+                self.done = True
+                self.result = json.loads(self.buffer[self.root_start:i + 1])
+                return
+            self._end_value(i + 1, events)
+            return
+        if c == ":":
+            return
+
+        frame = self.stack[-1]
+        if c == '"':
+            self.in_string = True
+            self.string_start = i
+            self.string_is_key = frame["type"] == "{" and frame["key"] is None
+            if not self.string_is_key:
+                self._begin_value(i)
+        elif c in "{[":
+            self._begin_value(i)
+            if c == "{":
+                self.stack.append({"type": "{", "key": None, "start": None})
+            else:
+                self.stack.append({"type": "[", "index": 0, "start": None})
+        elif self.prim_start is None:
+            # 数値・true/false/null
+            self.prim_start = i
+            self._begin_value(i)
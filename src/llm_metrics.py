@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+
+from src.config import Config
+
+# 参考価格（USD / 100万トークン、入力・出力）。料金改定時はここを更新する
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-3-flash-preview": (0.50, 3.00),
+}
+
+
+def estimate_cost(model, prompt_tokens, response_tokens):
+    """トークン数から概算コスト（USD）を計算（価格が不明なモデルは None）"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None or prompt_tokens is None or response_tokens is None:
+        return None
+    return (prompt_tokens * prices[0] + response_tokens * prices[1]) / 1_000_000
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class LLMMetrics:
+    """
+    Gemini 呼び出しごとの計測値（モデル・トークン数・所要時間・TTFT・リトライ・解析結果）を
+    JSONL ファイルに1行ずつ追記し、画面表示用に集計する
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.LLM_METRICS_PATH
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def record(self, entry):
+        entry = dict(entry, ts=entry.get("ts") or time.time())
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def records(self, since=None, limit=5000):
+        """新しいものから最大 limit 件（since は UNIX 時刻）を古い順に返す"""
+        if not os.path.exists(self.path):
+            return []
+        with self.lock:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()[-limit:]
+        entries = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since is None or entry.get("ts", 0) >= since:
+                entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _aggregate(entries):
+        calls = [e for e in entries if not e.get("cache_hit")]
+        walls = [e["wall_time"] for e in calls if e.get("wall_time") is not None]
+        ttfts = [e["ttft"] for e in calls if e.get("ttft") is not None]
+        costs = [e["cost_usd"] for e in calls if e.get("cost_usd") is not None]
+        return {
+            "calls": len(entries),
+            "cache_hits": len(entries) - len(calls),
+            "errors": sum(1 for e in entries if e.get("error")),
+            "repaired": sum(1 for e in entries if e.get("parse") in ("repaired", "salvaged")),
+            "retries": sum(e.get("retries", 0) for e in entries),
+            "hedged": sum(1 for e in entries if (e.get("route") or {}).get("hedged")),
+            "failovers": sum(len((e.get("route") or {}).get("failovers", [])) for e in entries),
+            "avg_wall_time": sum(walls) / len(walls) if walls else None,
+            "p95_wall_time": _percentile(walls, 95),
+            "avg_ttft": sum(ttfts) / len(ttfts) if ttfts else None,
+            "prompt_tokens": sum(e.get("prompt_tokens") or 0 for e in calls),
+            "response_tokens": sum(e.get("response_tokens") or 0 for e in calls),
+            "cost_usd": sum(costs),
+        }
+
+    def summary(self, since=None):
+        """全体とモデル別の集計 {"total": {...}, "by_model": {model: {...}}}"""
+        entries = self.records(since=since)
+        by_model = {}
+        for entry in entries:
+            by_model.setdefault(entry.get("model"), []).append(entry)
+        return {
+            "total": self._aggregate(entries),
+            "by_model": {model: self._aggregate(items) for model, items in by_model.items()},
+        }
+
+
+class LLMCall:
+    """1回の generate_content 呼び出し（リトライ・キャッシュヒットを含む）の計測値"""
+
+    def __init__(self, metrics, operation, model, prompt):
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.finished = False
+        self.entry = {
+            "operation": operation,
+            "model": model,
+            "prompt_chars": len(prompt),
+            "prompt_tokens": None,
+            "response_tokens": None,
+            "wall_time": None,
+            "ttft": None,
+            "retries": 0,
+            "cache_hit": False,
+            "parse": None,
+            "repairs": [],
+            "error": None,
+        }
+
+    def retried(self):
+        self.entry["retries"] += 1
+
+    def routed(self, model, decision):
+        """ModelRouter が選んだモデルと振り分けの記録（候補・ヘッジ・切り替え）"""
+        self.entry["model"] = model
+        self.entry["route"] = decision
+
+    def cache_hit(self):
+        self.entry["cache_hit"] = True
+
+    def first_token(self):
+        """ストリーミングで最初のテキストが届いた時刻を記録"""
+        if self.entry["ttft"] is None:
+            self.entry["ttft"] = time.perf_counter() - self.started
+
+    def usage(self, usage_metadata):
+        """response.usage_metadata からトークン数を記録"""
+        if usage_metadata is None:
+            return
+        for key, attr in (("prompt_tokens", "prompt_token_count"), ("response_tokens", "candidates_token_count")):
+            value = getattr(usage_metadata, attr, None)
+            self.entry[key] = value if isinstance(value, int) else None
+
+    def parsed(self, repairs, lossy=False):
+        self.entry["repairs"] = list(repairs)
+        self.entry["parse"] = "salvaged" if lossy else ("repaired" if repairs else "ok")
+
+    def failed(self, error):
+        if self.entry["parse"] is None:
+            self.entry["parse"] = "error"
+        self.entry["error"] = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        """計測を確定してメトリクスに書き込む（2回目以降は何もしない）"""
+        if self.finished:
+            return
+        self.finished = True
+        self.entry["wall_time"] = time.perf_counter() - self.started
+        self.entry["cost_usd"] = estimate_cost(
+            self.entry["model"], self.entry["prompt_tokens"], self.entry["response_tokens"]
+        )
+        if self.metrics is None:
+            return
+        try:
+            self.metrics.record(self.entry)
+        except Exception as e:
+            print(f"LLM metrics write error: {e}")
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.config import Config
+from src.llm_metrics import _percentile
+
+# 生成の種類（LLMCall の operation）-> 振り分けの単位
+TASK_OF_OPERATION = {
+    "ideas": "ideas",
+    "script": "script",
+    "script_stream": "script",
+    "regenerate_scenes": "script",
+}
+
+
+def task_of(operation):
+    return TASK_OF_OPERATION.get(operation, operation)
+
+
+class ModelHealth:
+    """モデル・用途ごとの直近の呼び出し結果（所要時間・成否）"""
+
+    def __init__(self, window=20):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, latency, ok):
+        with self.lock:
+            self.samples.append((latency, ok))
+
+    def snapshot(self):
+        with self.lock:
+            samples = list(self.samples)
+        return {
+            "calls": len(samples),
+            "error_rate": sum(1 for _, ok in samples if not ok) / len(samples) if samples else None,
+            "p95_latency": _percentile([latency for latency, ok in samples if ok], 95),
+        }
+
+
+class ModelRouter:
+    """
+    用途（企画 / 台本）ごとの優先モデルと代替モデルの振り分け
+
+    - 直近のエラー率が AI_ROUTING_MAX_ERROR_RATE を超えた、または p95 が予算を超えたモデルは後回しにする
+    - 優先モデルが予算（AI_LATENCY_BUDGET_*）内に応答しなければ、次のモデルも並行して呼び（ヘッジ）、先に成功した方を使う
+    - エラーになったモデルは即座に次のモデルへ切り替える（フェイルオーバー）
+    呼び出し結果はプロセス内で共有し、インスタンスを作り直しても引き継ぐ。
+    """
+
+    _health = {}
+    _health_lock = threading.Lock()
+
+    def __init__(self, task_models=None, fallback_models=None, budgets=None, max_error_rate=None, min_samples=5):
+        self.task_models = dict(task_models or {})
+        self.fallback_models = list(fallback_models or [])
+        self.budgets = {
+            "ideas": Config.AI_LATENCY_BUDGET_IDEAS,
+            "script": Config.AI_LATENCY_BUDGET_SCRIPT,
+            **(budgets or {}),
+        }
+        self.max_error_rate = Config.AI_ROUTING_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_config(cls, default_model):
+        """Config（AI_MODEL_IDEAS / AI_MODEL_SCRIPT / AI_FALLBACK_MODELS）から作る"""
+        return cls(
+            task_models={"ideas": Config.AI_MODEL_IDEAS or default_model, "script": Config.AI_MODEL_SCRIPT or default_model},
+            fallback_models=[m.strip() for m in Config.AI_FALLBACK_MODELS.split(",") if m.strip()],
+        )
+
+    @classmethod
+    def reset_health(cls):
+        with cls._health_lock:
+            cls._health.clear()
+
+    def health(self, model, task):
+        with self._health_lock:
+            if (model, task) not in self._health:
+                self._health[(model, task)] = ModelHealth()
+            return self._health[(model, task)]
+
+    def record(self, model, task, latency, ok):
+        self.health(model, task).add(latency, ok)
+
+    def degraded_reason(self, model, task):
+        """後回しにすべきモデルならその理由（問題が無ければ None）"""
+        stats = self.health(model, task).snapshot()
+        if stats["calls"] < self.min_samples:
+            return None
+        if stats["error_rate"] > self.max_error_rate:
+            return f"error rate {stats['error_rate']:.0%}"
+        budget = self.budgets.get(task)
+        if budget and stats["p95_latency"] is not None and stats["p95_latency"] > budget:
+            return f"p95 {stats['p95_latency']:.1f}s > {budget:.0f}s"
+        return None
+
+    def candidates(self, task, default_model):
+        """
+        呼び出す順に並べたモデルのリストと、後回しにしたモデルの理由を返す
+        Returns:
+            Tuple[List[str], Dict[str, str]]
+        """
+        models = []
+        for model in [self.task_models.get(task) or default_model] + self.fallback_models:
+            if model and model not in models:
+                models.append(model)
+        demoted = {}
+        for model in models:
+            reason = self.degraded_reason(model, task)
+            if reason:
+                demoted[model] = reason
+        # 問題の無いモデルを先に（同じ扱いのモデル同士は元の順序のまま）
+        models.sort(key=lambda m: m in demoted)
+        return models, demoted
+
+    def run(self, operation, default_model, fn, hedge=True, record_success=True):
+        """
+        fn(model, is_last) を振り分けのポリシーに従って実行する
+        ストリーミングでは hedge=False, record_success=False とし、読み終えた時点で record() する
+
+        Returns:
+            Tuple[結果, 応答したモデル, 振り分けの記録 dict]
+        Raises:
+            全てのモデルが失敗した場合は最後の例外
+        """
+        task = task_of(operation)
+        models, demoted = self.candidates(task, default_model)
+        budget = self.budgets.get(task)
+        decision = {"task": task, "candidates": models, "demoted": demoted, "hedged": False, "failovers": []}
+        executor = ThreadPoolExecutor(max_workers=len(models))
+        pending = {}
+        errors = []
+        launched = 0
+
+        def timed(model, is_last):
+            started = time.perf_counter()
+            try:
+                result = fn(model, is_last)
+            except Exception:
+                self.record(model, task, time.perf_counter() - started, False)
+                raise
+            if record_success:
+                self.record(model, task, time.perf_counter() - started, True)
+            return result
+
+        def launch():
+            nonlocal launched
+            model = models[launched]
+            launched += 1
+            pending[executor.submit(timed, model, launched == len(models))] = model
+
+        try:
+            launch()
+            while pending:
+                can_hedge = hedge and budget and launched < len(models)
+                done, _ = wait(list(pending), timeout=budget if can_hedge else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 予算内に応答が無い：次のモデルも並行して呼ぶ
+                    decision["hedged"] = True
+                    print(f"Model routing: {pending[next(iter(pending))]} exceeded {budget:.0f}s budget. Hedging with {models[launched]}.")
+                    launch()
+                    continue
+                for future in done:
+                    model = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        decision["failovers"].append({"model": model, "error": f"{type(e).__name__}: {e}"})
+                        print(f"Model routing: {model} failed ({type(e).__name__}).")
+                        if not pending and launched < len(models):
+                            launch()
+                        continue
+                    decision["model"] = model
+                    return result, model, decision
+            raise errors[-1]
+        finally:
+            # 負けた方の呼び出しは待たない（終わり次第、所要時間だけ記録される）
+            executor.shutdown(wait=False)
@@ -0,0 +1,164 @@
+from gspread.exceptions import APIError
+import functools
+import logging
+import random
+import threading
+import time
+
+# ロギング設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# リトライ対象のHTTPステータス（クォータ超過・サーバーエラー）
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# gspread のメソッド名 -> クォータの種類
+SHEETS_METHOD_KINDS = {
+    # Worksheet（読み取り）
+    "get": "read", "batch_get": "read", "get_all_values": "read", "get_all_records": "read",
+    "get_values": "read", "col_values": "read", "row_values": "read", "acell": "read", "cell": "read",
+    "find": "read", "findall": "read",
+    # Worksheet（書き込み）
+    "update": "write", "update_cell": "write", "update_cells": "write", "update_acell": "write",
+    "batch_update": "write", "append_row": "write", "append_rows": "write", "insert_row": "write",
+    "insert_rows": "write", "delete_rows": "write", "clear": "write", "batch_clear": "write",
+    "add_rows": "write", "resize": "write",
+    # Spreadsheet
+    "worksheet": "read", "worksheets": "read", "fetch_sheet_metadata": "read",
+    "get_lastUpdateTime": "read", "values_get": "read", "values_batch_get": "read",
+    "values_update": "write", "values_append": "write", "values_batch_update": "write",
+    "values_clear": "write", "add_worksheet": "write", "del_worksheet": "write",
+}
+
+
+def _status_code(error):
+    """APIError からHTTPステータスを取得"""
+    code = getattr(error, "code", None)
+    if code is None and getattr(error, "response", None) is not None:
+        code = error.response.status_code
+    return code
+
+
+# トークンバケットの既定の容量（即時に実行できる連続呼び出しの数）
+DEFAULT_BURST = 3
+
+
+class TokenBucket:
+    """
+    1分あたりの上限を平滑化して守るトークンバケット
+
+    どの60秒間でも「容量 + 補充量」が上限を超えないよう、補充は (上限 - 容量) / 分 で行う。
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.capacity = float(capacity or max(1, min(DEFAULT_BURST, int(rate_per_minute) // 4)))
+        self.rate = max(rate_per_minute - self.capacity, 1.0) / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """トークンを1つ予約し、実行まで待つべき秒数を返す（0なら即時実行可）"""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class SheetsRateLimiter:
+    """
+    Sheets API 呼び出しの前段に置くレート制限・リトライ層
+
+    読み取り・書き込みのクォータ（1分あたりのリクエスト数）ごとにトークンバケットで待機し、
+    429/5xx は指数バックオフ（ジッター付き）で再試行する。
+    """
+
+    def __init__(self, reads_per_minute=None, writes_per_minute=None, max_retries=None,
+                 base_delay=1.0, max_delay=64.0, sleep=time.sleep):
+        from src.config import Config
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute or Config.SHEETS_READ_QUOTA_PER_MIN),
+            "write": TokenBucket(writes_per_minute or Config.SHEETS_WRITE_QUOTA_PER_MIN),
+        }
+        self.max_retries = Config.SHEETS_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "calls": 0, "read_calls": 0, "write_calls": 0,
+                "throttled_waits": 0, "throttled_seconds": 0.0,
+                "retries": 0, "failures": 0,
+            }
+
+    def stats(self):
+        """呼び出し回数・待機回数・リトライ回数などのカウンタ"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def backoff_delay(self, attempt):
+        """attempt 回目の再試行までの待機秒数（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, kind, func, *args, **kwargs):
+        """クォータに従って func を実行し、429/5xx は再試行する"""
+        attempt = 0
+        while True:
+            wait = self.buckets[kind].reserve()
+            if wait > 0:
+                self._count("throttled_waits")
+                self._count("throttled_seconds", wait)
+                self.sleep(wait)
+            self._count("calls")
+            self._count(f"{kind}_calls")
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                status = _status_code(e)
+                if status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"Sheets API returned {status}. Retrying in {delay:.1f}s ({attempt}/{self.max_retries}).")
+                self.sleep(delay)
+
+    def wrap(self, target):
+        """gspread の Worksheet / Spreadsheet をレート制限付きのプロキシで包む"""
+        return RateLimitedProxy(target, self)
+
+
+class RateLimitedProxy:
+    """対象オブジェクトのAPI呼び出しメソッドだけを SheetsRateLimiter 経由にするプロキシ"""
+
+    def __init__(self, target, limiter):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_limiter", limiter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        kind = SHEETS_METHOD_KINDS.get(name)
+        if kind is None or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def limited(*args, **kwargs):
+            return self._limiter.call(kind, attr, *args, **kwargs)
+        return limited
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from src.config import Config
+from src.sqlite_lru import SQLiteLRUStore
+
+# ロギング設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ResponseCache(SQLiteLRUStore):
+    """
+    Gemini のレスポンスをディスクに保存するキャッシュ（SQLite）
+
+    キーは「最終的なプロンプト全文・モデル名・生成設定」のハッシュ。
+    件数・合計サイズの上限を超えた場合は、最後に使われた時刻が古いものから削除する（LRU）。
+    """
+
+    DB_PATH = os.path.join("data", "ai_cache.db")
+    TABLE = "responses"
+    COLUMNS = "model TEXT, text TEXT NOT NULL"
+    NAME = "AI response cache"
+
+    def __init__(self, db_path=None, max_entries=None, max_bytes=None):
+        super().__init__(
+            db_path or self.DB_PATH,
+            max_entries or Config.AI_CACHE_MAX_ENTRIES,
+            max_bytes or Config.AI_CACHE_MAX_BYTES,
+        )
+
+    @staticmethod
+    def make_key(prompt, model_name, generation_config=None):
+        """プロンプト・モデル名・生成設定からキャッシュキーを作成"""
+        payload = json.dumps(
+            {"prompt": prompt, "model": model_name, "config": generation_config or {}},
+            ensure_ascii=False, sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """キャッシュされたレスポンスを取得（無い場合は None）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            self._touch(conn, [key])
+            self._count(conn, "hits")
+        logger.info(f"AI response cache hit: {key[:12]}")
+        return row[0]
+
+    def set(self, key, text, model_name=None):
+        """レスポンスを保存し、上限を超えた分を古い順に削除"""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, text, size, now, now),
+            )
+            self._evict(conn)
@@ -0,0 +1,160 @@
+import re
+
+# 単語の切り出し（英数字のみ）
+_WORD = re.compile(r"[a-z0-9]+")
+# Midjourney のパラメータ部分（--ar 9:16 など）
+_MJ_PARAMS = re.compile(r"\s--[a-z].*$")
+
+# 意味を持たない語（キーワードとして数えない）
+STOPWORDS = frozenset("""
+a an the and or but of in on at to for from by with without into onto over under through behind before after
+is are was were be been being it its this that these those there here they them their he she his her him you your
+we our us i me my no not all any some every each one who what which when where why how than then as if so
+just only very still also again up down out off about like near far can could will would should may might
+""".split())
+
+# プロンプトにしか現れない技術指定（台本との対応付けには使わない）
+TECHNICAL_TERMS = frozenset("""
+cinematic cinematography photorealistic photorealism realistic hyperrealistic 8k 4k hd uhd lens 35mm 50mm 85mm
+film grainy grain contrast high low moody lighting light lit shot angle close closeup wide style detailed detail
+ultra atmosphere atmospheric composition render depth field bokeh dramatic volumetric scene prompt color palette
+tone toned shadows desaturated muted vignette
+""".split())
+
+# タイトルカード・イントロ用と思われるプロンプトの語
+TITLE_CARD_WORDS = ("title", "intro", "text", "typography")
+
+# 動的計画法のスコア
+MATCH_BASE = 0.3        # 1行と1プロンプトを対応付けたときの基本点（位置が揃っていること自体の根拠）
+GAP_PENALTY = 0.35      # 余分なプロンプト / プロンプトの無い行
+MERGE_PENALTY = 0.1     # 1つのプロンプトが2行分を兼ねている場合の追加の減点
+TITLE_CARD_PENALTY = 0.4
+
+
+def keywords(text):
+    """対応付けに使うキーワード集合（小文字化・語尾の s を除去、ストップワードと技術指定を除く）"""
+    words = set()
+    for word in _WORD.findall(_MJ_PARAMS.sub("", text or "").lower()):
+        if word in STOPWORDS or word in TECHNICAL_TERMS or (len(word) < 3 and not word.isdigit()):
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+def coverage(line_words, prompt_words):
+    """台本の行のキーワードのうち、プロンプトに現れる割合"""
+    if not line_words:
+        return 0.0
+    return len(line_words & prompt_words) / len(line_words)
+
+
+def align_scenes(script_lines, prompts, title=""):
+    """
+    台本の各行と Midjourney プロンプトを、キーワードの重なりに基づく動的計画法で対応付ける
+
+    - inserted: どの行にも対応しない余分なプロンプト（タイトルカードなど）
+    - missing:  対応するプロンプトが無い行
+    - merged:   直前の行とプロンプトを兼ねている行（1つのプロンプトに2行分の内容）
+    計算量は O(行数 × プロンプト数)。ロングフォーム（60行以上）でも数ミリ秒で終わる。
+
+    Args:
+        script_lines: 台本の各行
+        prompts: プロンプトの文字列のリスト
+        title: 動画のタイトル（タイトルカードの判定に使う）
+
+    Returns:
+        dict: {
+            "prompts": 各行に対応するプロンプトの番号（0始まり、無ければ None）,
+            "inserted": 余分なプロンプトの番号（0始まり）,
+            "missing": プロンプトの無い行のシーン番号（1始まり）,
+            "merged": 直前の行とプロンプトを兼ねている行のシーン番号（1始まり）,
+            "confidence": 対応付けの確からしさ（0〜1）,
+        }
+    """
+    n, m = len(script_lines), len(prompts)
+    line_words = [keywords(line) for line in script_lines]
+    prompt_words = [keywords(p) for p in prompts]
+
+    # ほとんどのプロンプトに共通する語は全シーン共通の画風指定とみなして除く
+    if m >= 4:
+        counts = {}
+        for words in prompt_words:
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+        common = {word for word, count in counts.items() if count > m / 2}
+        prompt_words = [words - common for words in prompt_words]
+
+    title_words = TITLE_CARD_WORDS + ((title.lower(),) if title else ())
+    # タイトルカードは先頭（まれに末尾）に入るため、両端のプロンプトだけを疑う
+    title_card = [j in (0, m - 1) and any(w in (p or "").lower() for w in title_words) for j, p in enumerate(prompts)]
+    sim = [[coverage(line_words[i], prompt_words[j]) for j in range(m)] for i in range(n)]
+
+    def match_score(i, j):
+        return MATCH_BASE + sim[i][j] - (TITLE_CARD_PENALTY if title_card[j] else 0.0)
+
+    # score[i][j]: 先頭 i 行と先頭 j 個のプロンプトを対応付けたときの最大スコア
+    NEG = float("-inf")
+    score = [[NEG] * (m + 1) for _ in range(n + 1)]
+    move = [[None] * (m + 1) for _ in range(n + 1)]
+    score[0][0] = 0.0
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if i == 0 and j == 0:
+                continue
+            best, best_move = NEG, None
+            # 候補の順序は同点時の優先順位（余分なプロンプトは後ろ側、対応付けは前側に寄せる）
+            if j > 0 and score[i][j - 1] - GAP_PENALTY > best:
+                best, best_move = score[i][j - 1] - GAP_PENALTY, "insert"
+            if i > 0 and j > 0 and score[i - 1][j - 1] + match_score(i - 1, j - 1) > best:
+                best, best_move = score[i - 1][j - 1] + match_score(i - 1, j - 1), "match"
+            if i > 1 and j > 0:
+                merged = (score[i - 2][j - 1] + MATCH_BASE + sim[i - 2][j - 1] + sim[i - 1][j - 1]
+                          - GAP_PENALTY - MERGE_PENALTY)
+                if merged > best:
+                    best, best_move = merged, "merge"
+            if i > 0 and score[i - 1][j] - GAP_PENALTY > best:
+                best, best_move = score[i - 1][j] - GAP_PENALTY, "missing"
+            score[i][j], move[i][j] = best, best_move
+
+    assigned = [None] * n
+    inserted, missing, merged = [], [], []
+    i, j = n, m
+    while i > 0 or j > 0:
+        step = move[i][j]
+        if step == "insert":
+            inserted.append(j - 1)
+            j -= 1
+        elif step == "match":
+            assigned[i - 1] = j - 1
+            i, j = i - 1, j - 1
+        elif step == "merge":
+            assigned[i - 2] = j - 1
+            merged.append(i)
+            i, j = i - 2, j - 1
+        else:
+            missing.append(i)
+            i -= 1
+
+    # 確からしさ: 対応付けた行は 0.5（位置の一致）+ 0.5 × キーワードの一致度、兼用・欠落は減点
+    line_scores = []
+    merged_set = set(merged)
+    for i in range(n):
+        if (i + 1) in merged_set:
+            line_scores.append(0.25 * sim[i][assigned[i - 1]])
+        elif assigned[i] is None:
+            line_scores.append(0.0)
+        else:
+            line_scores.append(0.5 + 0.5 * sim[i][assigned[i]])
+    confidence = sum(line_scores) / n if n else (1.0 if m == 0 else 0.0)
+    if n and inserted:
+        confidence *= n / (n + len(inserted))
+
+    return {
+        "prompts": assigned,
+        "inserted": sorted(inserted),
+        "missing": sorted(missing),
+        "merged": sorted(merged),
+        "confidence": round(confidence, 3),
+    }
@@ -0,0 +1,104 @@
+import gspread
+from gspread.exceptions import WorksheetNotFound
+from src.backends import OfflineSheetsClient, backend_mode, record_spreadsheet
+from src.config import Config
+from src.rate_limiter import SheetsRateLimiter
+import logging
+import threading
+
+# ロギング設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SheetsClientPool:
+    """
+    プロセス全体で共有する gspread クライアント
+
+    サービスアカウント認証は最初の1回だけ行う。gspread のクライアントは
+    requests.Session（AuthorizedSession）を保持しているため、HTTPのコネクションプールと
+    OAuthトークンは期限切れまで再利用され、期限切れ時は自動で再取得される。
+    開いたスプレッドシートとワークシートもキャッシュし、SheetsHandler 間で共有する。
+    返すオブジェクトは SheetsRateLimiter のプロキシで包まれ、全呼び出しがクォータ管理される。
+    """
+
+    _client = None
+    _credentials_file = None
+    _spreadsheets = {}
+    _worksheets = {}
+    _lock = threading.RLock()
+    _limiter = None
+
+    @classmethod
+    def limiter(cls):
+        """プロセス共有のレート制限器"""
+        with cls._lock:
+            if cls._limiter is None:
+                cls._limiter = SheetsRateLimiter()
+            return cls._limiter
+
+    @classmethod
+    def get_client(cls):
+        """認証済みクライアントを取得（認証情報ファイルが変わった場合のみ再認証）"""
+        with cls._lock:
+            filename = Config.GOOGLE_APPLICATION_CREDENTIALS
+            if cls._client is None or cls._credentials_file != filename:
+                cls._spreadsheets.clear()
+                cls._worksheets.clear()
+                if backend_mode() == "replay":
+                    # 記録済みのスナップショットを使うメモリ上のスプレッドシート（ネットワーク不要）
+                    cls._client = OfflineSheetsClient()
+                    logger.info("Using recorded Google Sheets fixtures (BACKEND_MODE=replay).")
+                else:
+                    cls._client = gspread.service_account(filename=filename)
+                    logger.info("Authenticated Google Sheets service account.")
+                cls._credentials_file = filename
+            return cls._client
+
+    @classmethod
+    def get_spreadsheet(cls, spreadsheet_id):
+        """スプレッドシートを取得（メタデータ取得は初回のみ）"""
+        with cls._lock:
+            client = cls.get_client()
+            if spreadsheet_id not in cls._spreadsheets:
+                spreadsheet = cls.limiter().call("read", client.open_by_key, spreadsheet_id)
+                if backend_mode() == "record":
+                    record_spreadsheet(spreadsheet, spreadsheet_id)
+                cls._spreadsheets[spreadsheet_id] = cls.limiter().wrap(spreadsheet)
+            return cls._spreadsheets[spreadsheet_id]
+
+    @classmethod
+    def get_worksheet(cls, spreadsheet_id, title):
+        """ワークシートを取得（同じタブは全ハンドラで共有）"""
+        with cls._lock:
+            key = (spreadsheet_id, title)
+            if key not in cls._worksheets:
+                worksheet = cls.get_spreadsheet(spreadsheet_id).worksheet(title)
+                cls._worksheets[key] = cls.limiter().wrap(worksheet)
+                logger.info(f"Opened '{title}' worksheet.")
+            return cls._worksheets[key]
+
+    @classmethod
+    def get_or_create_worksheet(cls, spreadsheet_id, title, header=None):
+        """ワークシートを取得（存在しない場合は header 行付きで作成）"""
+        with cls._lock:
+            try:
+                return cls.get_worksheet(spreadsheet_id, title)
+            except WorksheetNotFound:
+                spreadsheet = cls.get_spreadsheet(spreadsheet_id)
+                worksheet = cls.limiter().wrap(
+                    spreadsheet.add_worksheet(title=title, rows=1, cols=max(len(header or []), 1))
+                )
+                if header:
+                    worksheet.append_rows([header], value_input_option="USER_ENTERED")
+                cls._worksheets[(spreadsheet_id, title)] = worksheet
+                logger.info(f"Created '{title}' worksheet.")
+                return worksheet
+
+    @classmethod
+    def reset(cls):
+        """共有クライアントを破棄（次回アクセス時に再認証）"""
+        with cls._lock:
+            cls._client = None
+            cls._credentials_file = None
+            cls._spreadsheets.clear()
+            cls._worksheets.clear()
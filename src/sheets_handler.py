@@ -1,66 +1,464 @@
-import gspread
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import rowcol_to_a1
 from src.config import Config
+from src.sheets_client import SheetsClientPool
+from src.sheets_index import PendingRowIndex, TitleRowIndex, normalize_title, parse_updated_rows
+import datetime
 import logging
+import threading
+import time
+import uuid
 
 # ロギング設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ARCHIVE_SHEET = "アーカイブ"
+# リース（作業中ロック）を書き込む列。備考（F列）はユーザーのメモ用なので専用列を使う
+LEASE_COLUMN = "G"
+
+
+def _parse_lease(value):
+    """G列のリース文字列 "worker_id|期限(UNIX秒)|nonce" を (worker_id, 期限, nonce) に変換"""
+    parts = (value or "").split("|")
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], float(parts[1]), parts[2]
+    except ValueError:
+        return None
+
+
+def _format_lease(worker_id, expires_at, nonce):
+    return f"{worker_id}|{int(expires_at)}|{nonce}"
+
+
+def _parse_sheet_date(value):
+    """E列（作成日）の表示値を日付に変換（解釈できない場合は None）"""
+    value = (value or "").strip()
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _delete_rows_requests(sheet_id, rows):
+    """行番号(1始まり)のリストを、下から順に削除する deleteDimension リクエストに変換（連続行はまとめる）"""
+    requests = []
+    for row in sorted(set(rows), reverse=True):
+        if requests and requests[-1]["deleteDimension"]["range"]["startIndex"] == row:
+            requests[-1]["deleteDimension"]["range"]["startIndex"] = row - 1
+            continue
+        requests.append({"deleteDimension": {"range": {
+            "sheetId": sheet_id, "dimension": "ROWS", "startIndex": row - 1, "endIndex": row,
+        }}})
+    return requests
+
+
+def get_sheets_handler():
+    """設定に応じて SheetsHandler（ミラー有効時は MirroredSheetsHandler）を返す"""
+    if Config.SHEETS_MIRROR_ENABLED:
+        from src.sheets_mirror import MirroredSheetsHandler
+        return MirroredSheetsHandler()
+    return SheetsHandler()
+
+
 class SheetsHandler:
+    # プロセス内で共有するワークシートのスナップショット
+    # {((spreadsheet_id, worksheet名), 範囲): {"values": [...], "fetched_at": float, "revision": str}}
+    _snapshots = {}
+    _snapshot_lock = threading.Lock()
+    # 未処理行インデックス（スナップショットと同じキーでプロセス内共有）
+    _pending_indexes = {}
+    # タイトル -> 行番号 インデックス
+    _title_indexes = {}
+    # アーカイブ済みタイトル（A列のみ）のキャッシュ
+    _archived_titles = {}
+    _last_auto_archive = {}
+
     def __init__(self):
         try:
             Config.validate()
-            self.gc = gspread.service_account(filename=Config.GOOGLE_APPLICATION_CREDENTIALS)
-            self.sh = self.gc.open_by_key(Config.SPREADSHEET_ID)
-            self.worksheet = self.sh.worksheet("データ") # 「データ」という名前のタブを使用
-            logger.info("Successfully connected to Google Sheets and opened 'データ' worksheet.")
+            # 認証・スプレッドシートのオープンはプロセス内で共有（初回のみ通信が発生）
+            self.gc = SheetsClientPool.get_client()
+            self.sh = SheetsClientPool.get_spreadsheet(Config.SPREADSHEET_ID)
+            self.worksheet = SheetsClientPool.get_worksheet(Config.SPREADSHEET_ID, "データ") # 「データ」という名前のタブを使用
         except Exception as e:
             logger.error(f"Failed to initialize SheetsHandler: {e}")
+            SheetsClientPool.reset()
             raise ConnectionError(f"スプレッドシートの接続に失敗しました: {e}")
 
-    def get_all_titles(self):
-        """A列（タイトル）を取得（1行目のヘッダーは除外）"""
+    # --- スナップショットキャッシュ ---
+
+    def _snapshot_key(self):
+        return (Config.SPREADSHEET_ID, "データ")
+
+    def _get_revision(self):
+        """スプレッドシートの最終更新時刻（Drive API の modifiedTime）を取得"""
+        try:
+            return self.sh.get_lastUpdateTime()
+        except Exception as e:
+            logger.warning(f"Could not fetch spreadsheet revision: {e}")
+            return None
+
+    def _get_cached_values(self, range_name=None):
+        """
+        ワークシートの値を取得（プロセス共有のスナップショットを利用）
+
+        range_name を指定した場合はその範囲だけ（例: "A1:A"）、省略時はシート全体を対象にする。
+        TTL内はスナップショットをそのまま返す。TTL切れの場合は更新時刻を確認し、
+        変化がなければ再ダウンロードせずにスナップショットの有効期限だけを延長する。
+        """
+        key = (self._snapshot_key(), range_name)
+        now = time.monotonic()
+        with self._snapshot_lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and now - snapshot["fetched_at"] < Config.SHEETS_CACHE_TTL:
+                return snapshot["values"]
+
+        revision = self._get_revision()
+        if snapshot and revision is not None and revision == snapshot["revision"]:
+            with self._snapshot_lock:
+                snapshot["fetched_at"] = now
+            logger.info("Sheet revision unchanged. Reusing cached snapshot.")
+            return snapshot["values"]
+
+        if range_name is None:
+            values = self.worksheet.get_all_values()
+        else:
+            values = [list(row) for row in self.worksheet.get(range_name)]
+        with self._snapshot_lock:
+            self._snapshots[key] = {"values": values, "fetched_at": now, "revision": revision}
+        logger.info(f"Fetched sheet snapshot of {range_name or 'all columns'} ({len(values)} rows).")
+        return values
+
+    def _get_all_values(self):
+        """ワークシート全体の値を取得（スナップショットを利用）"""
+        return self._get_cached_values()
+
+    def invalidate_cache(self):
+        """自分の書き込み後にスナップショットを破棄"""
+        sheet_key = self._snapshot_key()
+        with self._snapshot_lock:
+            for key in [k for k in self._snapshots if k[0] == sheet_key]:
+                del self._snapshots[key]
+
+    # --- 読み取り ---
+
+    def get_all_titles(self, include_archived=True):
+        """A列（タイトル）を取得（1行目のヘッダーは除外。既定でアーカイブ済みのタイトルも含む）"""
         try:
-            titles = self.worksheet.col_values(1)
-            return titles[1:] if len(titles) > 1 else []
+            titles = [row[0] if row else "" for row in self._get_cached_values("A1:A")]
+            # col_values と同様に末尾の空セルは含めない
+            while titles and not titles[-1]:
+                titles.pop()
+            titles = titles[1:] if len(titles) > 1 else []
+            if include_archived:
+                titles += self.get_archived_titles()
+            return titles
         except Exception as e:
             logger.error(f"Error getting titles: {e}")
             return []
 
+    def get_columns(self, columns, start_row=2):
+        """
+        指定した列だけを1回の batch_get で取得（台本・プロンプトなど大きな列を避けるため）
+
+        Args:
+            columns: 列名のリスト（例: ["A", "D"]）
+            start_row: 読み始める行（既定はヘッダーの次の行）
+
+        Returns:
+            Dict[str, List[str]]: 列名 -> 値のリスト（start_row から順に、末尾の空セルは含まない）
+        """
+        ranges = self.worksheet.batch_get([f"{col}{start_row}:{col}" for col in columns])
+        return {col: [row[0] if row else "" for row in values] for col, values in zip(columns, ranges)}
+
+    def get_row(self, row_index, columns="A:F"):
+        """1行の指定範囲の列だけを取得（例: columns="B:C"）"""
+        first, _, last = columns.partition(":")
+        values = self.worksheet.get(f"{first}{row_index}:{last or first}{row_index}")
+        return list(values[0]) if values else []
+
     def append_new_titles(self, titles):
         """新しいネタをA列に追加"""
         try:
             rows = [[title] for title in titles]
-            self.worksheet.append_rows(rows)
+            response = self.worksheet.append_rows(rows)
+            new_rows = parse_updated_rows(response)
+            self._pending_index().add(new_rows, titles)
+            for title, row_index in zip(titles, new_rows):
+                self._title_index().add(title, row_index)
             logger.info(f"Appended {len(titles)} new titles.")
         except Exception as e:
             logger.error(f"Error appending titles: {e}")
             raise
+        finally:
+            self.invalidate_cache()
 
-    def get_unprocessed_row(self):
-        """完了フラグ（D列）が空の行を検索"""
+    # --- タイトル -> 行番号 ---
+
+    def _title_index(self):
+        key = self._snapshot_key()
+        with self._snapshot_lock:
+            if key not in self._title_indexes:
+                self._title_indexes[key] = TitleRowIndex()
+            return self._title_indexes[key]
+
+    def _refresh_title_index(self, rebuild=False):
+        """
+        cursor 行以降のA列だけを読み、外部で追加されたタイトルを取り込む
+        rebuild=True または SHEETS_INDEX_REBUILD_SEC 経過後は、行の削除・並べ替えを反映するため全体を読み直す
+        """
+        index = self._title_index()
+        with index.lock:
+            if rebuild or (index.built and time.monotonic() - index.built_at >= Config.SHEETS_INDEX_REBUILD_SEC):
+                index.reset()
+            start = index.cursor
+            titles = [row[0] if row else "" for row in self.worksheet.get(f"A{start}:A")]
+            if index.shifted(start, titles):
+                logger.warning(f"Rows above {start} were removed elsewhere. Rebuilding the title index.")
+                index.reset()
+                start = 1
+                titles = [row[0] if row else "" for row in self.worksheet.get("A1:A")]
+            index.scan(start, titles)
+        return index
+
+    def find_title_row(self, title):
+        """タイトルの行番号を取得（見つからない場合は None）"""
+        return self._refresh_title_index().get(title)
+
+    def find_verified_title_row(self, title):
+        """
+        書き込みに使うタイトルの行番号を取得（見つからない場合は None）
+
+        インデックスの行のA列を読み直し、タイトルが一致しなければ
+        （他のクライアントが行を追加・削除・並べ替えた）インデックスを作り直して探し直す。
+        """
+        row_index = self.find_title_row(title)
+        if row_index is None or self._title_at(row_index) == normalize_title(title):
+            return row_index
+        logger.warning(f"Row {row_index} no longer holds '{title}'. Rebuilding the title index.")
+        self._rebuild_title_index()
+        row_index = self.find_title_row(title)
+        if row_index is not None and self._title_at(row_index) != normalize_title(title):
+            raise RuntimeError(f"Title index for '{title}' is inconsistent (row {row_index}).")
+        return row_index
+
+    def _rebuild_title_index(self):
+        """タイトルインデックスをA列全体から作り直す"""
+        self._refresh_title_index(rebuild=True)
+
+    def _title_at(self, row_index):
+        """A列の値（正規化済み）"""
+        values = self.worksheet.get(f"A{row_index}")
+        return normalize_title(values[0][0] if values and values[0] else "")
+
+    def upsert_title_row(self, title, script, prompts):
+        """
+        タイトルの行にB列（台本）・C列（プロンプト）を書き込む（無ければ新しい行として追加）
+
+        読み取りはA列の差分1回と、書き込み先の行のA列の確認1回、書き込みは1回。
+        追加時の行番号は append のレスポンス（updatedRange）から取得するため、A列を再ダウンロードしない。
+
+        Returns:
+            Tuple[int, bool]: (行番号, 新規追加した場合True)
+        """
         try:
-            all_records = self.worksheet.get_all_values()
-            if not all_records:
-                return None, None
-                
-            for i, row in enumerate(all_records, start=1):
-                if i == 1: continue # ヘッダーをスキップ
-                
-                # row[3] はD列 (0-indexed)
-                # 列が不足している場合や空の場合を未処理とみなす
-                if len(row) < 4 or not row[3]:
-                    return i, row
-            return None, None
+            # 行番号が古くなっていると別の動画の行を上書きするため、A列を確認してから書き込む
+            row_index = self.find_verified_title_row(title)
+            if row_index:
+                self.update_row_data(row_index, script, prompts)
+                return row_index, False
+
+            response = self.worksheet.append_rows(
+                [[title, script, prompts]], value_input_option="USER_ENTERED"
+            )
+            new_rows = parse_updated_rows(response)
+            if not new_rows:
+                raise ValueError(f"Could not determine appended row from response: {response}")
+            row_index = new_rows[0]
+            self._title_index().add(title, row_index)
+            self._pending_index().add([row_index], [title])
+            logger.info(f"Appended '{title}' at row {row_index}.")
+            return row_index, True
+        except Exception as e:
+            logger.error(f"Error upserting title '{title}': {e}")
+            raise
+        finally:
+            self.invalidate_cache()
+
+    # --- 未処理キュー ---
+
+    def _pending_index(self):
+        key = self._snapshot_key()
+        with self._snapshot_lock:
+            if key not in self._pending_indexes:
+                self._pending_indexes[key] = PendingRowIndex()
+            return self._pending_indexes[key]
+
+    def _refresh_pending_index(self):
+        """
+        未処理行インデックスを最新化
+
+        初回（および SHEETS_INDEX_REBUILD_SEC 経過後）はA列・D列だけを読んで構築し、
+        以降は TTL 経過ごとに cursor 以降の追加行だけを読む。
+        （cursor 行から読むのは、グリッド外の範囲指定でエラーにならないようにするためと、
+        cursor 行のタイトルが変わっていれば他のプロセスのアーカイブで行が詰まったと検知して作り直すため）
+        """
+        index = self._pending_index()
+        now = time.monotonic()
+        with index.lock:
+            if index.built and now - index.built_at >= Config.SHEETS_INDEX_REBUILD_SEC:
+                index.reset()
+            if index.built and now - index.scanned_at < Config.SHEETS_CACHE_TTL:
+                return index
+            start = index.cursor
+            titles, statuses = self._read_pending_columns(start)
+            if index.shifted(start, titles):
+                logger.warning(f"Rows above {start} were removed elsewhere. Rebuilding the pending-row index.")
+                index.reset()
+                start = 1
+                titles, statuses = self._read_pending_columns(start)
+            index.scan(start, titles, statuses)
+            logger.info(f"Scanned rows from {start}: {len(index.pending)} pending.")
+        return index
+
+    def _read_pending_columns(self, start):
+        titles, statuses = self.worksheet.batch_get([f"A{start}:A", f"D{start}:D"])
+        return [row[0] if row else "" for row in titles], [row[0] if row else "" for row in statuses]
+
+    def get_unprocessed_rows(self, n=1, include_body=True):
+        """
+        完了フラグ（D列）が空の行を上から最大 n 件取得
+
+        インデックスの候補行は A列・D列のセルだけを読んで確認し（外部で完了済みになった行は除外）、
+        B列（台本）・C列（プロンプト）は返す行の分だけを読む。
+
+        Returns:
+            List[Tuple[int, List[str]]]: (行番号, [A, B, C, D]) のリスト
+            （include_body=False の場合 B・C は空文字）
+        """
+        try:
+            index = self._refresh_pending_index()
+            results = []
+            candidates = index.candidates()
+            while candidates and len(results) < n:
+                chunk, candidates = candidates[:n - len(results)], candidates[n - len(results):]
+                ranges = self.worksheet.batch_get([a1 for row in chunk for a1 in (f"A{row}", f"D{row}")])
+                for i, row_index in enumerate(chunk):
+                    title = ranges[2 * i][0][0] if ranges[2 * i] else ""
+                    status = ranges[2 * i + 1][0][0] if ranges[2 * i + 1] else ""
+                    if title and not status:
+                        results.append((row_index, [title, "", "", status]))
+                    else:
+                        index.discard([row_index])
+            if include_body and results:
+                bodies = self.worksheet.batch_get([f"B{row_index}:C{row_index}" for row_index, _ in results])
+                for (_, row), body in zip(results, bodies):
+                    cells = (list(body[0]) if body else []) + ["", ""]
+                    row[1], row[2] = cells[0], cells[1]
+            return results
         except Exception as e:
             logger.error(f"Error looking for unprocessed rows: {e}")
+            return []
+
+    def get_unprocessed_row(self):
+        """完了フラグ（D列）が空の行を検索"""
+        rows = self.get_unprocessed_rows(1)
+        if not rows:
+            return None, None
+        return rows[0]
+
+    def peek_unprocessed_title(self):
+        """次の未処理行の行番号とタイトルだけを取得（サイドバー表示用。台本・プロンプトは読まない）"""
+        rows = self.get_unprocessed_rows(1, include_body=False)
+        if not rows:
             return None, None
+        row_index, row = rows[0]
+        return row_index, row[0]
+
+    # --- リースによる行の確保（複数ワーカー対応） ---
+
+    def _read_lease(self, row_index):
+        value = self.worksheet.get(f"{LEASE_COLUMN}{row_index}")
+        return value[0][0] if value and value[0] else ""
+
+    def claim_next_row(self, worker_id, lease_seconds=None):
+        """
+        未処理行を1つリース付きで確保
+
+        候補行のA・D・G列を読み、リースが無い（または期限切れ・自分の）行にリースを書き込む。
+        Sheets には原子的な compare-and-set が無いため、書き込み後に SHEETS_LEASE_SETTLE_SEC 待って
+        読み直し、自分のリース（nonce まで一致）が残っている場合だけ確保成功とする。
+        競合した他のワーカーは読み直しで負けを検知して次の候補へ進む。
+
+        Returns:
+            Tuple[int, List[str]]: (行番号, [A, B, C, D])。確保できる行が無い場合は (None, None)
+        """
+        lease_seconds = lease_seconds or Config.SHEETS_LEASE_SECONDS
+        index = self._refresh_pending_index()
+        candidates = index.candidates()
+        while candidates:
+            chunk, candidates = candidates[:10], candidates[10:]
+            ranges = self.worksheet.batch_get(
+                [a1 for row in chunk for a1 in (f"A{row}", f"D{row}", f"{LEASE_COLUMN}{row}")]
+            )
+            for i, row_index in enumerate(chunk):
+                title, status, lease_value = [r[0][0] if r and r[0] else "" for r in ranges[3 * i:3 * i + 3]]
+                if not title or status:
+                    index.discard([row_index])
+                    continue
+                lease = _parse_lease(lease_value)
+                if lease and lease[0] != worker_id and lease[1] > time.time():
+                    continue # 他のワーカーが作業中
+
+                token = _format_lease(worker_id, time.time() + lease_seconds, uuid.uuid4().hex[:8])
+                with self.batch() as batch:
+                    batch.update_range(f"{LEASE_COLUMN}{row_index}", [[token]])
+                time.sleep(Config.SHEETS_LEASE_SETTLE_SEC)
+
+                title, status, current = [r[0][0] if r and r[0] else "" for r in self.worksheet.batch_get(
+                    [f"A{row_index}", f"D{row_index}", f"{LEASE_COLUMN}{row_index}"]
+                )]
+                if current != token or status:
+                    logger.info(f"Lost lease race for row {row_index}. Trying next candidate.")
+                    continue
+                body = self.get_row(row_index, "B:C") + ["", ""]
+                logger.info(f"Worker {worker_id} claimed row {row_index} for {lease_seconds}s.")
+                return row_index, [title, body[0], body[1], status]
+        return None, None
+
+    def renew_lease(self, row_index, worker_id, lease_seconds=None):
+        """自分のリースの期限を延長（他のワーカーに奪われていた場合は False）"""
+        lease = _parse_lease(self._read_lease(row_index))
+        if not lease or lease[0] != worker_id:
+            logger.warning(f"Worker {worker_id} no longer holds the lease for row {row_index}.")
+            return False
+        lease_seconds = lease_seconds or Config.SHEETS_LEASE_SECONDS
+        with self.batch() as batch:
+            batch.update_range(
+                f"{LEASE_COLUMN}{row_index}", [[_format_lease(worker_id, time.time() + lease_seconds, lease[2])]]
+            )
+        return True
+
+    def release_lease(self, row_index, worker_id):
+        """自分のリースを解除（他のワーカーのリースは消さない）"""
+        lease = _parse_lease(self._read_lease(row_index))
+        if not lease or lease[0] != worker_id:
+            return False
+        with self.batch() as batch:
+            batch.update_range(f"{LEASE_COLUMN}{row_index}", [[""]])
+        logger.info(f"Worker {worker_id} released row {row_index}.")
+        return True
 
     def update_row_data(self, row_index, script, prompt):
         """B列（台本）とC列（プロンプト）を更新"""
         try:
-            self.worksheet.update_cell(row_index, 2, script) # B列
-            self.worksheet.update_cell(row_index, 3, prompt) # C列
+            with self.batch() as batch:
+                batch.update_row_data(row_index, script, prompt)
             logger.info(f"Updated data for row {row_index}.")
         except Exception as e:
             logger.error(f"Error updating row {row_index}: {e}")
@@ -69,11 +467,190 @@ class SheetsHandler:
     def mark_as_completed(self, row_index):
         """D列（完了）とE列（作成日）を更新"""
         try:
-            import datetime
-            today = datetime.date.today().isoformat()
-            self.worksheet.update_cell(row_index, 4, "完了") # D列
-            self.worksheet.update_cell(row_index, 5, today)  # E列
+            with self.batch() as batch:
+                today = batch.mark_as_completed(row_index)
             logger.info(f"Marked row {row_index} as completed on {today}.")
         except Exception as e:
             logger.error(f"Error marking row {row_index} as completed: {e}")
             raise
+
+    # --- アーカイブ ---
+
+    def get_archived_titles(self):
+        """アーカイブタブのタイトル一覧（A列のみをキャッシュし、SHEETS_INDEX_REBUILD_SEC ごとに再取得）"""
+        key = self._snapshot_key()
+        now = time.monotonic()
+        with self._snapshot_lock:
+            cached = self._archived_titles.get(key)
+            if cached and now - cached["fetched_at"] < Config.SHEETS_INDEX_REBUILD_SEC:
+                return list(cached["titles"])
+        try:
+            archive = SheetsClientPool.get_worksheet(Config.SPREADSHEET_ID, ARCHIVE_SHEET)
+            titles = [row[0] for row in archive.get("A2:A") if row and row[0]]
+        except WorksheetNotFound:
+            titles = []
+        with self._snapshot_lock:
+            self._archived_titles[key] = {"titles": titles, "fetched_at": now}
+        return list(titles)
+
+    def archive_completed(self, older_than_days, dry_run=False):
+        """
+        D列が「完了」かつE列（作成日）が older_than_days 日以上前の行を「アーカイブ」タブへ移動
+
+        候補の判定はD列・E列・G列だけを読み、移動は append 1回と行削除 1回（batchUpdate）で行う。
+
+        行を削除すると下の行の行番号が詰まるため、他のプロセスが持っている行番号
+        （未処理キュー・処理中の行・claim_next_row のリース）は古くなる。
+        他のプロセスのインデックスは次の差分読み取りで cursor 行のタイトルの食い違いから検知して作り直し、
+        upsert_title_row は書き込み前にA列を確認するが、リース中の行は確認せずに書き込むため、
+        削除する行より下に有効なリース（G列）がある間はアーカイブしない（RuntimeError）。
+        ワーカーが動いていない時間帯に実行すること。
+
+        Returns:
+            List[int]: 移動した（dry_run の場合は移動対象の）行番号
+        """
+        cutoff = datetime.date.today() - datetime.timedelta(days=older_than_days)
+        columns = self.get_columns(["D", "E", LEASE_COLUMN])
+        created_dates = columns["E"]
+        rows = []
+        for offset, status in enumerate(columns["D"]):
+            created = _parse_sheet_date(created_dates[offset] if offset < len(created_dates) else "")
+            if status == "完了" and created and created <= cutoff:
+                rows.append(offset + 2)
+        if dry_run or not rows:
+            return rows
+
+        now = time.time()
+        leased = []
+        for offset, value in enumerate(columns[LEASE_COLUMN]):
+            lease = _parse_lease(value)
+            if offset + 2 > rows[0] and lease and lease[1] > now:
+                leased.append(offset + 2)
+        if leased:
+            raise RuntimeError(f"Archive refused: rows {leased} are leased by workers and would shift.")
+
+        try:
+            values = self.worksheet.batch_get(["A1:F1"] + [f"A{row}:F{row}" for row in rows])
+            header = list(values[0][0]) if values[0] else []
+            archived = [list(value_range[0]) if value_range else [] for value_range in values[1:]]
+
+            archive = SheetsClientPool.get_or_create_worksheet(Config.SPREADSHEET_ID, ARCHIVE_SHEET, header)
+            archive.append_rows(archived, value_input_option="USER_ENTERED")
+            self.sh.batch_update({"requests": _delete_rows_requests(self.worksheet.id, rows)})
+            logger.info(f"Archived {len(rows)} completed rows older than {older_than_days} days.")
+        except Exception as e:
+            logger.error(f"Error archiving rows: {e}")
+            raise
+        finally:
+            # 行番号がずれるためインデックスは作り直す
+            self.invalidate_cache()
+            self._pending_index().reset()
+            self._title_index().reset()
+            with self._snapshot_lock:
+                self._archived_titles.pop(self._snapshot_key(), None)
+
+        return rows
+
+    def maybe_auto_archive(self):
+        """SHEETS_ARCHIVE_AFTER_DAYS が設定されていれば、1日1回まで自動でアーカイブを実行"""
+        if Config.SHEETS_ARCHIVE_AFTER_DAYS <= 0:
+            return []
+        key = self._snapshot_key()
+        now = time.monotonic()
+        with self._snapshot_lock:
+            last = self._last_auto_archive.get(key)
+            if last is not None and now - last < 24 * 60 * 60:
+                return []
+            self._last_auto_archive[key] = now
+        try:
+            return self.archive_completed(Config.SHEETS_ARCHIVE_AFTER_DAYS)
+        except Exception as e:
+            logger.warning(f"Auto archive skipped: {e}")
+            return []
+
+    # --- 一括書き込み ---
+
+    def batch(self):
+        """複数の書き込みを1回のリクエストにまとめるバッファを返す"""
+        return SheetsBatch(self)
+
+    def update_rows_data(self, rows):
+        """複数行のB列・C列を1リクエストで更新 (rows: [(row_index, script, prompt), ...])"""
+        try:
+            with self.batch() as batch:
+                for row_index, script, prompt in rows:
+                    batch.update_row_data(row_index, script, prompt)
+            logger.info(f"Updated data for {len(rows)} rows.")
+        except Exception as e:
+            logger.error(f"Error updating rows: {e}")
+            raise
+
+    def mark_rows_completed(self, row_indices):
+        """複数行を1リクエストで完了にする"""
+        try:
+            with self.batch() as batch:
+                for row_index in row_indices:
+                    batch.mark_as_completed(row_index)
+            logger.info(f"Marked {len(row_indices)} rows as completed.")
+        except Exception as e:
+            logger.error(f"Error marking rows as completed: {e}")
+            raise
+
+
+class SheetsBatch:
+    """
+    セル・範囲の更新を溜めておき、commit() で values.batchUpdate を1回だけ送信する
+
+    with handler.batch() as batch:
+        batch.update_row_data(5, script, prompt)
+        batch.mark_as_completed(5)
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._data = []
+        self._completed_rows = []
+
+    def __len__(self):
+        return len(self._data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def update_cell(self, row, col, value):
+        """1セルの更新を追加"""
+        self._data.append({"range": rowcol_to_a1(row, col), "values": [[value]]})
+
+    def update_range(self, range_name, values):
+        """A1表記の範囲の更新を追加 (values は2次元リスト)"""
+        self._data.append({"range": range_name, "values": values})
+
+    def update_row_data(self, row_index, script, prompt):
+        """B列（台本）とC列（プロンプト）の更新を追加"""
+        self.update_range(f"B{row_index}:C{row_index}", [[script, prompt]])
+
+    def mark_as_completed(self, row_index, date=None):
+        """D列（完了）とE列（作成日）の更新を追加"""
+        date = date or datetime.date.today().isoformat()
+        self.update_range(f"D{row_index}:E{row_index}", [["完了", date]])
+        self._completed_rows.append(row_index)
+        return date
+
+    def commit(self):
+        """溜めた更新を1回のリクエストで送信"""
+        if not self._data:
+            return None
+        data, self._data = self._data, []
+        completed, self._completed_rows = self._completed_rows, []
+        try:
+            # update_cell と同じく USER_ENTERED で書き込む
+            response = self.handler.worksheet.batch_update(data, raw=False)
+            self.handler._pending_index().discard(completed)
+            return response
+        finally:
+            self.handler.invalidate_cache()
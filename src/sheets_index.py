@@ -0,0 +1,163 @@
+from gspread.utils import a1_range_to_grid_range
+import re
+import threading
+import time
+import unicodedata
+
+def parse_updated_rows(response):
+    """
+    append_rows / values.append のレスポンスから書き込まれた行番号(1始まり)を取得
+
+    例: {"updates": {"updatedRange": "'データ'!A12:C14"}} -> [12, 13, 14]
+    """
+    try:
+        updated_range = response["updates"]["updatedRange"]
+    except (KeyError, TypeError):
+        return []
+    a1 = updated_range.split("!")[-1]
+    grid = a1_range_to_grid_range(a1)
+    start = grid.get("startRowIndex", 0) + 1
+    end = grid.get("endRowIndex", start)
+    return list(range(start, end + 1))
+
+
+def normalize_title(title):
+    """タイトル照合用の正規化（全角/半角・大文字小文字・空白の揺れを吸収）"""
+    title = unicodedata.normalize("NFKC", title or "")
+    return re.sub(r"\s+", " ", title).strip().casefold()
+
+
+class _CursorIndex:
+    """
+    cursor 行以降を差分で読むインデックスの共通部分
+
+    cursor 行のタイトル（cursor_title）を覚えておき、差分読み取りの先頭（cursor 行）と一致しなければ、
+    他のプロセスが上の行を削除した（アーカイブ等）として作り直す。差分読み取りは cursor 行から読むため、
+    この確認に追加のリクエストは要らない。
+    """
+
+    def _move_cursor(self, row, title):
+        if row >= self.cursor:
+            self.cursor = row
+            self.cursor_title = None if title is None else normalize_title(title)
+
+    def shifted(self, start_row, titles):
+        """start_row（= cursor）から読んだA列の値が、覚えている cursor 行のタイトルと食い違うか"""
+        with self.lock:
+            if start_row <= 1 or self.cursor_title is None:
+                return False
+            return normalize_title(titles[0] if titles else "") != self.cursor_title
+
+
+class PendingRowIndex(_CursorIndex):
+    """
+    未処理行（D列が空）の行番号インデックス
+
+    cursor はスキャン済みの最終行番号（1 = ヘッダー行）。cursor より下は
+    末尾だけを読めば追加行を検出でき、pending は自分の追記・完了処理で更新される。
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.cursor = 1
+            self.cursor_title = None
+            self.pending = set()
+            self.built_at = None
+            self.scanned_at = None
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def scan(self, start_row, titles, statuses):
+        """start_row 以降のA列・D列の値からインデックスを更新"""
+        now = time.monotonic()
+        with self.lock:
+            if self.built_at is None:
+                self.built_at = now
+            for offset, title in enumerate(titles):
+                row = start_row + offset
+                if row == 1:
+                    continue # ヘッダーをスキップ
+                status = statuses[offset] if offset < len(statuses) else ""
+                if title and not status:
+                    self.pending.add(row)
+                else:
+                    self.pending.discard(row)
+            if titles:
+                self._move_cursor(start_row + len(titles) - 1, titles[-1])
+            self.scanned_at = now
+
+    def add(self, rows, titles=None):
+        """自分で追記した行を未処理として登録"""
+        with self.lock:
+            if not self.built:
+                return
+            for offset, row in enumerate(rows):
+                self.pending.add(row)
+                if row == self.cursor + 1:
+                    self._move_cursor(row, titles[offset] if titles else None)
+
+    def discard(self, rows):
+        """完了になった行をインデックスから除外"""
+        with self.lock:
+            for row in rows:
+                self.pending.discard(row)
+
+    def candidates(self):
+        """未処理候補の行番号（昇順）"""
+        with self.lock:
+            return sorted(self.pending)
+
+
+class TitleRowIndex(_CursorIndex):
+    """
+    正規化タイトル -> 行番号 のインデックス（重複タイトルは最初の行を優先）
+
+    他のクライアントによる行の削除・並べ替えで行番号は古くなりうるため、
+    書き込みに使う前に SheetsHandler 側でA列を読み直して確認する。
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.cursor = 1
+            self.cursor_title = None
+            self.rows = {}
+            self.built_at = None
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def scan(self, start_row, titles):
+        """start_row 以降のA列の値からインデックスを更新"""
+        with self.lock:
+            if self.built_at is None:
+                self.built_at = time.monotonic()
+            for offset, title in enumerate(titles):
+                row = start_row + offset
+                key = normalize_title(title)
+                if row == 1 or not key:
+                    continue # ヘッダー・空行をスキップ
+                self.rows.setdefault(key, row)
+            if titles:
+                self._move_cursor(start_row + len(titles) - 1, titles[-1])
+
+    def add(self, title, row):
+        """自分で追記した行を登録"""
+        with self.lock:
+            self.rows.setdefault(normalize_title(title), row)
+            if row == self.cursor + 1:
+                self._move_cursor(row, title)
+
+    def get(self, title):
+        with self.lock:
+            return self.rows.get(normalize_title(title))
@@ -0,0 +1,454 @@
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import Config
+from src.sheets_handler import SheetsHandler
+from src.sheets_index import normalize_title, parse_updated_rows
+
+# ロギング設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# technical_spec.md のデータ構造（A〜F列）
+COLUMNS = ["title", "script", "prompt", "status", "created", "note"]
+
+
+def row_hash(values):
+    """A〜F列の値から行ハッシュを計算"""
+    padded = (list(values) + [""] * len(COLUMNS))[:len(COLUMNS)]
+    return hashlib.sha1(json.dumps(padded, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SheetsMirror:
+    """
+    「データ」ワークシート（A〜F列）のローカルSQLiteミラー
+
+    - 読み取りはローカルDBから返す
+    - 書き込みはローカルDBに即時反映し、outbox に積んで push() で送信する（オフライン時は溜まる）
+    - pull() はリモートの行ハッシュとローカルの行ハッシュを比較し、変わった行だけを書き換える
+    """
+
+    DB_PATH = os.path.join("data", "sheets_mirror.db")
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or self.DB_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rows (
+                    row_index INTEGER PRIMARY KEY,
+                    title TEXT, script TEXT, prompt TEXT, status TEXT, created TEXT, note TEXT,
+                    hash TEXT,
+                    title_key TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_rows_title_key ON rows(title_key);
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """1操作ごとに接続を開き、コミットして閉じる（Streamlitのスレッドをまたいで使うため）"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- メタ情報 ---
+
+    def get_meta(self, key, default=None):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_synced_at(self):
+        return float(self.get_meta("last_synced_at", 0))
+
+    def has_data(self):
+        return self.get_meta("last_synced_at") is not None
+
+    # --- ローカル読み取り ---
+
+    def get_all_titles(self):
+        """A列（タイトル）を取得（ヘッダー行は含まない）"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT title FROM rows WHERE row_index > 1 ORDER BY row_index").fetchall()
+        titles = [r["title"] or "" for r in rows]
+        while titles and not titles[-1]:
+            titles.pop()
+        return titles
+
+    def get_unprocessed_rows(self, n=1):
+        """D列が空の行を上から最大 n 件取得: [(行番号, [A, B, C, D]), ...]"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM rows WHERE row_index > 1 AND title != '' AND COALESCE(status, '') = '' "
+                "ORDER BY row_index LIMIT ?",
+                (n,),
+            ).fetchall()
+        return [(r["row_index"], [r["title"], r["script"], r["prompt"], r["status"]]) for r in rows]
+
+    def find_title_row(self, title):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT row_index FROM rows WHERE title_key = ? ORDER BY row_index LIMIT 1",
+                (normalize_title(title),),
+            ).fetchone()
+        return row["row_index"] if row else None
+
+    def get_row(self, row_index):
+        with self._connect() as conn:
+            return self._read_row(conn, row_index)
+
+    def _read_row(self, conn, row_index):
+        row = conn.execute("SELECT * FROM rows WHERE row_index = ?", (row_index,)).fetchone()
+        return [row[c] or "" for c in COLUMNS] if row else None
+
+    # --- ローカル書き込み（outbox に積む） ---
+
+    def _write_row(self, conn, row_index, values):
+        values = (list(values) + [""] * len(COLUMNS))[:len(COLUMNS)]
+        conn.execute(
+            "INSERT OR REPLACE INTO rows (row_index, title, script, prompt, status, created, note, hash, title_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [row_index] + values + [row_hash(values), normalize_title(values[0])],
+        )
+
+    def _enqueue(self, conn, op, row_index, payload):
+        conn.execute(
+            "INSERT INTO outbox (op, row_index, payload) VALUES (?, ?, ?)",
+            (op, row_index, json.dumps(payload, ensure_ascii=False)),
+        )
+
+    # 更新系の書き込みにはA列のタイトルを記録し、push 時に書き込み先の行が変わっていないか確認する
+
+    def queue_update_row_data(self, row_index, script, prompt):
+        with self._connect() as conn:
+            values = self._read_row(conn, row_index) or [""] * len(COLUMNS)
+            values[1], values[2] = script, prompt
+            self._write_row(conn, row_index, values)
+            self._enqueue(conn, "update_row_data", row_index, {"title": values[0], "script": script, "prompt": prompt})
+
+    def queue_mark_as_completed(self, row_index, date=None):
+        date = date or datetime.date.today().isoformat()
+        with self._connect() as conn:
+            values = self._read_row(conn, row_index) or [""] * len(COLUMNS)
+            values[3], values[4] = "完了", date
+            self._write_row(conn, row_index, values)
+            self._enqueue(conn, "mark_as_completed", row_index, {"title": values[0], "date": date})
+        return date
+
+    def queue_append_row(self, values):
+        """
+        行を末尾に追加（行番号は暫定。push 時に append のレスポンスで確定させる）
+
+        Returns:
+            int: 暫定の行番号
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(row_index), 1) AS last FROM rows").fetchone()
+            row_index = row["last"] + 1
+            self._write_row(conn, row_index, values)
+            self._enqueue(conn, "append", row_index, {"values": list(values)})
+        return row_index
+
+    def pending_writes(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) AS n FROM outbox").fetchone()["n"]
+
+    # --- 同期 ---
+
+    def pull(self, values, revision=None):
+        """
+        リモートの全行（A〜F）をハッシュで比較し、変わった行だけローカルに反映
+
+        outbox に未送信の書き込みがある行はローカルの内容を優先する。
+
+        Returns:
+            int: 書き換えた行数
+        """
+        changed = 0
+        with self._connect() as conn:
+            dirty = {r["row_index"] for r in conn.execute("SELECT DISTINCT row_index FROM outbox")}
+            local = {r["row_index"]: r["hash"] for r in conn.execute("SELECT row_index, hash FROM rows")}
+            for row_index, row in enumerate(values, start=1):
+                if row_index in dirty:
+                    continue
+                remote = (list(row) + [""] * len(COLUMNS))[:len(COLUMNS)]
+                if local.get(row_index) != row_hash(remote):
+                    self._write_row(conn, row_index, remote)
+                    changed += 1
+            # リモートで削除された（アーカイブ等）行を削除
+            cur = conn.execute(
+                "DELETE FROM rows WHERE row_index > ? AND row_index NOT IN (SELECT row_index FROM outbox)",
+                (len(values),),
+            )
+            changed += cur.rowcount
+        if revision is not None:
+            self.set_meta("revision", revision)
+        self.set_meta("last_synced_at", time.time())
+        logger.info(f"Mirror pull: {changed} rows changed.")
+        return changed
+
+    def push(self, handler):
+        """
+        outbox の書き込みをまとめて送信（更新系は1回の batchUpdate、追加は1回の append）
+
+        更新系は送信前に書き込み先の行のA列を読み（batch_get 1回）、タイトルが変わっていれば
+        （他のクライアントが行を削除・並べ替えた）全行を読み直してタイトルで行番号を付け替える。
+        送信に失敗した場合は outbox に残し、次回の同期で再送する。
+
+        Returns:
+            int: 送信した書き込み数
+        """
+        with self._connect() as conn:
+            ops = conn.execute("SELECT * FROM outbox ORDER BY id").fetchall()
+        if not ops:
+            return 0
+
+        appends = [op for op in ops if op["op"] == "append"]
+        if appends:
+            response = handler.worksheet.append_rows(
+                [json.loads(op["payload"])["values"] for op in appends], value_input_option="USER_ENTERED"
+            )
+            remap = dict(zip([op["row_index"] for op in appends], parse_updated_rows(response)))
+            moves = [(local_row, remote_row) for local_row, remote_row in remap.items() if local_row != remote_row]
+            with self._connect() as conn:
+                # 暫定の行番号を確定した行番号に付け替える（1トランザクション）
+                # 確定した行番号が別の未送信の行と重なることがあるため、いったん負の番号に退避してから付け替える
+                for local_row, _ in moves:
+                    conn.execute("UPDATE rows SET row_index = ? WHERE row_index = ?", (-local_row, local_row))
+                    conn.execute("UPDATE outbox SET row_index = ? WHERE row_index = ?", (-local_row, local_row))
+                for local_row, remote_row in moves:
+                    # 付け替え先に残っている古い行（リモートでは既に別の行）を消す
+                    conn.execute("DELETE FROM rows WHERE row_index = ?", (remote_row,))
+                    conn.execute("UPDATE rows SET row_index = ? WHERE row_index = ?", (remote_row, -local_row))
+                    conn.execute("UPDATE outbox SET row_index = ? WHERE row_index = ?", (remote_row, -local_row))
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(op["id"],) for op in appends])
+            # 付け替え後の行番号で残りの書き込みを読み直す
+            with self._connect() as conn:
+                ops = conn.execute(
+                    "SELECT * FROM outbox WHERE id <= ? ORDER BY id", (ops[-1]["id"],)
+                ).fetchall()
+
+        moved = False
+        if ops:
+            sending, moved = self._verify_targets(handler, ops)
+            with handler.batch() as batch:
+                for op in sending:
+                    payload = json.loads(op["payload"])
+                    if op["op"] == "update_row_data":
+                        batch.update_row_data(op["row_index"], payload["script"], payload["prompt"])
+                    elif op["op"] == "mark_as_completed":
+                        batch.mark_as_completed(op["row_index"], date=payload["date"])
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(op["id"],) for op in ops])
+            ops = sending
+        if moved:
+            # ローカルの行番号もずれているため、送信後のシートを取り込み直す
+            revision = handler._get_revision()
+            self.pull(handler.worksheet.get_all_values(), revision)
+        sent = len(appends) + len(ops)
+        logger.info(f"Mirror push: {sent} queued writes sent.")
+        return sent
+
+
+    def _verify_targets(self, handler, ops):
+        """
+        更新系の書き込み先の行のA列が、キューに積んだ時点のタイトルと一致するか確認
+
+        一致しない書き込みは、全行を読み直して同じタイトルの行へ付け替える。
+        タイトルがシートから消えていた（アーカイブ等）書き込みは送らずに破棄する。
+
+        Returns:
+            Tuple[List[dict], bool]: (送信する書き込み, 行番号を付け替えたか)
+        """
+        ops = [dict(op) for op in ops]
+        with self._connect() as conn:
+            for op in ops:
+                title = json.loads(op["payload"]).get("title")
+                if title is None:
+                    row = self._read_row(conn, op["row_index"])
+                    title = row[0] if row else ""
+                op["title_key"] = normalize_title(title)
+
+        rows = sorted({op["row_index"] for op in ops})
+        remote = {}
+        for row, values in zip(rows, handler.worksheet.batch_get([f"A{row}" for row in rows])):
+            remote[row] = normalize_title(values[0][0] if values and values[0] else "")
+        moved = {op["id"] for op in ops if remote[op["row_index"]] != op["title_key"]}
+        if not moved:
+            return ops, False
+
+        logger.warning(f"Mirror push: {len(moved)} queued writes target rows that moved on the sheet. Remapping by title.")
+        rows_by_title = {}
+        for row_index, row in enumerate(handler.worksheet.get_all_values(), start=1):
+            if row_index > 1 and row and row[0]:
+                rows_by_title.setdefault(normalize_title(row[0]), row_index)
+        sending = []
+        for op in ops:
+            if op["id"] in moved:
+                row_index = rows_by_title.get(op["title_key"]) if op["title_key"] else None
+                if row_index is None:
+                    logger.warning(f"Mirror push: dropped {op['op']} for row {op['row_index']} (title no longer on the sheet).")
+                    continue
+                op["row_index"] = row_index
+            sending.append(op)
+        return sending, True
+
+
+class MirroredSheetsHandler(SheetsHandler):
+    """
+    SheetsMirror 経由で動く SheetsHandler
+
+    読み取りはローカルSQLiteから返し、書き込みはローカルに反映した上で送信を試みる。
+    オフラインでも（一度でも同期済みなら）読み書きでき、書き込みは次回の同期で送信される。
+    batch() による直接書き込みはミラーを経由しないため、次回の pull で取り込まれる。
+    """
+
+    def __init__(self, mirror=None):
+        self.mirror = mirror or SheetsMirror()
+        try:
+            super().__init__()
+            self.online = True
+        except ConnectionError:
+            if not self.mirror.has_data():
+                raise
+            logger.warning("Sheets is unreachable. Serving reads from the local mirror.")
+            self.online = False
+        if self.online and time.time() - self.mirror.last_synced_at >= Config.SHEETS_MIRROR_SYNC_SEC:
+            self.sync()
+
+    def sync(self):
+        """未送信の書き込みを送信し、リモートの変更を取り込む"""
+        if not self.online:
+            return False
+        with self.mirror._sync_lock:
+            try:
+                self.mirror.push(self)
+                revision = self._get_revision()
+                if revision is None or revision != self.mirror.get_meta("revision"):
+                    self._pull(revision)
+                else:
+                    self.mirror.set_meta("last_synced_at", time.time())
+                return True
+            except Exception as e:
+                logger.warning(f"Mirror sync failed (writes stay queued): {e}")
+                return False
+
+    def _pull(self, revision=None):
+        """
+        全行をシートから直接読んでミラーに取り込む
+
+        プロセス共有のスナップショット（SHEETS_CACHE_TTL）は新しい更新時刻より古いことがあるため使わない。
+        更新時刻は値より先に取得し、読み取り中の変更は次回の同期で取り込む。
+        """
+        if revision is None:
+            revision = self._get_revision()
+        self.mirror.pull(self.worksheet.get_all_values(), revision)
+
+    def _push(self):
+        if self.online:
+            with self.mirror._sync_lock:
+                try:
+                    self.mirror.push(self)
+                except Exception as e:
+                    logger.warning(f"Mirror push failed (writes stay queued): {e}")
+
+    # --- 読み取り（ローカル） ---
+
+    def get_all_titles(self, include_archived=True):
+        titles = self.mirror.get_all_titles()
+        if include_archived and self.online:
+            titles += self.get_archived_titles()
+        return titles
+
+    def get_unprocessed_rows(self, n=1, include_body=True):
+        return self.mirror.get_unprocessed_rows(n)
+
+    def find_title_row(self, title):
+        return self.mirror.find_title_row(title)
+
+    def _rebuild_title_index(self):
+        """未送信の書き込みを送り、全行を読み直してミラーの行番号を取り込み直す"""
+        with self.mirror._sync_lock:
+            self.mirror.push(self)
+            self._pull()
+
+    # --- 書き込み（ローカルに反映して送信） ---
+
+    def append_new_titles(self, titles):
+        for title in titles:
+            self.mirror.queue_append_row([title])
+        self._push()
+
+    def update_row_data(self, row_index, script, prompt):
+        self.mirror.queue_update_row_data(row_index, script, prompt)
+        self._push()
+
+    def update_rows_data(self, rows):
+        for row_index, script, prompt in rows:
+            self.mirror.queue_update_row_data(row_index, script, prompt)
+        self._push()
+
+    def mark_as_completed(self, row_index):
+        self.mirror.queue_mark_as_completed(row_index)
+        self._push()
+
+    def mark_rows_completed(self, row_indices):
+        for row_index in row_indices:
+            self.mirror.queue_mark_as_completed(row_index)
+        self._push()
+
+    def upsert_title_row(self, title, script, prompts):
+        # オンライン時は基底クラスと同じく書き込み先の行のA列を確認する（ずれていればミラーを読み直す）
+        row_index = self.mirror.find_title_row(title)
+        if row_index and self.online:
+            try:
+                row_index = self.find_verified_title_row(title)
+            except Exception as e:
+                logger.warning(f"Could not verify row {row_index} for '{title}' (checked again on push): {e}")
+        if row_index:
+            self.update_row_data(row_index, script, prompts)
+            return row_index, False
+        self.mirror.queue_append_row([title, script, prompts])
+        self._push()
+        # push で行番号が確定していればそちらを返す
+        return self.mirror.find_title_row(title), True
+
+    # --- アーカイブ ---
+
+    def archive_completed(self, older_than_days, dry_run=False):
+        """未送信の書き込みを送ってからアーカイブし、ずれた行番号をミラーに取り込み直す"""
+        if not self.online:
+            return []
+        with self.mirror._sync_lock:
+            self.mirror.push(self)
+            if self.mirror.pending_writes():
+                logger.warning("Archive skipped: queued writes could not be sent.")
+                return []
+            rows = super().archive_completed(older_than_days, dry_run=dry_run)
+            if rows and not dry_run:
+                self._pull()
+        return rows
@@ -0,0 +1,101 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+
+# ロギング設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SQLiteLRUStore:
+    """
+    件数・合計サイズの上限付きでディスクに保存するストアの基底クラス（SQLite）
+
+    サブクラスは TABLE（テーブル名）・COLUMNS（key / size / created_at / last_access 以外の列定義）・
+    NAME（ログ用の名前）を定義する。上限を超えた場合は、最後に使われた時刻が古いものから削除する（LRU）。
+    ヒット数・ミス数は counters テーブルに記録する。
+    """
+
+    TABLE = None
+    COLUMNS = ""
+    NAME = "SQLite store"
+
+    def __init__(self, db_path, max_entries, max_bytes):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    key TEXT PRIMARY KEY,
+                    {self.COLUMNS},
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_last_access ON {self.TABLE}(last_access);
+                CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn, name, amount=1):
+        if amount:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, amount),
+            )
+
+    def _touch(self, conn, keys):
+        """使われたエントリの最終利用時刻を更新"""
+        now = time.time()
+        conn.executemany(f"UPDATE {self.TABLE} SET last_access = ? WHERE key = ?", [(now, key) for key in keys])
+
+    def _evict(self, conn):
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute(f"SELECT key, size FROM {self.TABLE} ORDER BY last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        logger.info(f"{self.NAME} evicted {evicted} entries.")
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+
+    def clear(self):
+        """全エントリと統計をリセット"""
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.TABLE}")
+            conn.execute("DELETE FROM counters")
+
+    def stats(self):
+        """ヒット数・ミス数・ヒット率・件数・合計サイズ"""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
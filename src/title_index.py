@@ -0,0 +1,175 @@
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+
+# 「日本語タイトル (English Title)」を日本語部分と英語部分に分ける
+_TITLE_PARTS = re.compile(r"^(.*?)\s*[(（]([^()（）]*)[)）]\s*$")
+# n-gram を作る前に取り除く記号・空白
+_STRIP = re.compile(r"[\s\W_]+", re.UNICODE)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def split_title(title):
+    """
+    「日本語 (English)」形式のタイトルを (日本語, 英語) に分ける
+    括弧が無い場合、ASCIIのみなら英語、それ以外は日本語として扱う
+    """
+    title = unicodedata.normalize("NFKC", title or "").strip()
+    match = _TITLE_PARTS.match(title)
+    if match:
+        return match.group(1), match.group(2)
+    if title.isascii():
+        return "", title
+    return title, ""
+
+
+def _ngrams(text, n):
+    text = _STRIP.sub("", text.casefold())
+    if not text:
+        return frozenset()
+    if len(text) <= n:
+        return frozenset([text])
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def title_shingles(title, jp_n=2, en_n=3):
+    """
+    タイトルの (日本語部分, 英語部分) それぞれの文字 n-gram 集合
+    日本語は2文字、英語は3文字単位（短い日本語タイトルでも差が出るように）
+    """
+    jp, en = split_title(title)
+    return _ngrams(jp, jp_n), _ngrams(en, en_n)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def title_similarity(a, b):
+    """日本語部分・英語部分の Jaccard 係数のうち高い方（片方の言語だけ一致しても重複とみなす）"""
+    return max(jaccard(a[0], b[0]), jaccard(a[1], b[1]))
+
+
+class TitleIndex:
+    """
+    タイトルの近似重複を探すためのローカル索引（文字 n-gram の MinHash + LSH）
+
+    日本語部分・英語部分をそれぞれ LSH に登録して候補を絞り込み、
+    n-gram 集合の Jaccard 係数を正確に計算して判定する。
+    APIを呼ばずに「既存ネタと似たアイディア」の検出と、プロンプトに載せる既存ネタの抽出に使う。
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, titles=None, num_perm=32, bands=16, seed=1):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self.titles = []
+        self._shingles = {}
+        self._buckets = {}
+        self.lock = threading.Lock()
+        for title in titles or []:
+            self.add(title)
+
+    @classmethod
+    def shared(cls, titles):
+        """プロセス内で共有する索引に、まだ無いタイトルを追加して返す（毎回の作り直しを避ける）"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            index = cls._shared
+        for title in titles:
+            index.add(title)
+        return index
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, title):
+        return title in self._shingles
+
+    def _signature(self, shingles):
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, shingles):
+        """日本語・英語それぞれのバンドのキー（言語ごとに別のキー空間にする）"""
+        keys = []
+        r = self.rows_per_band
+        for lang, part in zip("je", shingles):
+            if part:
+                signature = self._signature(part)
+                keys.extend((i, lang, tuple(signature[i * r:(i + 1) * r])) for i in range(self.bands))
+        return keys
+
+    def add(self, title):
+        """タイトルを索引に追加（既にある場合は何もしない）"""
+        if not title or title in self._shingles:
+            return
+        shingles = title_shingles(title)
+        if not any(shingles):
+            return
+        keys = self._band_keys(shingles)
+        with self.lock:
+            if title in self._shingles:
+                return
+            self._shingles[title] = shingles
+            self.titles.append(title)
+            for key in keys:
+                self._buckets.setdefault(key, []).append(title)
+
+    def query(self, title, threshold=0.5, limit=5):
+        """
+        似ているタイトルを類似度の高い順に返す
+
+        Returns:
+            List[Tuple[str, float]]: (既存タイトル, Jaccard 係数) のリスト
+        """
+        shingles = title_shingles(title)
+        if not any(shingles):
+            return []
+        candidates = set()
+        with self.lock:
+            for key in self._band_keys(shingles):
+                candidates.update(self._buckets.get(key, ()))
+            scored = [(c, title_similarity(shingles, self._shingles[c])) for c in candidates]
+        scored = [(c, score) for c, score in scored if score >= threshold]
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def find_duplicate(self, title, threshold=0.5):
+        """最も似ている既存タイトルと類似度を返す（閾値未満なら (None, 0.0)）"""
+        matches = self.query(title, threshold=threshold, limit=1)
+        return matches[0] if matches else (None, 0.0)
+
+    def sample(self, limit, query=None, titles=None):
+        """
+        プロンプトに載せる既存タイトルを最大 limit 件選ぶ
+        query があればそれに似たものを優先し、残りは新しく追加された順に埋める
+        titles を渡した場合はその中から選び、末尾（シートの下の行）を新しいものとして扱う
+        """
+        pool = self.titles if titles is None else [t for t in titles if t]
+        chosen = []
+        if query:
+            allowed = set(pool)
+            chosen = [t for t, _ in self.query(query, threshold=0.2, limit=len(self)) if t in allowed][:limit]
+        for title in reversed(pool):
+            if len(chosen) >= limit:
+                break
+            if title not in chosen:
+                chosen.append(title)
+        return chosen
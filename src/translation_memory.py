@@ -0,0 +1,90 @@
+import hashlib
+import json
+import re
+import time
+import unicodedata
+
+from src.config import Config
+from src.sqlite_lru import SQLiteLRUStore
+
+# SQLite の1文あたりのプレースホルダ数の上限より十分小さい値
+LOOKUP_BATCH_SIZE = 500
+
+
+class TranslationMemory(SQLiteLRUStore):
+    """
+    DeepL の翻訳結果をディスクに保存する翻訳メモリ（SQLite）
+
+    キーは「正規化した原文・翻訳先言語・用語集の版」のハッシュ。原文は Unicode 正規化（NFC）し、
+    前後の空白を除いて連続する空白を1つにまとめてから照合する。
+    件数・合計サイズの上限を超えた場合は、最後に使われた時刻が古いものから削除する（LRU）。
+    """
+
+    TABLE = "translations"
+    COLUMNS = "source TEXT NOT NULL, target_lang TEXT NOT NULL, glossary TEXT NOT NULL, text TEXT NOT NULL"
+    NAME = "Translation memory"
+
+    def __init__(self, db_path=None, max_entries=None, max_bytes=None):
+        super().__init__(
+            db_path or Config.TRANSLATION_MEMORY_PATH,
+            max_entries or Config.TRANSLATION_MEMORY_MAX_ENTRIES,
+            max_bytes or Config.TRANSLATION_MEMORY_MAX_BYTES,
+        )
+
+    @staticmethod
+    def normalize(text):
+        """照合用に原文を正規化（NFC・前後の空白除去・連続する空白を1つに）"""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text or "")).strip()
+
+    @classmethod
+    def make_key(cls, text, target_lang, glossary_version=""):
+        """原文・翻訳先言語・用語集の版からキーを作成"""
+        payload = json.dumps(
+            {"source": cls.normalize(text), "target_lang": (target_lang or "").upper(), "glossary": glossary_version or ""},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, texts, target_lang, glossary_version=""):
+        """
+        保存済みの訳を取得
+        Returns:
+            Dict[str, str]: 見つかった原文 -> 訳（見つからない原文は含まない）
+        """
+        keys = {}
+        for text in texts:
+            keys.setdefault(self.make_key(text, target_lang, glossary_version), []).append(text)
+        found = {}
+        with self._connect() as conn:
+            key_list = list(keys)
+            for start in range(0, len(key_list), LOOKUP_BATCH_SIZE):
+                batch = key_list[start:start + LOOKUP_BATCH_SIZE]
+                rows = conn.execute(
+                    f"SELECT key, text FROM translations WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, translated in rows:
+                    for text in keys[key]:
+                        found[text] = translated
+                self._touch(conn, [key for key, _ in rows])
+            self._count(conn, "hits", len(found))
+            self._count(conn, "misses", len(set(texts)) - len(found))
+        return found
+
+    def store(self, translations, target_lang, glossary_version=""):
+        """原文 -> 訳 の dict を保存し、上限を超えた分を古い順に削除"""
+        if not translations:
+            return
+        now = time.time()
+        rows = []
+        for text, translated in translations.items():
+            size = len(text.encode("utf-8")) + len(translated.encode("utf-8"))
+            rows.append((self.make_key(text, target_lang, glossary_version), self.normalize(text),
+                         (target_lang or "").upper(), glossary_version or "", translated, size, now, now))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(key, source, target_lang, glossary, text, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(conn)
@@ -0,0 +1,104 @@
+import queue
+import threading
+
+from src.deepl_translator import MAX_TEXTS_PER_REQUEST, PartialTranslationError
+
+# ワーカーを止めるための印
+_STOP = object()
+
+
+class TranslationPipeline:
+    """
+    台本の各行を別スレッドで翻訳するパイプライン
+
+    submit() した行は、ワーカーがその時点で溜まっている分をまとめて translate_batch で翻訳する（マイクロバッチ）。
+    前のバッチの翻訳中に届いた行が次のバッチになるため、ストリーミングでは行が届くたびに1件ずつ送ることはない。
+    Gemini の応答待ち・解析・プロンプトの補完と翻訳を重ね、合計時間を「生成 + 翻訳」から
+    max(生成, 翻訳) に近づける。翻訳できなかった行は "" になる。
+    """
+
+    def __init__(self, translator, target_lang="JA", max_batch=MAX_TEXTS_PER_REQUEST):
+        self.translator = translator
+        self.target_lang = target_lang
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._results = {}
+        self._unpolled = []
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._thread = None
+        self._closed = False
+
+    def submit(self, index, line):
+        """index 番目の行を翻訳待ちに追加（初回にワーカーを起動）"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TranslationPipeline is already joined")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="translation-pipeline", daemon=True)
+                self._thread.start()
+            self._submitted = max(self._submitted, index + 1)
+        self._queue.put((index, line))
+
+    def submit_all(self, lines):
+        for i, line in enumerate(lines):
+            self.submit(i, line)
+
+    def poll(self):
+        """前回の poll 以降に翻訳が終わった (番号, 訳) のリスト（番号順）"""
+        with self._lock:
+            ready, self._unpolled = self._unpolled, []
+        return sorted(ready)
+
+    def join(self, timeout=None):
+        """
+        全ての行の翻訳を待ち、submit した番号順の訳のリストを返す
+        timeout 秒を過ぎても終わらない行は "" のまま返す。
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        with self._lock:
+            return [self._results.get(i, "") for i in range(self._submitted)]
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            # 翻訳中に溜まった行をまとめて次のバッチにする
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._translate(batch)
+            if stop:
+                return
+
+    def _translate(self, batch):
+        lines = [line for _, line in batch]
+        if self.translator is None:
+            translated = ["" for _ in lines]
+        else:
+            try:
+                translated = self.translator.translate_batch(lines, self.target_lang)
+            except PartialTranslationError as e:
+                print(f"Translation integration error: {e}")
+                translated = e.results
+            except Exception as e:
+                print(f"Translation integration error: {e}")
+                translated = ["" for _ in lines]
+        with self._lock:
+            for (i, _), text in zip(batch, translated):
+                self._results[i] = text
+                self._unpolled.append((i, text))
@@ -0,0 +1,32 @@
+"""
+壊れたモデル出力のコーパスに対する extract_json のベンチマーク
+
+    python tests/bench_json_repair.py [繰り返し回数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_repair import IDEAS_SCHEMA, SCRIPT_SCHEMA, extract_json
+from tests.test_json_repair import EXPECTED, load_case
+
+
+def run(iterations=200):
+    print(f"{'case':<30} {'bytes':>7} {'us/op':>9}  repairs")
+    total = 0.0
+    for name in sorted(EXPECTED):
+        text = load_case(name)
+        schema = SCRIPT_SCHEMA if EXPECTED[name]["schema"] == "script" else IDEAS_SCHEMA
+        started = time.perf_counter()
+        for _ in range(iterations):
+            _, repairs = extract_json(text, schema)
+        elapsed = (time.perf_counter() - started) / iterations
+        total += elapsed
+        print(f"{name:<30} {len(text.encode('utf-8')):>7} {elapsed * 1e6:>9.1f}  {', '.join(repairs)}")
+    print(f"{'total':<30} {'':>7} {total * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
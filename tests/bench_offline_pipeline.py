@@ -0,0 +1,43 @@
+"""
+Mode A → B → C の一連の処理を replay モードで実行し、所要時間を計測する（ネットワーク不要）
+
+    python tests/bench_offline_pipeline.py [フィクスチャのディレクトリ] [繰り返し回数] [待ち時間の倍率]
+
+ディレクトリを省略した場合は、テスト用のモック応答を一時ディレクトリに記録して使う。
+実際の応答で計測するには、先に BACKEND_MODE=record でアプリを操作してフィクスチャを作っておく。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config
+from tests.test_backends import _reset_state, backend, record_fixtures, run_pipeline
+
+
+def run(fixtures_dir, iterations=5, latency_scale=1.0):
+    print(f"fixtures: {fixtures_dir} (latency x{latency_scale})")
+    timings = []
+    with backend("replay", fixtures_dir, latency_scale=latency_scale):
+        for i in range(iterations):
+            # 毎回、記録時と同じシートの状態から始める
+            _reset_state()
+            started = time.perf_counter()
+            result = run_pipeline()
+            timings.append(time.perf_counter() - started)
+            print(f"run {i + 1}: {timings[-1] * 1000:8.1f} ms  ({result['title']}, {len(result['prompts'])} scenes)")
+    print(f"avg  : {sum(timings) / len(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    iterations = int(args[1]) if len(args) > 1 else 5
+    scale = float(args[2]) if len(args) > 2 else Config.BACKEND_LATENCY_SCALE
+    if args and args[0] != "-":
+        run(args[0], iterations, scale)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            record_fixtures(tmp)
+            run(tmp, iterations, scale)
@@ -0,0 +1,153 @@
+import pytest
+from unittest.mock import patch
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+from src.config import Config
+from src.sheets_client import SheetsClientPool
+from src.sheets_handler import SheetsHandler
+
+
+SHEET_VALUES = [
+    ["ネタ", "台本", "プロンプト", "完了", "作成日", "備考"],
+    ["口裂け女 (Slit-Mouthed Woman)", "script", "prompt", "完了", "2025-01-01", ""],
+    ["きさらぎ駅 (Kisaragi Station)", "", "", "", "", ""],
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter():
+    """テストごとにクォータのカウンタをリセット"""
+    SheetsClientPool._limiter = None
+    yield
+    SheetsClientPool._limiter = None
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_metrics(tmp_path):
+    """Gemini 呼び出しの計測値をテストごとの一時ファイルに書く"""
+    with patch.object(Config, "LLM_METRICS_PATH", str(tmp_path / "llm_metrics.jsonl")):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_translation_memory(tmp_path):
+    """DeepL の翻訳メモリをテストごとの一時ファイルにする"""
+    with patch.object(Config, "TRANSLATION_MEMORY_PATH", str(tmp_path / "translation_memory.db")):
+        yield
+
+
+def _reset_sheets_state():
+    SheetsHandler._snapshots.clear()
+    SheetsHandler._pending_indexes.clear()
+    SheetsHandler._title_indexes.clear()
+    SheetsHandler._archived_titles.clear()
+    SheetsHandler._last_auto_archive.clear()
+    SheetsClientPool.reset()
+
+
+class FakeWorksheet:
+    """A1表記の読み書きだけを再現するテスト用ワークシート"""
+
+    def __init__(self, values, title="データ", sheet_id=0):
+        self.values = [list(r) for r in values]
+        self.requests = []
+        self.title = title
+        self.id = sheet_id
+
+    def _cell(self, row, col):
+        if row < len(self.values) and col < len(self.values[row]):
+            return self.values[row][col]
+        return ""
+
+    def _read(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        start_row = grid.get("startRowIndex", 0)
+        end_row = grid.get("endRowIndex", len(self.values))
+        cols = range(grid.get("startColumnIndex", 0), grid.get("endColumnIndex", 6))
+        rows = [[self._cell(r, c) for c in cols] for r in range(start_row, min(end_row, len(self.values)))]
+        # Sheets API と同様に末尾の空セル・空行を詰める
+        rows = [r[:max([i + 1 for i, v in enumerate(r) if v] or [0])] for r in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def get(self, range_name, **kwargs):
+        self.requests.append(("get", range_name))
+        return self._read(range_name)
+
+    def batch_get(self, ranges, **kwargs):
+        self.requests.append(("batch_get", list(ranges)))
+        return [self._read(a1) for a1 in ranges]
+
+    def batch_update(self, data, **kwargs):
+        self.requests.append(("batch_update", data))
+        for item in data:
+            grid = a1_range_to_grid_range(item["range"])
+            for dr, row in enumerate(item["values"]):
+                for dc, value in enumerate(row):
+                    r, c = grid["startRowIndex"] + dr, grid["startColumnIndex"] + dc
+                    while len(self.values) <= r:
+                        self.values.append([])
+                    while len(self.values[r]) <= c:
+                        self.values[r].append("")
+                    self.values[r][c] = value
+        return {}
+
+    def append_rows(self, rows, **kwargs):
+        self.requests.append(("append_rows", rows))
+        start = len(self.values) + 1
+        self.values.extend(list(r) for r in rows)
+        end = len(self.values)
+        return {"updates": {"updatedRange": f"'データ'!A{start}:F{end}"}}
+
+    def get_all_values(self):
+        self.requests.append(("get_all_values",))
+        return [list(r) for r in self.values]
+
+
+class FakeSpreadsheet:
+    """ワークシートの取得・追加・行削除だけを再現するテスト用スプレッドシート"""
+
+    def __init__(self, worksheets):
+        self.worksheets = {ws.title: ws for ws in worksheets}
+        self.revision = "rev-1"
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.worksheets[title] = FakeWorksheet([], title=title, sheet_id=len(self.worksheets))
+        return self.worksheets[title]
+
+    def get_lastUpdateTime(self):
+        return self.revision
+
+    def batch_update(self, body):
+        sheets = {ws.id: ws for ws in self.worksheets.values()}
+        for request in body["requests"]:
+            r = request["deleteDimension"]["range"]
+            del sheets[r["sheetId"]].values[r["startIndex"]:r["endIndex"]]
+        return {}
+
+
+@pytest.fixture
+def fake_worksheet(monkeypatch):
+    """gspread をモックし、「データ」タブとして FakeWorksheet を返す"""
+    monkeypatch.setattr(Config, "validate", classmethod(lambda cls: None))
+    monkeypatch.setattr(Config, "SPREADSHEET_ID", "sheet-id")
+    _reset_sheets_state()
+    worksheet = FakeWorksheet(SHEET_VALUES)
+    with patch("src.sheets_client.gspread") as mock_gspread:
+        worksheet.spreadsheet = FakeSpreadsheet([worksheet])
+        mock_gspread.service_account.return_value.open_by_key.return_value = worksheet.spreadsheet
+        yield worksheet
+    _reset_sheets_state()
+
+
+@pytest.fixture
+def fake_handler(fake_worksheet):
+    """FakeWorksheet を使う SheetsHandler"""
+    return SheetsHandler()
@@ -0,0 +1,156 @@
+import json
+import sys
+import pytest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.backends import FixtureStore, OfflineSpreadsheet, ReplayGeminiModel, ReplayMissError
+from src.config import Config
+from src.deepl_translator import DeepLTranslator
+from src.sheets_client import SheetsClientPool
+from src.sheets_handler import SheetsHandler
+from src.title_index import TitleIndex
+
+
+SHEET = [
+    ["ネタ", "台本", "プロンプト", "完了", "作成日", "備考"],
+    ["口裂け女 (Slit-Mouthed Woman)", "script", "prompt", "完了", "2025-01-01", ""],
+    ["きさらぎ駅 (Kisaragi Station)", "", "", "", "", ""],
+]
+IDEAS = {
+    "discussion": "議論",
+    "ideas": [{"title": "猿夢 (Monkey Dream)", "overview": "夢の中の電車", "horror_point": "逃げられない"}],
+}
+SCRIPT = {
+    "editorial_notes": "notes",
+    "title_en": "Monkey Dream",
+    "title_jp": "猿夢",
+    "description": "desc",
+    "hashtags": ["#Shorts"],
+    "vrew_script": ["A tiny train enters the dream", "The conductor smiles at you"],
+    "mj_prompts": [
+        {"scene": 1, "prompt": "tiny amusement train entering a dream"},
+        {"scene": 2, "prompt": "smiling conductor in a monkey mask"},
+    ],
+}
+
+
+def _reset_state():
+    SheetsHandler._snapshots.clear()
+    SheetsHandler._pending_indexes.clear()
+    SheetsHandler._title_indexes.clear()
+    SheetsHandler._archived_titles.clear()
+    SheetsHandler._last_auto_archive.clear()
+    SheetsClientPool.reset()
+    TitleIndex.reset_shared()
+
+
+@contextmanager
+def backend(mode, fixtures_dir, latency_scale=0.0):
+    with patch.object(Config, "BACKEND_MODE", mode), \
+            patch.object(Config, "BACKEND_FIXTURES_DIR", str(fixtures_dir)), \
+            patch.object(Config, "BACKEND_LATENCY_SCALE", latency_scale), \
+            patch.object(Config, "SPREADSHEET_ID", "sheet-id"), \
+            patch.object(Config, "SHEETS_LEASE_SETTLE_SEC", 0.0):
+        _reset_state()
+        try:
+            yield
+        finally:
+            _reset_state()
+
+
+def run_pipeline():
+    """Mode A（企画）→ Mode B（台本）→ Mode C（制作キュー）の一連の処理"""
+    handler = SheetsHandler()
+    ai = AIGenerator(use_cache=False)
+    ideas, _ = ai.generate_new_ideas(handler.get_all_titles())
+    title = next(iter(ideas))
+    result = ai.generate_script_and_prompts(title, context=ideas[title])
+    row, created = handler.upsert_title_row(title, result["vrew_script"], "\n".join(result["mj_prompts_list"]))
+    claimed_row, claimed = handler.claim_next_row("worker-1")
+    handler.mark_as_completed(claimed_row)
+    handler.release_lease(claimed_row, "worker-1")
+    return {
+        "title": title,
+        "script_jp": result["script_jp_list"],
+        "prompts": result["mj_prompts_list"],
+        "row": row,
+        "created": created,
+        "claimed": (claimed_row, claimed[0]),
+    }
+
+
+def fake_generate_content(prompt, generation_config=None, stream=False, **kwargs):
+    data = IDEAS if "企画会議" in prompt else SCRIPT
+    return MagicMock(text=json.dumps(data, ensure_ascii=False),
+                     usage_metadata=MagicMock(prompt_token_count=100, candidates_token_count=50))
+
+
+def fake_deepl_post(url, data=None, **kwargs):
+    texts = data["text"] if isinstance(data["text"], list) else [data["text"]]
+    body = {"translations": [{"text": f"訳:{text}"} for text in texts]}
+    response = MagicMock(status_code=200, headers={}, text=json.dumps(body, ensure_ascii=False))
+    response.json.return_value = body
+    return response
+
+
+def record_fixtures(fixtures_dir):
+    """実サービスの代わりにモックを使って record モードでパイプラインを実行し、フィクスチャを作る"""
+    live_sheet = OfflineSpreadsheet([{"title": "データ", "id": 0, "values": SHEET}], latency=0.0)
+    with backend("record", fixtures_dir), \
+            patch.object(Config, "validate", classmethod(lambda cls: None)), \
+            patch("src.ai_generator.genai") as genai, \
+            patch("requests.Session.post", side_effect=fake_deepl_post), \
+            patch("src.sheets_client.gspread") as gspread:
+        genai.GenerativeModel.return_value.generate_content.side_effect = fake_generate_content
+        gspread.service_account.return_value.open_by_key.return_value = live_sheet
+        return run_pipeline()
+
+
+class TestRecordReplay:
+    """record で保存した応答を replay でネットワークなしに再生するテスト"""
+
+    def test_full_flow_replays_offline(self, tmp_path):
+        recorded = record_fixtures(tmp_path)
+        assert recorded["script_jp"] == ["訳:A tiny train enters the dream", "訳:The conductor smiles at you"]
+
+        with backend("replay", tmp_path), \
+                patch("requests.Session.post", side_effect=AssertionError("network")), \
+                patch("src.sheets_client.gspread.service_account", side_effect=AssertionError("network")), \
+                patch.object(Config, "GEMINI_API_KEY", None), patch.object(Config, "DEEPL_API_KEY", None):
+            replayed = run_pipeline()
+
+        assert replayed == recorded
+        assert replayed["claimed"] == (3, "きさらぎ駅 (Kisaragi Station)")
+
+    def test_replay_miss_raises(self, tmp_path):
+        with backend("replay", tmp_path):
+            with pytest.raises(ReplayMissError):
+                ReplayGeminiModel("gemini-2.5-flash").generate_content("unknown prompt")
+            # SheetsHandler は接続エラーとして報告する
+            with pytest.raises(ConnectionError, match="No recorded spreadsheet"):
+                SheetsHandler()
+
+    def test_replay_simulates_recorded_latency(self, tmp_path):
+        store = FixtureStore("gemini", root=str(tmp_path))
+        request = {"model": "m", "prompt": "p", "generation_config": None}
+        store.save(request, {"text": "abc", "chunks": ["a", "b", "c"], "usage": {}, "ttft": 0.4}, 1.0)
+
+        with backend("replay", tmp_path, latency_scale=0.5), patch("src.backends.time.sleep") as sleep:
+            model = ReplayGeminiModel("m")
+            assert model.generate_content("p").text == "abc"
+            assert sleep.call_args.args[0] == pytest.approx(0.5)
+
+            sleep.reset_mock()
+            assert [chunk.text for chunk in model.generate_content("p", stream=True)] == ["a", "b", "c"]
+            assert [c.args[0] for c in sleep.call_args_list] == pytest.approx([0.2, 0.15, 0.15])
+
+    def test_deepl_fixtures_ignore_api_key(self, tmp_path):
+        with backend("record", tmp_path), patch.object(Config, "DEEPL_API_KEY", "key:fx"), \
+                patch("requests.Session.post", side_effect=fake_deepl_post):
+            assert DeepLTranslator().translate("Hello") == "訳:Hello"
+        with backend("replay", tmp_path), patch.object(Config, "DEEPL_API_KEY", None):
+            assert DeepLTranslator().translate("Hello") == "訳:Hello"
@@ -0,0 +1,66 @@
+import json
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+
+
+def script_json(title):
+    return json.dumps({
+        "title_en": title,
+        "vrew_script": [f"{title} line 1"],
+        "mj_prompts": [{"scene": 1, "prompt": f"{title} prompt"}],
+    })
+
+
+class TestBatchGeneration:
+    """generate_scripts_batch のテスト"""
+
+    @pytest.fixture
+    def ai(self):
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.DeepLTranslator'):
+            ai = AIGenerator(use_cache=False)
+            ai.model = MagicMock()
+            yield ai
+
+    def test_runs_concurrently(self, ai):
+        """同時実行数の範囲で並行に実行され、合計時間は1件分程度で済む"""
+        def slow(prompt, **kwargs):
+            time.sleep(0.2)
+            title = prompt.split("テーマ：「")[1].split("」")[0]
+            return MagicMock(text=script_json(title))
+        ai.model.generate_content.side_effect = slow
+
+        jobs = [{"title": f"title {i}"} for i in range(8)]
+        started = time.monotonic()
+        items = list(ai.generate_scripts_batch(jobs, max_workers=8, timeout=30))
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.2 * 8 / 2
+        assert sorted(item["index"] for item in items) == list(range(8))
+        for item in items:
+            assert item["error"] is None
+            assert item["result"]["title_en"] == item["job"]["title"]
+        assert ai.model.generate_content.call_args.kwargs["request_options"] == {"timeout": 30}
+
+    def test_errors_are_isolated(self, ai):
+        """1件の失敗（例外・解析エラー）は他の件に影響しない"""
+        def flaky(prompt, **kwargs):
+            if "boom" in prompt:
+                raise TimeoutError("deadline exceeded")
+            if "broken" in prompt:
+                return MagicMock(text="not json")
+            return MagicMock(text=script_json("ok"))
+        ai.model.generate_content.side_effect = flaky
+
+        jobs = [{"title": "boom"}, {"title": "fine"}, {"title": "broken"}]
+        items = {item["job"]["title"]: item for item in ai.generate_scripts_batch(jobs, max_workers=2)}
+
+        assert "deadline exceeded" in items["boom"]["error"]
+        assert "JSON解析エラー" in items["broken"]["error"]
+        assert items["fine"]["error"] is None
+        assert items["fine"]["result"]["vrew_script"] == "ok line 1"
@@ -0,0 +1,152 @@
+import json
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+from src import deepl_translator
+from src.config import Config
+from src.deepl_translator import DeepLTranslator, PartialTranslationError, TranslationError
+
+
+def deepl_response(texts, status_code=200, headers=None):
+    body = {"translations": [{"text": f"訳:{text}"} for text in texts]}
+    response = MagicMock(status_code=status_code, headers=headers or {}, text=json.dumps(body, ensure_ascii=False))
+    response.json.return_value = body
+    return response
+
+
+def fake_post(url, data=None, **kwargs):
+    texts = data["text"] if isinstance(data["text"], list) else [data["text"]]
+    return deepl_response(texts)
+
+
+class TestTranslateBatch:
+    """DeepLTranslator.translate_batch のテスト"""
+
+    @pytest.fixture
+    def post(self):
+        with patch.object(Config, "BACKEND_MODE", "live"), patch.object(Config, "DEEPL_API_KEY", "key:fx"), \
+                patch("requests.Session.post", side_effect=fake_post) as post, \
+                patch("src.deepl_translator.time.sleep") as sleep:
+            self.sleep = sleep
+            yield post
+
+    def test_single_request_keeps_order_and_empty_lines(self, post):
+        lines = ["First line", "", "Second line", "   ", "Third line"]
+        assert DeepLTranslator().translate_batch(lines) == ["訳:First line", "", "訳:Second line", "", "訳:Third line"]
+        assert post.call_count == 1
+        assert post.call_args.kwargs["data"]["text"] == ["First line", "Second line", "Third line"]
+
+    def test_chunks_by_text_count(self, post):
+        lines = [f"line {i}" for i in range(120)]
+        assert DeepLTranslator().translate_batch(lines) == [f"訳:line {i}" for i in range(120)]
+        assert [len(c.kwargs["data"]["text"]) for c in post.call_args_list] == [50, 50, 20]
+
+    def test_chunks_by_request_size(self, post):
+        with patch.object(deepl_translator, "MAX_REQUEST_BYTES", 2048):
+            lines = ["x" * 600, "y" * 600, "z" * 600]
+            assert DeepLTranslator().translate_batch(lines) == [f"訳:{line}" for line in lines]
+        assert [len(c.kwargs["data"]["text"]) for c in post.call_args_list] == [1, 1, 1]
+
+    @pytest.mark.parametrize("status", [400, 413])
+    def test_falls_back_per_line_when_batch_is_rejected(self, post, status):
+        """チャンクの内容を受け付けなかった場合だけ1行ずつ送り直す"""
+        def rejecting_batch(url, data=None, **kwargs):
+            if isinstance(data["text"], list):
+                return deepl_response([], status_code=status)
+            return fake_post(url, data=data)
+
+        post.side_effect = rejecting_batch
+        assert DeepLTranslator().translate_batch(["A", "", "B"]) == ["訳:A", "", "訳:B"]
+        assert post.call_count == 1 + 2
+        self.sleep.assert_not_called()
+
+    def test_outage_does_not_fall_back_per_line(self, post):
+        """503 で再試行を使い切ったら、1行ずつに切り替えずにすぐ報告する"""
+        post.side_effect = lambda url, data=None, **kwargs: deepl_response([], status_code=503)
+        lines = [f"line {i}" for i in range(60)]
+        with pytest.raises(PartialTranslationError) as excinfo:
+            DeepLTranslator().translate_batch(lines)
+        assert post.call_count == 1 + Config.DEEPL_MAX_RETRIES
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.failed == list(range(60))
+        assert excinfo.value.results == [""] * 60
+
+    def test_partial_failure_is_typed(self, post):
+        """1行ずつでも翻訳できなかった行は PartialTranslationError で報告する（訳を装った文字列は返さない）"""
+        def reject_b(url, data=None, **kwargs):
+            if isinstance(data["text"], list) or data["text"] == "B":
+                return deepl_response([], status_code=400)
+            return fake_post(url, data=data)
+
+        post.side_effect = reject_b
+        with pytest.raises(PartialTranslationError) as excinfo:
+            DeepLTranslator().translate_batch(["A", "B", "C"])
+        assert excinfo.value.results == ["訳:A", "", "訳:C"]
+        assert excinfo.value.failed == [1]
+
+    def test_outage_during_per_line_fallback_aborts(self, post):
+        """1行ずつの送り直し中に障害になったら、残りの行は送らない"""
+        def reject_batch_then_fail(url, data=None, **kwargs):
+            if isinstance(data["text"], list):
+                return deepl_response([], status_code=400)
+            if data["text"] == "A":
+                return fake_post(url, data=data)
+            raise requests.ConnectionError("down")
+
+        post.side_effect = reject_batch_then_fail
+        with pytest.raises(PartialTranslationError) as excinfo:
+            DeepLTranslator().translate_batch(["A", "B", "C"])
+        assert excinfo.value.results == ["訳:A", "", ""]
+        assert excinfo.value.failed == [1, 2]
+        # バッチ1回 + A + B（再試行込み）。C は送らない
+        assert post.call_count == 1 + 1 + (1 + Config.DEEPL_MAX_RETRIES)
+
+    def test_empty_input(self, post):
+        assert DeepLTranslator().translate_batch([]) == []
+        assert DeepLTranslator().translate_batch(["", ""]) == ["", ""]
+        post.assert_not_called()
+
+
+class TestRetryingSession:
+    """DeepL 呼び出しの接続の使い回し・タイムアウト・再試行のテスト"""
+
+    @pytest.fixture
+    def post(self):
+        with patch.object(Config, "BACKEND_MODE", "live"), patch.object(Config, "DEEPL_API_KEY", "key:fx"), \
+                patch.object(Config, "DEEPL_MAX_RETRIES", 2), \
+                patch("requests.Session.post", side_effect=fake_post) as post, \
+                patch("src.deepl_translator.time.sleep") as sleep:
+            self.sleep = sleep
+            yield post
+
+    def test_shared_session_and_timeouts(self, post):
+        assert DeepLTranslator().session() is DeepLTranslator().session()
+        DeepLTranslator(use_memory=False).translate("A")
+        assert post.call_args.kwargs["timeout"] == (Config.DEEPL_CONNECT_TIMEOUT, Config.DEEPL_READ_TIMEOUT)
+
+    @pytest.mark.parametrize("status", [429, 456, 503])
+    def test_retries_and_honors_retry_after(self, post, status):
+        post.side_effect = [deepl_response([], status_code=status, headers={"Retry-After": "7"}),
+                            deepl_response(["A"])]
+        assert DeepLTranslator(use_memory=False).translate("A") == "訳:A"
+        self.sleep.assert_called_once_with(7.0)
+
+    def test_retries_connection_errors_then_raises(self, post):
+        post.side_effect = requests.Timeout("read timed out")
+        with pytest.raises(TranslationError, match="Timeout") as excinfo:
+            DeepLTranslator(use_memory=False).translate("A")
+        assert excinfo.value.status_code is None
+        assert post.call_count == 3
+
+    def test_client_errors_are_not_retried(self, post):
+        post.side_effect = [deepl_response([], status_code=403)]
+        with pytest.raises(TranslationError) as excinfo:
+            DeepLTranslator(use_memory=False).translate("A")
+        assert excinfo.value.status_code == 403
+        self.sleep.assert_not_called()
+
+    def test_retry_after_http_date(self):
+        response = MagicMock(headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert deepl_translator.retry_after_seconds(response) == 0.0
+        assert deepl_translator.retry_after_seconds(MagicMock(headers={})) is None
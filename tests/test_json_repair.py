@@ -0,0 +1,62 @@
+import json
+import os
+import pytest
+
+from src.json_repair import IDEAS_SCHEMA, SCRIPT_SCHEMA, JSONRepairError, extract_json, repair_json
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "malformed_json")
+SCHEMAS = {"script": SCRIPT_SCHEMA, "ideas": IDEAS_SCHEMA}
+
+with open(os.path.join(CORPUS_DIR, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+
+def load_case(name):
+    with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class TestMalformedCorpus:
+    """壊れたモデル出力のコーパスがローカルで復元できることのテスト"""
+
+    @pytest.mark.parametrize("name", sorted(EXPECTED))
+    def test_corpus_case(self, name):
+        case = EXPECTED[name]
+        data, repairs = extract_json(load_case(name), SCHEMAS[case["schema"]])
+
+        for repair in case["repairs"]:
+            assert repair in repairs
+        if not case["repairs"]:
+            assert repairs == []
+        for field, expected in case["checks"].items():
+            if isinstance(expected, int):
+                assert len(data[field]) == expected, field
+            else:
+                assert data[field] == expected, field
+
+
+class TestRepairJSON:
+    """repair_json / extract_json の個別のテスト"""
+
+    def test_truncated_drops_partial_element(self):
+        repaired, repairs = repair_json('{"a": [1, 2, {"b": "c"}, {"b": "d')
+        assert json.loads(repaired) == {"a": [1, 2, {"b": "c"}]}
+        assert "truncated" in repairs
+
+    def test_truncated_primitive_is_dropped(self):
+        repaired, _ = repair_json('{"a": 1, "b": tru')
+        assert json.loads(repaired) == {"a": 1}
+
+    def test_stops_at_root_end(self):
+        repaired, _ = repair_json('{"a": "}"} trailing {"b": 1}')
+        assert json.loads(repaired) == {"a": "}"}
+
+    def test_missing_fields_are_filled(self):
+        data, repairs = extract_json('{"title_en": "T"}', SCRIPT_SCHEMA)
+        assert data["vrew_script"] == []
+        assert "missing:vrew_script" in repairs
+
+    def test_unrecoverable_raises(self):
+        with pytest.raises(JSONRepairError):
+            extract_json("I'm sorry, I can't help with that.", SCRIPT_SCHEMA)
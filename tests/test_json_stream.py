@@ -0,0 +1,174 @@
+import json
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.config import Config
+from src.json_stream import IncrementalJSONParser
+
+
+SCRIPT_DATA = {
+    "editorial_notes": "改善点",
+    "title_en": "The Kisaragi Station #Shorts",
+    "title_jp": "きさらぎ駅",
+    "description": "A train that never stops \"here\".",
+    "hashtags": ["#Shorts", "#JHorror"],
+    "vrew_script": ["The train never stopped", "Nobody else was aboard"],
+    "mj_prompts": [
+        {"scene": 1, "prompt": "empty train at night, 35mm"},
+        {"scene": 2, "prompt": "abandoned platform {fog}, [grainy]"},
+    ],
+    "score": 9.5,
+    "final": True,
+}
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+class TestIncrementalJSONParser:
+    """IncrementalJSONParser のテスト"""
+
+    @pytest.mark.parametrize("size", [1, 3, 17, 10000])
+    def test_events_do_not_depend_on_chunking(self, size):
+        """チャンクの切れ目に関係なく同じ値が同じ順で得られる"""
+        text = json.dumps(SCRIPT_DATA, ensure_ascii=False, indent=2)
+        parser = IncrementalJSONParser()
+        events = feed_in_chunks(parser, text, size)
+
+        assert (("title_en",), "The Kisaragi Station #Shorts") in events
+        assert (("description",), 'A train that never stops "here".') in events
+        assert [v for p, v in events if p[0] == "vrew_script" and len(p) == 2] == SCRIPT_DATA["vrew_script"]
+        assert [v for p, v in events if p[0] == "mj_prompts" and len(p) == 2] == SCRIPT_DATA["mj_prompts"]
+        assert (("score",), 9.5) in events
+        assert (("final",), True) in events
+        assert parser.done
+        assert parser.result == SCRIPT_DATA
+
+    def test_items_are_emitted_before_document_ends(self):
+        """配列の要素は、ドキュメントが閉じる前に完成した時点で得られる"""
+        parser = IncrementalJSONParser()
+        events = parser.feed('{"title_en": "T", "vrew_script": ["line 1", "line 2", "li')
+
+        assert events == [(("title_en",), "T"), (("vrew_script", 0), "line 1"), (("vrew_script", 1), "line 2")]
+        assert not parser.done
+
+    @pytest.mark.parametrize("size", [1, 7, 10000])
+    def test_malformed_json_stops_without_raising(self, size):
+        """末尾カンマなど解釈できないJSONでは例外を出さずに解析をやめ、result は None のまま"""
+        text = '{"title_en": "T", "vrew_script": ["a", "b",], "title_jp": "J"}'
+        parser = IncrementalJSONParser()
+        events = feed_in_chunks(parser, text, size)
+
+        assert events[:3] == [(("title_en",), "T"), (("vrew_script", 0), "a"), (("vrew_script", 1), "b")]
+        assert parser.failed
+        assert parser.result is None
+        assert parser.feed(', "more": 1}') == []
+
+    def test_skips_markdown_fence(self):
+        """ルートより前の ```json などは読み飛ばす"""
+        parser = IncrementalJSONParser()
+        parser.feed('```json\n{"title_en": "T"}\n```')
+        assert parser.result == {"title_en": "T"}
+
+
+class TestStreamingGeneration:
+    """generate_script_and_prompts_stream のテスト"""
+
+    @pytest.fixture
+    def ai(self):
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.DeepLTranslator') as translator_cls:
+            translator_cls.return_value.translate.side_effect = lambda text: f"JP:{text}"
+            translator_cls.return_value.translate_batch.side_effect = \
+                lambda lines, target_lang="JA": [f"JP:{line}" for line in lines]
+            ai = AIGenerator(use_cache=False)
+            text = json.dumps(SCRIPT_DATA, ensure_ascii=False)
+            chunks = [MagicMock(text=text[i:i + 20]) for i in range(0, len(text), 20)]
+            ai.model = MagicMock()
+            ai.model.generate_content.return_value = iter(chunks)
+            self.translator = translator_cls.return_value
+            yield ai
+
+    def test_stream_yields_scenes_then_result(self, ai):
+        """台本・翻訳・プロンプトを逐次返し、最後に通常版と同じ形式の結果を返す"""
+        with patch.object(Config, "AI_TRANSLATION_PIPELINE", False):
+            events = list(ai.generate_script_and_prompts_stream("きさらぎ駅"))
+        kinds = [(kind, idx) for kind, idx, _ in events]
+
+        assert ("title_en", None) in kinds
+        assert kinds.index(("vrew_script", 0)) < kinds.index(("script_jp", 0)) < kinds.index(("vrew_script", 1))
+        assert ("mj_prompts", 1) in kinds
+        assert kinds[-1] == ("result", None)
+        assert ai.model.generate_content.call_args.kwargs["stream"] is True
+
+        result = events[-1][2]
+        assert result["vrew_script"] == "The train never stopped\nNobody else was aboard"
+        assert result["script_jp_list"] == ["JP:The train never stopped", "JP:Nobody else was aboard"]
+        assert result["mj_prompts_list"][0] == "empty train at night, 35mm --ar 9:16 --v 6.0"
+        # 翻訳はストリーミング中の1回ずつだけ
+        assert self.translator.translate.call_count == 2
+
+    def test_stream_translates_in_background(self, ai):
+        """パイプラインでは翻訳を別スレッドで行い、各行の訳を1回ずつ返す"""
+        with patch.object(Config, "AI_TRANSLATION_PIPELINE", True):
+            events = list(ai.generate_script_and_prompts_stream("きさらぎ駅"))
+        kinds = [(kind, idx) for kind, idx, _ in events]
+
+        assert kinds.index(("vrew_script", 0)) < kinds.index(("script_jp", 0)) < kinds.index(("result", None))
+        assert sorted(idx for kind, idx in kinds if kind == "script_jp") == [0, 1]
+        assert events[-1][2]["script_jp_list"] == ["JP:The train never stopped", "JP:Nobody else was aboard"]
+        sent = [line for c in self.translator.translate_batch.call_args_list for line in c.args[0]]
+        assert sent == ["The train never stopped", "Nobody else was aboard"]
+        self.translator.translate.assert_not_called()
+
+    def test_translate_false_skips_translation(self, ai):
+        """translate=False では翻訳せず、script_jp_list は行数分の空欄になる（画面側で表示するシーンだけ翻訳する）"""
+        events = list(ai.generate_script_and_prompts_stream("きさらぎ駅", translate=False))
+
+        assert all(kind != "script_jp" for kind, _, _ in events)
+        assert events[-1][2]["script_jp_list"] == ["", ""]
+        self.translator.translate.assert_not_called()
+        self.translator.translate_batch.assert_not_called()
+
+    def test_stream_repairs_truncated_output(self, ai):
+        """途中で途切れたレスポンスは、完成している部分までを結果にする"""
+        ai.model.generate_content.return_value = iter([MagicMock(text='{"title_en": "T", "vrew_script": ["a", "b')])
+        events = list(ai.generate_script_and_prompts_stream("きさらぎ駅"))
+
+        assert events[-1][0] == "result"
+        assert events[-1][2]["title_en"] == "T"
+        assert events[-1][2]["vrew_script"] == "a"
+
+    @pytest.mark.parametrize("text", [
+        # ```json の囲みと前置き・末尾カンマ
+        "Here is the script:\n```json\n" + json.dumps(SCRIPT_DATA, ensure_ascii=False).replace(
+            '"Nobody else was aboard"]', '"Nobody else was aboard",]') + "\n```",
+        # 途中で途切れた
+        json.dumps(SCRIPT_DATA, ensure_ascii=False).split('"mj_prompts"')[0] + '"mj_prompts": [{"scene": 1, "prompt": "empty',
+    ])
+    def test_stream_repairs_malformed_output(self, ai, text):
+        """壊れたJSONをチャンクごとに受け取っても、非ストリーミング版と同じ修復で結果を返す"""
+        ai.model.generate_content.return_value = iter([MagicMock(text=text[i:i + 7]) for i in range(0, len(text), 7)])
+        with patch.object(Config, "AI_TRANSLATION_PIPELINE", False):
+            events = list(ai.generate_script_and_prompts_stream("きさらぎ駅"))
+
+        result = events[-1][2]
+        assert events[-1][0] == "result"
+        assert "JSON解析エラー" not in result["editorial_notes"]
+        assert result["vrew_script"] == "The train never stopped\nNobody else was aboard"
+        assert result["title_en"] == "The Kisaragi Station #Shorts"
+
+    def test_stream_reports_parse_error(self, ai):
+        """JSONが全く無いレスポンスは解析エラーの結果になる"""
+        ai.model.generate_content.return_value = iter([MagicMock(text='I cannot help with that.')])
+        events = list(ai.generate_script_and_prompts_stream("きさらぎ駅"))
+
+        assert events[-1][0] == "result"
+        assert "JSON解析エラー" in events[-1][2]["editorial_notes"]
@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+from google.api_core import exceptions as google_exceptions
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.llm_metrics import LLMMetrics, estimate_cost
+
+
+IDEAS_JSON = json.dumps({
+    "discussion": "議論",
+    "ideas": [{"title": "猿夢 (Monkey Dream)", "overview": "概要", "horror_point": "恐怖"}],
+}, ensure_ascii=False)
+
+
+def make_response(text, prompt_tokens=1200, response_tokens=300):
+    return MagicMock(text=text, usage_metadata=MagicMock(prompt_token_count=prompt_tokens,
+                                                           candidates_token_count=response_tokens))
+
+
+class TestLLMMetrics:
+    """LLMMetrics の集計のテスト"""
+
+    def test_summary(self, tmp_path):
+        metrics = LLMMetrics(path=os.path.join(tmp_path, "metrics.jsonl"))
+        metrics.record({"model": "gemini-2.5-flash", "wall_time": 2.0, "prompt_tokens": 100, "response_tokens": 50,
+                        "cost_usd": 0.001, "retries": 1})
+        metrics.record({"model": "gemini-2.5-flash", "wall_time": 4.0, "prompt_tokens": 100, "response_tokens": 50,
+                        "cost_usd": 0.001, "error": "boom"})
+        metrics.record({"model": "gemini-2.5-pro", "wall_time": 0.0, "cache_hit": True})
+
+        summary = metrics.summary()
+        assert summary["total"]["calls"] == 3
+        assert summary["total"]["cache_hits"] == 1
+        assert summary["total"]["errors"] == 1
+        assert summary["total"]["retries"] == 1
+        assert summary["by_model"]["gemini-2.5-flash"]["avg_wall_time"] == pytest.approx(3.0)
+        assert summary["by_model"]["gemini-2.5-flash"]["prompt_tokens"] == 200
+        # キャッシュヒットは所要時間の平均に含めない
+        assert summary["by_model"]["gemini-2.5-pro"]["avg_wall_time"] is None
+
+    def test_estimate_cost(self):
+        assert estimate_cost("gemini-2.5-flash", 1_000_000, 0) == pytest.approx(0.30)
+        assert estimate_cost("unknown-model", 100, 100) is None
+
+
+class TestGeneratorInstrumentation:
+    """AIGenerator の呼び出しごとの記録のテスト"""
+
+    @pytest.fixture
+    def ai(self, tmp_path):
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.DeepLTranslator'), \
+                patch('src.ai_generator.time.sleep') as sleep:
+            self.sleep = sleep
+            metrics = LLMMetrics(path=os.path.join(tmp_path, "metrics.jsonl"))
+            ai = AIGenerator(model_name="gemini-2.5-flash", use_cache=False, metrics=metrics)
+            ai.model = MagicMock()
+            yield ai
+
+    def test_records_tokens_time_and_parse_outcome(self, ai):
+        ai.model.generate_content.return_value = make_response(IDEAS_JSON)
+        ai.generate_new_ideas([])
+
+        [entry] = ai.metrics.records()
+        assert entry["operation"] == "ideas"
+        assert entry["model"] == "gemini-2.5-flash"
+        assert (entry["prompt_tokens"], entry["response_tokens"]) == (1200, 300)
+        assert entry["wall_time"] >= 0
+        assert entry["parse"] == "ok"
+        assert entry["cost_usd"] == pytest.approx(estimate_cost("gemini-2.5-flash", 1200, 300))
+
+    def test_retries_transient_errors(self, ai):
+        """一時的なエラーは再試行し、回数を記録する"""
+        ai.model.generate_content.side_effect = [
+            google_exceptions.ServiceUnavailable("overloaded"),
+            google_exceptions.ResourceExhausted("quota"),
+            make_response(IDEAS_JSON),
+        ]
+        ideas, _ = ai.generate_new_ideas([])
+
+        assert "猿夢 (Monkey Dream)" in ideas
+        assert self.sleep.call_count == 2
+        assert ai.metrics.records()[0]["retries"] == 2
+
+    def test_non_transient_errors_are_recorded_and_raised(self, ai):
+        ai.model.generate_content.side_effect = google_exceptions.InvalidArgument("bad request")
+        with pytest.raises(google_exceptions.InvalidArgument):
+            ai.generate_new_ideas([])
+
+        [entry] = ai.metrics.records()
+        assert entry["parse"] == "error"
+        assert "InvalidArgument" in entry["error"]
+        assert entry["retries"] == 0
+
+    def test_repaired_output_is_recorded(self, ai):
+        ai.model.generate_content.return_value = make_response("```json\n" + IDEAS_JSON + "\n```")
+        ai.generate_new_ideas([])
+        entry = ai.metrics.records()[0]
+        assert entry["parse"] == "repaired"
+        assert "extracted" in entry["repairs"]
+
+    def test_streaming_records_time_to_first_token(self, ai):
+        text = json.dumps({"title_en": "T", "vrew_script": ["a"], "mj_prompts": [{"scene": 1, "prompt": "p"}]})
+        response = MagicMock()
+        response.__iter__.return_value = iter([MagicMock(text=text[:10]), MagicMock(text=text[10:])])
+        response.usage_metadata = MagicMock(prompt_token_count=10, candidates_token_count=5)
+        ai.model.generate_content.return_value = response
+
+        list(ai.generate_script_and_prompts_stream("T"))
+
+        [entry] = ai.metrics.records()
+        assert entry["operation"] == "script_stream"
+        assert entry["ttft"] is not None and entry["ttft"] <= entry["wall_time"]
+        assert entry["response_tokens"] == 5
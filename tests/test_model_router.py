@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from google.api_core import exceptions as google_exceptions
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.llm_metrics import LLMMetrics
+from src.model_router import ModelRouter
+
+
+IDEAS_JSON = json.dumps({
+    "discussion": "議論",
+    "ideas": [{"title": "猿夢 (Monkey Dream)", "overview": "概要", "horror_point": "恐怖"}],
+}, ensure_ascii=False)
+
+
+def make_response(text=IDEAS_JSON):
+    return MagicMock(text=text, usage_metadata=MagicMock(prompt_token_count=100, candidates_token_count=50))
+
+
+@pytest.fixture(autouse=True)
+def reset_health():
+    ModelRouter.reset_health()
+    yield
+    ModelRouter.reset_health()
+
+
+class TestModelRouter:
+    """ModelRouter の振り分けのテスト"""
+
+    def test_failover_to_next_model(self):
+        router = ModelRouter(task_models={"ideas": "primary"}, fallback_models=["backup"])
+        calls = []
+
+        def fn(model, is_last):
+            calls.append((model, is_last))
+            if model == "primary":
+                raise google_exceptions.ServiceUnavailable("down")
+            return "ok"
+
+        result, model, decision = router.run("ideas", "primary", fn)
+        assert (result, model) == ("ok", "backup")
+        assert calls == [("primary", False), ("backup", True)]
+        assert decision["failovers"][0]["model"] == "primary"
+        assert router.health("primary", "ideas").snapshot()["error_rate"] == 1.0
+
+    def test_all_models_fail_raises_last_error(self):
+        router = ModelRouter(task_models={"ideas": "primary"}, fallback_models=["backup"])
+
+        def fn(model, is_last):
+            raise ValueError(model)
+
+        with pytest.raises(ValueError, match="backup"):
+            router.run("ideas", "primary", fn)
+
+    def test_hedges_when_budget_exceeded(self):
+        router = ModelRouter(task_models={"script": "slow"}, fallback_models=["fast"], budgets={"script": 0.05})
+        release = threading.Event()
+
+        def fn(model, is_last):
+            if model == "slow":
+                release.wait(2)
+                return "slow result"
+            return "fast result"
+
+        try:
+            result, model, decision = router.run("script", "slow", fn)
+        finally:
+            release.set()
+        assert (result, model) == ("fast result", "fast")
+        assert decision["hedged"] is True
+        assert decision["failovers"] == []
+
+    def test_demotes_model_with_high_error_rate(self):
+        router = ModelRouter(task_models={"ideas": "primary"}, fallback_models=["backup"], min_samples=3)
+        for _ in range(3):
+            router.record("primary", "ideas", 1.0, False)
+        models, demoted = router.candidates("ideas", "primary")
+        assert models == ["backup", "primary"]
+        assert "error rate" in demoted["primary"]
+        # 振り分けの実績はインスタンス間で共有される
+        assert ModelRouter(task_models={"ideas": "primary"}, fallback_models=["backup"],
+                           min_samples=3).candidates("ideas", "primary")[0][0] == "backup"
+
+    def test_demotes_model_over_latency_budget(self):
+        router = ModelRouter(task_models={"script": "primary"}, fallback_models=["backup"],
+                             budgets={"script": 10}, min_samples=2)
+        router.record("primary", "script", 30.0, True)
+        router.record("primary", "script", 40.0, True)
+        models, demoted = router.candidates("script", "primary")
+        assert models == ["backup", "primary"]
+        assert demoted["primary"].startswith("p95")
+
+
+class TestGeneratorRouting:
+    """AIGenerator 経由での振り分けと計測値への記録のテスト"""
+
+    @pytest.fixture
+    def generator(self, tmp_path):
+        with patch('src.ai_generator.genai') as genai, patch('src.ai_generator.DeepLTranslator'), \
+                patch('src.ai_generator.time.sleep'):
+            models = {}
+            genai.GenerativeModel.side_effect = lambda name: models.setdefault(name, MagicMock())
+            metrics = LLMMetrics(path=os.path.join(tmp_path, "metrics.jsonl"))
+            router = ModelRouter(task_models={"ideas": "gemini-2.5-pro"}, fallback_models=["gemini-2.5-flash"])
+            ai = AIGenerator(model_name="gemini-3-flash-preview", use_cache=False, metrics=metrics, router=router)
+            yield ai, models, metrics
+
+    def test_routes_ideas_to_task_model(self, generator):
+        ai, models, metrics = generator
+        models.setdefault("gemini-2.5-pro", MagicMock()).generate_content.return_value = make_response()
+
+        ideas, _ = ai.generate_new_ideas([])
+        assert "猿夢 (Monkey Dream)" in ideas
+        entry = metrics.records()[-1]
+        assert entry["model"] == "gemini-2.5-pro"
+        assert entry["route"]["candidates"] == ["gemini-2.5-pro", "gemini-2.5-flash"]
+
+    def test_failover_is_recorded_in_metrics(self, generator):
+        ai, models, metrics = generator
+        models.setdefault("gemini-2.5-pro", MagicMock()).generate_content.side_effect = \
+            google_exceptions.ResourceExhausted("quota")
+        models.setdefault("gemini-2.5-flash", MagicMock()).generate_content.return_value = make_response()
+
+        ideas, _ = ai.generate_new_ideas([])
+        assert "猿夢 (Monkey Dream)" in ideas
+        # 代替モデルが残っている間はリトライせずに切り替える
+        assert models["gemini-2.5-pro"].generate_content.call_count == 1
+        entry = metrics.records()[-1]
+        assert entry["model"] == "gemini-2.5-flash"
+        assert entry["route"]["failovers"][0]["model"] == "gemini-2.5-pro"
+        assert metrics.summary()["total"]["failovers"] == 1
@@ -0,0 +1,112 @@
+import pytest
+from unittest.mock import MagicMock
+from gspread.exceptions import APIError
+
+from src.rate_limiter import DEFAULT_BURST, SheetsRateLimiter, TokenBucket
+
+
+def make_api_error(status):
+    response = MagicMock()
+    response.status_code = status
+    response.json.return_value = {"error": {"code": status, "message": "error", "status": "ERROR"}}
+    return APIError(response)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """トークンバケットのテスト"""
+
+    def test_burst_then_throttle(self):
+        """容量分は即時、それ以降は (上限 - 容量) / 分 の補充に合わせて待つ"""
+        clock = FakeClock()
+        bucket = TokenBucket(60, capacity=2, clock=clock)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(60 / 58)
+
+        clock.now += 10
+        assert bucket.reserve() == 0
+
+    @pytest.mark.parametrize("quota", [10, 60, 300])
+    def test_never_exceeds_quota_in_any_minute(self, quota):
+        """連続で呼び出しても、どの60秒間の呼び出し数も上限以下"""
+        clock = FakeClock()
+        bucket = TokenBucket(quota, clock=clock)
+        calls = []
+        while clock.now < 180:
+            clock.sleep(bucket.reserve())
+            calls.append(clock.now)
+
+        for start in calls:
+            assert sum(1 for t in calls if start <= t < start + 60) <= quota
+        assert sum(1 for t in calls if t < 60) >= quota - DEFAULT_BURST - 1
+
+
+class TestSheetsRateLimiter:
+    """SheetsRateLimiter のテスト"""
+
+    @pytest.fixture
+    def limiter(self):
+        self.sleeps = []
+        return SheetsRateLimiter(reads_per_minute=60, writes_per_minute=60, max_retries=3,
+                                 sleep=self.sleeps.append)
+
+    def test_retries_on_quota_error(self, limiter):
+        """429 はバックオフして再試行する"""
+        func = MagicMock(side_effect=[make_api_error(429), make_api_error(503), "ok"])
+
+        assert limiter.call("write", func, "A1") == "ok"
+        assert func.call_count == 3
+        stats = limiter.stats()
+        assert stats["retries"] == 2
+        assert stats["calls"] == 3
+        assert stats["write_calls"] == 3
+        assert len(self.sleeps) == 2
+
+    def test_does_not_retry_client_errors(self, limiter):
+        """400 などは再試行せずにそのまま送出する"""
+        func = MagicMock(side_effect=make_api_error(400))
+
+        with pytest.raises(APIError):
+            limiter.call("read", func)
+        assert func.call_count == 1
+        assert limiter.stats()["failures"] == 1
+
+    def test_gives_up_after_max_retries(self, limiter):
+        """最大リトライ回数を超えたら送出する"""
+        func = MagicMock(side_effect=make_api_error(429))
+
+        with pytest.raises(APIError):
+            limiter.call("read", func)
+        assert func.call_count == 4
+        assert limiter.stats()["retries"] == 3
+
+    def test_backoff_is_bounded(self, limiter):
+        """待機時間は指数的に伸び、上限を超えない"""
+        for attempt in range(10):
+            assert 0 <= limiter.backoff_delay(attempt) <= min(limiter.max_delay, 2 ** attempt)
+
+    def test_proxy_limits_only_api_methods(self, limiter):
+        """プロキシは gspread のAPIメソッドだけを制限対象にする"""
+        worksheet = MagicMock()
+        worksheet.title = "データ"
+        proxy = limiter.wrap(worksheet)
+
+        proxy.batch_get(["A1:A"])
+        proxy.append_rows([["title"]])
+
+        assert proxy.title == "データ"
+        stats = limiter.stats()
+        assert stats["read_calls"] == 1
+        assert stats["write_calls"] == 1
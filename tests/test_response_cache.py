@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.response_cache import ResponseCache
+
+
+IDEAS_JSON = json.dumps({
+    "discussion": "議論",
+    "ideas": [{"title": "八尺様 (Hachishakusama)", "overview": "概要", "horror_point": "恐怖"}],
+}, ensure_ascii=False)
+
+
+class TestResponseCache:
+    """ResponseCache のテスト"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ResponseCache(db_path=os.path.join(tmp_path, "cache.db"), max_entries=3, max_bytes=1024)
+
+    def test_key_depends_on_prompt_model_and_config(self):
+        """プロンプト・モデル・生成設定のどれかが違えば別のキーになる"""
+        base = ResponseCache.make_key("prompt", "gemini-2.5-flash", {"a": 1})
+        assert base == ResponseCache.make_key("prompt", "gemini-2.5-flash", {"a": 1})
+        assert base != ResponseCache.make_key("prompt2", "gemini-2.5-flash", {"a": 1})
+        assert base != ResponseCache.make_key("prompt", "gemini-2.5-pro", {"a": 1})
+        assert base != ResponseCache.make_key("prompt", "gemini-2.5-flash", {"a": 2})
+
+    def test_hit_and_miss_stats(self, cache):
+        """ヒット・ミスが記録される"""
+        assert cache.get("k1") is None
+        cache.set("k1", "value")
+        assert cache.get("k1") == "value"
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["hit_rate"] == pytest.approx(0.5)
+
+    def test_lru_eviction_by_count(self, cache):
+        """件数上限を超えると最後に使われた時刻が古いものから削除される"""
+        for key in ["k1", "k2", "k3"]:
+            cache.set(key, key)
+        cache.get("k1")
+        cache.set("k4", "k4")
+
+        assert cache.get("k2") is None
+        assert cache.get("k1") == "k1"
+        assert cache.stats()["entries"] == 3
+
+    def test_eviction_by_size(self, cache):
+        """合計サイズの上限を超えると古いものから削除される"""
+        cache.set("big1", "x" * 600)
+        cache.set("big2", "y" * 600)
+
+        assert cache.get("big1") is None
+        assert cache.get("big2") == "y" * 600
+
+    def test_clear(self, cache):
+        cache.set("k1", "value")
+        cache.clear()
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["hits"] == 0
+
+
+class TestAIGeneratorCache:
+    """AIGenerator からのキャッシュ利用のテスト"""
+
+    @pytest.fixture
+    def ai(self, tmp_path):
+        with patch('src.ai_generator.genai'):
+            cache = ResponseCache(db_path=os.path.join(tmp_path, "cache.db"))
+            ai = AIGenerator(model_name="gemini-2.5-flash", cache=cache)
+            ai.model = MagicMock()
+            ai.model.generate_content.return_value = MagicMock(text=IDEAS_JSON)
+            yield ai
+
+    def test_repeat_request_uses_cache(self, ai):
+        """同じ条件の2回目はGeminiを呼ばない"""
+        first, _ = ai.generate_new_ideas(["口裂け女"])
+        second, _ = ai.generate_new_ideas(["口裂け女"])
+
+        assert first == second
+        assert ai.model.generate_content.call_count == 1
+        assert ai.cache_stats()["hits"] == 1
+
+    def test_force_regenerate_bypasses_cache(self, ai):
+        """force_regenerate=True ならキャッシュを使わず、結果を上書きする"""
+        ai.generate_new_ideas(["口裂け女"])
+        ai.generate_new_ideas(["口裂け女"], force_regenerate=True)
+
+        assert ai.model.generate_content.call_count == 2
+
+    def test_parse_errors_are_not_cached(self, ai):
+        """解析に失敗したレスポンスはキャッシュしない"""
+        ai.model.generate_content.return_value = MagicMock(text="not json")
+        ideas, message = ai.generate_new_ideas(["口裂け女"])
+        assert ideas == {}
+        assert "JSON解析エラー" in message
+
+        ai.model.generate_content.return_value = MagicMock(text=IDEAS_JSON)
+        ideas, _ = ai.generate_new_ideas(["口裂け女"])
+        assert "八尺様 (Hachishakusama)" in ideas
+        assert ai.model.generate_content.call_count == 2
+
+    def test_cache_disabled_by_default(self):
+        """Config.AI_CACHE_ENABLED が無効ならキャッシュを作らない"""
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.Config.AI_CACHE_ENABLED', False):
+            assert AIGenerator().cache is None
+
+    def test_truncated_responses_are_not_cached(self, ai):
+        """途切れを修復して使ったレスポンスはキャッシュしない"""
+        ai.model.generate_content.return_value = MagicMock(text=IDEAS_JSON[:-30])
+        ai.generate_new_ideas(["口裂け女"])
+        ai.generate_new_ideas(["口裂け女"])
+
+        assert ai.model.generate_content.call_count == 2
+        assert ai.cache_stats()["entries"] == 0
@@ -0,0 +1,110 @@
+import json
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.scene_aligner import align_scenes
+
+
+SCRIPT = [
+    "The station has no name on its sign",
+    "A silent train arrives at midnight",
+    "An old woman waits on the bench",
+    "Her umbrella drips black water",
+    "The tunnel lights flicker and die",
+]
+STYLE = ", cinematic lighting, photorealistic, 8k, grainy film --ar 9:16 --v 6.0"
+PROMPTS = [
+    "Rural station platform, blank sign" + STYLE,
+    "Silent train arriving at midnight" + STYLE,
+    "Old woman sitting on a wooden bench" + STYLE,
+    "Close-up of umbrella dripping black water" + STYLE,
+    "Tunnel with flickering lights going dark" + STYLE,
+]
+
+
+class TestAlignScenes:
+    """align_scenes（台本とプロンプトの対応付け）のテスト"""
+
+    def test_perfect_match(self):
+        result = align_scenes(SCRIPT, PROMPTS)
+        assert result["prompts"] == [0, 1, 2, 3, 4]
+        assert (result["inserted"], result["missing"], result["merged"]) == ([], [], [])
+        assert result["confidence"] > 0.8
+
+    def test_detects_inserted_prompt_in_the_middle(self):
+        prompts = PROMPTS[:2] + ["Abandoned vending machine glowing" + STYLE] + PROMPTS[2:]
+        result = align_scenes(SCRIPT, prompts)
+        assert result["prompts"] == [0, 1, 3, 4, 5]
+        assert result["inserted"] == [2]
+
+    def test_detects_missing_prompt(self):
+        prompts = PROMPTS[:2] + PROMPTS[3:]
+        result = align_scenes(SCRIPT, prompts)
+        assert result["prompts"] == [0, 1, None, 2, 3]
+        assert result["missing"] == [3]
+        assert result["confidence"] < align_scenes(SCRIPT, PROMPTS)["confidence"]
+
+    def test_detects_merged_scenes(self):
+        merged = "Old woman on a bench holding an umbrella dripping black water" + STYLE
+        prompts = PROMPTS[:2] + [merged, PROMPTS[4]]
+        result = align_scenes(SCRIPT, prompts)
+        assert result["prompts"] == [0, 1, 2, None, 3]
+        assert result["merged"] == [4]
+
+    def test_long_form_is_fast(self):
+        script = [f"Villager number {i} hears a knock at the {i} door" for i in range(120)]
+        prompts = [f"Villager {i} standing at door {i}" + STYLE for i in range(120) if i % 10]
+        started = time.perf_counter()
+        result = align_scenes(script, prompts)
+        assert time.perf_counter() - started < 2.0
+        assert result["missing"] == list(range(1, 121, 10))
+
+
+class TestGapFilling:
+    """欠けたシーンのプロンプトだけを追加生成するテスト"""
+
+    @pytest.fixture
+    def ai(self):
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.DeepLTranslator'):
+            ai = AIGenerator(use_cache=False)
+            ai.model = MagicMock()
+            yield ai
+
+    def test_missing_prompt_is_requested_alone(self, ai):
+        script_json = json.dumps({
+            "title_en": "Kisaragi",
+            "vrew_script": SCRIPT,
+            "mj_prompts": [{"scene": i, "prompt": p} for i, p in enumerate(PROMPTS[:2] + PROMPTS[3:], 1)],
+        })
+        ai.model.generate_content.side_effect = [
+            MagicMock(text=script_json),
+            MagicMock(text=json.dumps({"scenes": [{"scene": 3, "prompt": "Old woman waiting on a bench"}]})),
+        ]
+        res = ai.generate_script_and_prompts("Kisaragi")
+
+        assert len(res["mj_prompts_list"]) == 5
+        assert res["mj_prompts_list"][2] == "Old woman waiting on a bench --ar 9:16 --v 6.0"
+        assert res["mj_prompts_list"][3] == PROMPTS[3]
+        assert res["sync_report"]["missing"] == [3]
+        assert res["sync_report"]["filled"] == [3]
+        # 2回目のリクエストは欠けたシーンだけ
+        second_prompt = ai.model.generate_content.call_args_list[1].args[0]
+        assert '{"scene": 3,' in second_prompt and '{"scene": 4,' not in second_prompt
+
+    def test_gap_keeps_placeholder_when_fill_is_disabled(self, ai):
+        script_json = json.dumps({
+            "vrew_script": SCRIPT,
+            "mj_prompts": [{"scene": i, "prompt": p} for i, p in enumerate(PROMPTS[:4], 1)],
+        })
+        ai.model.generate_content.return_value = MagicMock(text=script_json)
+        with patch('src.ai_generator.Config.AI_FILL_MISSING_PROMPTS', False):
+            res = ai.generate_script_and_prompts("Kisaragi")
+
+        assert ai.model.generate_content.call_count == 1
+        assert res["mj_prompts_list"][4] == PROMPTS[3]
+        assert res["sync_report"]["missing"] == [5]
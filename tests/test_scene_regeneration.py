@@ -0,0 +1,97 @@
+import json
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+
+
+SCRIPT = [
+    "The station has no name",
+    "A train arrives without a sound",
+    "Nobody gets off",
+    "The doors close behind you",
+    "Your phone shows no signal",
+]
+PROMPTS = [
+    f"Scene {i}, empty rural station at night, cinematic lighting, photorealistic, 8k --ar 9:16 --v 6.0"
+    for i in range(1, 6)
+]
+
+
+def response(scenes):
+    return MagicMock(text=json.dumps({"scenes": scenes}))
+
+
+class TestRegenerateScenes:
+    """regenerate_scenes（シーン単位の再生成）のテスト"""
+
+    @pytest.fixture
+    def ai(self):
+        with patch('src.ai_generator.genai'), patch('src.ai_generator.DeepLTranslator') as translator:
+            translator.return_value.translate.side_effect = lambda text: f"訳:{text}"
+            ai = AIGenerator(use_cache=False)
+            ai.model = MagicMock()
+            self.translator = translator.return_value
+            yield ai
+
+    def test_replaces_only_requested_scenes(self, ai):
+        ai.model.generate_content.return_value = response([
+            {"scene": 3, "script": "Someone is already sitting there", "prompt": "shadowy figure on a bench"},
+        ])
+        jp = [f"訳{i}" for i in range(1, 6)]
+        result = ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [3], script_jp_list=jp)
+
+        assert result["error"] is None
+        assert result["changed_scenes"] == [3]
+        assert result["script_lines"][2] == "Someone is already sitting there"
+        assert result["script_lines"][:2] == SCRIPT[:2] and result["script_lines"][3:] == SCRIPT[3:]
+        # パラメータは既存プロンプトに合わせて付与する
+        assert result["mj_prompts_list"][2] == "shadowy figure on a bench --ar 9:16 --v 6.0"
+        assert len(result["mj_prompts_list"]) == len(result["script_lines"]) == 5
+        # 翻訳は変更された行だけ
+        assert result["script_jp_list"] == ["訳1", "訳2", "訳:Someone is already sitting there", "訳4", "訳5"]
+        self.translator.translate.assert_called_once_with("Someone is already sitting there")
+
+    def test_prompt_contains_only_neighbours_and_style_anchors(self, ai):
+        ai.model.generate_content.return_value = response([])
+        ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [1], context_window=1, instruction="もっと静かに")
+
+        prompt = ai.model.generate_content.call_args.args[0]
+        assert SCRIPT[0] in prompt and SCRIPT[1] in prompt
+        assert SCRIPT[2] not in prompt and SCRIPT[4] not in prompt
+        assert "cinematic lighting" in prompt
+        assert "もっと静かに" in prompt
+
+    def test_target_prompt_keeps_script(self, ai):
+        ai.model.generate_content.return_value = response([
+            {"scene": 2, "script": "Changed line", "prompt": "ghost train in fog --ar 9:16 --v 6.0"},
+        ])
+        result = ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [2], target="prompt")
+
+        assert result["script_lines"] == SCRIPT
+        assert result["mj_prompts_list"][1] == "ghost train in fog --ar 9:16 --v 6.0"
+        self.translator.translate.assert_not_called()
+
+    def test_missing_scenes_keep_original(self, ai):
+        ai.model.generate_content.return_value = response([{"scene": 4, "script": "New line", "prompt": "p"}])
+        result = ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [2, 4])
+
+        assert result["changed_scenes"] == [4]
+        assert result["script_lines"][1] == SCRIPT[1]
+        assert result["mj_prompts_list"][1] == PROMPTS[1]
+
+    def test_parse_error_returns_original(self, ai):
+        ai.model.generate_content.return_value = MagicMock(text="Sorry, I cannot do that")
+        result = ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [1])
+
+        assert "JSON解析エラー" in result["error"]
+        assert result["script_lines"] == SCRIPT and result["mj_prompts_list"] == PROMPTS
+
+    def test_rejects_invalid_scene_numbers(self, ai):
+        with pytest.raises(ValueError):
+            ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS, [6])
+        with pytest.raises(ValueError):
+            ai.regenerate_scenes("Kisaragi Station", SCRIPT, PROMPTS[:4], [1])
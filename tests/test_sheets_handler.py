@@ -0,0 +1,456 @@
+import datetime
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.config import Config
+from src.sheets_client import SheetsClientPool
+from src.sheets_handler import SheetsHandler, _delete_rows_requests
+
+
+SHEET_VALUES = [
+    ["ネタ", "台本", "プロンプト", "完了", "作成日", "備考"],
+    ["口裂け女 (Slit-Mouthed Woman)", "script", "prompt", "完了", "2025-01-01", ""],
+    ["きさらぎ駅 (Kisaragi Station)", "", "", "", "", ""],
+]
+
+
+class TestSheetsSnapshotCache:
+    """SheetsHandlerのスナップショットキャッシュのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(Config, "validate", classmethod(lambda cls: None))
+        monkeypatch.setattr(Config, "SPREADSHEET_ID", "sheet-id")
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 60.0)
+        SheetsHandler._snapshots.clear()
+        SheetsClientPool.reset()
+        with patch("src.sheets_client.gspread") as mock_gspread:
+            self.sh = mock_gspread.service_account.return_value.open_by_key.return_value
+            self.ws = self.sh.worksheet.return_value
+            self.ws.get.return_value = [[r[0]] for r in SHEET_VALUES]
+            self.sh.get_lastUpdateTime.return_value = "rev-1"
+            yield
+        SheetsHandler._snapshots.clear()
+
+    def test_snapshot_shared_between_handlers(self):
+        """別インスタンスでもTTL内は再ダウンロードしない"""
+        assert SheetsHandler().get_all_titles(include_archived=False) == [SHEET_VALUES[1][0], SHEET_VALUES[2][0]]
+        assert SheetsHandler().get_all_titles(include_archived=False) == [SHEET_VALUES[1][0], SHEET_VALUES[2][0]]
+
+        assert self.ws.get.call_count == 1
+
+    def test_expired_snapshot_reused_when_revision_unchanged(self, monkeypatch):
+        """TTL切れでも更新時刻が同じなら再ダウンロードしない"""
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 0)
+        handler = SheetsHandler()
+        handler.get_all_titles(include_archived=False)
+        handler.get_all_titles(include_archived=False)
+
+        assert self.ws.get.call_count == 1
+        assert self.sh.get_lastUpdateTime.call_count == 2
+
+    def test_expired_snapshot_refreshed_when_revision_changed(self, monkeypatch):
+        """TTL切れかつ更新時刻が変わった場合は再取得する"""
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 0)
+        handler = SheetsHandler()
+        handler.get_all_titles(include_archived=False)
+        self.sh.get_lastUpdateTime.return_value = "rev-2"
+        handler.get_all_titles(include_archived=False)
+
+        assert self.ws.get.call_count == 2
+
+    def test_own_writes_invalidate_snapshot(self):
+        """自分の書き込み後は次の読み取りで再取得する"""
+        handler = SheetsHandler()
+        handler.get_all_titles(include_archived=False)
+        handler.mark_as_completed(3)
+        handler.get_all_titles(include_archived=False)
+
+        assert self.ws.get.call_count == 2
+
+
+class TestSheetsBatch:
+    """一括書き込みのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(Config, "validate", classmethod(lambda cls: None))
+        SheetsClientPool.reset()
+        with patch("src.sheets_client.gspread") as mock_gspread:
+            self.ws = mock_gspread.service_account.return_value.open_by_key.return_value.worksheet.return_value
+            self.handler = SheetsHandler()
+            yield
+
+    def test_row_update_is_single_request(self):
+        """update_row_data と mark_as_completed はそれぞれ1リクエスト"""
+        self.handler.update_row_data(5, "script", "prompt")
+        self.handler.mark_as_completed(5)
+
+        assert self.ws.update_cell.call_count == 0
+        assert self.ws.batch_update.call_count == 2
+        data = self.ws.batch_update.call_args_list[0].args[0]
+        assert data == [{"range": "B5:C5", "values": [["script", "prompt"]]}]
+
+    def test_many_rows_in_one_request(self):
+        """50行分の更新と完了処理が1リクエストにまとまる"""
+        with self.handler.batch() as batch:
+            for row in range(2, 52):
+                batch.update_row_data(row, f"script {row}", f"prompt {row}")
+                batch.mark_as_completed(row, date="2025-01-01")
+            batch.update_cell(2, 6, "memo")
+
+        assert self.ws.batch_update.call_count == 1
+        data = self.ws.batch_update.call_args.args[0]
+        assert len(data) == 101
+        assert data[1] == {"range": "D2:E2", "values": [["完了", "2025-01-01"]]}
+        assert data[-1] == {"range": "F2", "values": [["memo"]]}
+
+    def test_batch_not_sent_on_error(self):
+        """例外発生時は送信しない"""
+        with pytest.raises(RuntimeError):
+            with self.handler.batch() as batch:
+                batch.update_row_data(2, "s", "p")
+                raise RuntimeError("boom")
+
+        self.ws.batch_update.assert_not_called()
+
+
+class TestSheetsClientPool:
+    """共有クライアントのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(Config, "validate", classmethod(lambda cls: None))
+        monkeypatch.setattr(Config, "SPREADSHEET_ID", "sheet-id")
+        monkeypatch.setattr(Config, "GOOGLE_APPLICATION_CREDENTIALS", "creds.json")
+        SheetsClientPool.reset()
+        with patch("src.sheets_client.gspread") as mock_gspread:
+            self.gspread = mock_gspread
+            yield
+        SheetsClientPool.reset()
+
+    def test_authenticates_once(self):
+        """何度ハンドラを作っても認証とオープンは1回だけ"""
+        handlers = [SheetsHandler() for _ in range(6)]
+
+        assert self.gspread.service_account.call_count == 1
+        client = self.gspread.service_account.return_value
+        assert client.open_by_key.call_count == 1
+        assert client.open_by_key.return_value.worksheet.call_count == 1
+        assert all(h.worksheet is handlers[0].worksheet for h in handlers)
+
+    def test_reauthenticates_when_credentials_change(self, monkeypatch):
+        """認証情報ファイルが変わったら再認証する"""
+        SheetsHandler()
+        monkeypatch.setattr(Config, "GOOGLE_APPLICATION_CREDENTIALS", "other.json")
+        SheetsHandler()
+
+        assert self.gspread.service_account.call_count == 2
+
+    def test_failed_connection_resets_pool(self):
+        """接続失敗時はConnectionErrorにし、次回は再接続する"""
+        client = self.gspread.service_account.return_value
+        client.open_by_key.side_effect = Exception("network down")
+        with pytest.raises(ConnectionError):
+            SheetsHandler()
+
+        client.open_by_key.side_effect = None
+        SheetsHandler()
+        assert self.gspread.service_account.call_count == 2
+
+
+class TestPendingRowIndex:
+    """未処理行インデックスのテスト"""
+
+    def test_finds_next_job_without_full_download(self, fake_handler):
+        """全体ダウンロードせずにA列・D列と候補行だけを読む"""
+        row_idx, row = fake_handler.get_unprocessed_row()
+
+        assert row_idx == 3
+        assert row[0] == "きさらぎ駅 (Kisaragi Station)"
+        assert ("get_all_values",) not in fake_handler.worksheet.requests
+        assert fake_handler.worksheet.requests == [
+            ("batch_get", ["A1:A", "D1:D"]),
+            ("batch_get", ["A3", "D3"]),
+            ("batch_get", ["B3:C3"]),
+        ]
+
+    def test_appended_and_completed_rows_update_index(self, fake_handler):
+        """追記した行は未処理に、完了にした行は対象外になる"""
+        fake_handler.get_unprocessed_row()
+        fake_handler.append_new_titles(["八尺様 (Hachishakusama)", "くねくね (Kunekune)"])
+        fake_handler.mark_as_completed(3)
+        requests_before = len(fake_handler.worksheet.requests)
+
+        rows = fake_handler.get_unprocessed_rows(5)
+
+        assert [r[0] for r in rows] == [4, 5]
+        assert rows[0][1][0] == "八尺様 (Hachishakusama)"
+        # TTL内なのでA列・D列の再スキャンは発生しない
+        assert fake_handler.worksheet.requests[requests_before:] == [
+            ("batch_get", ["A4", "D4", "A5", "D5"]),
+            ("batch_get", ["B4:C4", "B5:C5"]),
+        ]
+
+    def test_externally_completed_rows_are_skipped(self, fake_handler):
+        """外部で完了にされた候補行は読み込み時に除外される"""
+        fake_handler.append_new_titles(["八尺様 (Hachishakusama)"])
+        fake_handler.get_unprocessed_row()
+        fake_handler.worksheet.values[2][3] = "完了"
+
+        row_idx, row = fake_handler.get_unprocessed_row()
+
+        assert row_idx == 4
+        assert fake_handler._pending_index().candidates() == [4]
+
+    def test_tail_scan_after_ttl(self, fake_handler, monkeypatch):
+        """TTL経過後は cursor 以降だけを読んで外部の追加行を検出する"""
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 0)
+        fake_handler.get_unprocessed_row()
+        fake_handler.worksheet.values.append(["くねくね (Kunekune)"])
+
+        rows = fake_handler.get_unprocessed_rows(2)
+
+        assert [r[0] for r in rows] == [3, 4]
+        assert ("batch_get", ["A3:A", "D3:D"]) in fake_handler.worksheet.requests
+
+    def test_rebuilt_when_rows_archived_elsewhere(self, fake_handler, monkeypatch):
+        """他のプロセスのアーカイブで行が詰まっても、その後に追加された行を見落とさない"""
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 0)
+        fake_handler.append_new_titles(["八尺様 (Hachishakusama)"])
+        fake_handler.get_unprocessed_row()
+        fake_handler.find_title_row("八尺様 (Hachishakusama)")
+
+        # 別のマシンが2行目をアーカイブし、その後に新しいネタが追加された
+        del fake_handler.worksheet.values[1]
+        fake_handler.worksheet.values.append(["くねくね (Kunekune)"])
+
+        assert [r[0] for r in fake_handler.get_unprocessed_rows(5)] == [2, 3, 4]
+        assert fake_handler.find_title_row("くねくね (Kunekune)") == 4
+        row_idx, created = fake_handler.upsert_title_row("くねくね (Kunekune)", "script", "prompts")
+        assert (row_idx, created) == (4, False)
+        assert len(fake_handler.worksheet.values) == 4
+
+
+class TestTitleRowIndex:
+    """タイトルインデックスと upsert_title_row のテスト"""
+
+    def test_upsert_existing_title_updates_row(self, fake_handler):
+        """既存タイトル（表記揺れ含む）はその行を更新する: A列の差分と書き込み先の確認で読み2回・書き1回"""
+        row_idx, created = fake_handler.upsert_title_row("きさらぎ駅　(KISARAGI Station) ", "script", "prompts")
+
+        assert (row_idx, created) == (3, False)
+        assert fake_handler.worksheet.values[2][1:3] == ["script", "prompts"]
+        assert fake_handler.worksheet.requests[1] == ("get", "A3")
+        assert [r[0] for r in fake_handler.worksheet.requests] == ["get", "get", "batch_update"]
+
+    def test_stale_index_is_rebuilt_before_writing(self, fake_handler):
+        """他のクライアントが行を挿入して行番号がずれても、別のタイトルの行は上書きしない"""
+        fake_handler.find_title_row("きさらぎ駅 (Kisaragi Station)")
+        fake_handler.worksheet.values.insert(1, ["八尺様 (Hachishakusama)", "", "", "", "", ""])
+
+        row_idx, created = fake_handler.upsert_title_row("きさらぎ駅 (Kisaragi Station)", "script", "prompts")
+
+        assert (row_idx, created) == (4, False)
+        assert fake_handler.worksheet.values[3][:3] == ["きさらぎ駅 (Kisaragi Station)", "script", "prompts"]
+        assert fake_handler.worksheet.values[2][1] == "script"  # 口裂け女の行はそのまま
+        assert fake_handler.worksheet.values[1][1] == ""
+
+    def test_title_index_rebuilt_after_interval(self, fake_handler, monkeypatch):
+        """SHEETS_INDEX_REBUILD_SEC を過ぎたら差分ではなくA列全体を読み直す"""
+        fake_handler.find_title_row("口裂け女 (Slit-Mouthed Woman)")
+        monkeypatch.setattr(Config, "SHEETS_INDEX_REBUILD_SEC", 0)
+        del fake_handler.worksheet.values[1]
+
+        assert fake_handler.find_title_row("きさらぎ駅 (Kisaragi Station)") == 2
+        assert fake_handler.find_title_row("口裂け女 (Slit-Mouthed Woman)") is None
+
+    def test_upsert_new_title_uses_append_response(self, fake_handler):
+        """新規タイトルは追記し、行番号は append のレスポンスから取る"""
+        row_idx, created = fake_handler.upsert_title_row("八尺様 (Hachishakusama)", "script", "prompts")
+
+        assert (row_idx, created) == (4, True)
+        assert fake_handler.worksheet.values[3] == ["八尺様 (Hachishakusama)", "script", "prompts"]
+        assert [r[0] for r in fake_handler.worksheet.requests] == ["get", "append_rows"]
+
+        # 2回目は差分（cursor 行以降）だけを読んで既存行として更新される
+        row_idx, created = fake_handler.upsert_title_row("八尺様 (Hachishakusama)", "script v2", "prompts v2")
+        assert (row_idx, created) == (4, False)
+        assert ("get", "A4:A") in fake_handler.worksheet.requests
+        assert len(fake_handler.worksheet.values) == 4
+
+    def test_new_title_is_pending(self, fake_handler):
+        """追記したタイトルは未処理キューにも入る"""
+        fake_handler.get_unprocessed_row()
+        fake_handler.mark_as_completed(3)
+        fake_handler.upsert_title_row("八尺様 (Hachishakusama)", "script", "prompts")
+
+        row_idx, row = fake_handler.get_unprocessed_row()
+        assert row_idx == 4
+        assert row[1] == "script"
+
+
+class TestProjectedReads:
+    """列を絞った読み取りのテスト"""
+
+    def test_sidebar_peek_reads_no_body_columns(self, fake_handler):
+        """サイドバー用の確認はA列・D列だけを読む"""
+        fake_handler.worksheet.values[2][1:3] = ["long script", "long prompt"]
+
+        assert fake_handler.peek_unprocessed_title() == (3, "きさらぎ駅 (Kisaragi Station)")
+        read_ranges = [a1 for req in fake_handler.worksheet.requests for a1 in req[1]]
+        assert not any(a1.startswith(("B", "C")) for a1 in read_ranges)
+
+    def test_body_is_read_only_for_loaded_row(self, fake_handler):
+        """台本・プロンプトは読み込む行の分だけ取得する"""
+        fake_handler.worksheet.values[2][1:3] = ["long script", "long prompt"]
+
+        row_idx, row = fake_handler.get_unprocessed_row()
+
+        assert row == ["きさらぎ駅 (Kisaragi Station)", "long script", "long prompt", ""]
+        assert fake_handler.worksheet.requests[-1] == ("batch_get", ["B3:C3"])
+
+    def test_get_columns_single_request(self, fake_handler):
+        """複数列を1回の batch_get で取得する"""
+        columns = fake_handler.get_columns(["A", "D"])
+
+        assert columns["A"] == ["口裂け女 (Slit-Mouthed Woman)", "きさらぎ駅 (Kisaragi Station)"]
+        assert columns["D"] == ["完了"]
+        assert fake_handler.worksheet.requests == [("batch_get", ["A2:A", "D2:D"])]
+
+    def test_titles_read_only_column_a(self, fake_handler):
+        """タイトル一覧はA列だけを読む"""
+        assert len(fake_handler.get_all_titles()) == 2
+        assert fake_handler.worksheet.requests == [("get", "A1:A")]
+        assert fake_handler.get_row(2, "B:C") == ["script", "prompt"]
+
+
+class TestArchive:
+    """アーカイブタブへの移動のテスト"""
+
+    @pytest.fixture
+    def handler(self, fake_handler):
+        values = fake_handler.worksheet.values
+        values[1][4] = "2020/01/01"
+        values.append(["八尺様 (Hachishakusama)", "s", "p", "完了", datetime.date.today().isoformat(), ""])
+        values.append(["くねくね (Kunekune)", "s", "p", "完了", "2020-02-01", "memo"])
+        return fake_handler
+
+    def test_dry_run_lists_old_completed_rows(self, handler):
+        """完了かつ指定日数より古い行だけが対象になる"""
+        assert handler.archive_completed(30, dry_run=True) == [2, 5]
+        assert len(handler.worksheet.values) == 5
+
+    def test_archive_moves_rows_in_bulk(self, handler):
+        """アーカイブタブを作成して行を移動し、元の行は削除する"""
+        moved = handler.archive_completed(30)
+
+        archive = handler.worksheet.spreadsheet.worksheets["アーカイブ"]
+        assert moved == [2, 5]
+        assert archive.values[0] == SHEET_VALUES[0]
+        assert [r[0] for r in archive.values[1:]] == ["口裂け女 (Slit-Mouthed Woman)", "くねくね (Kunekune)"]
+        assert [r[0] for r in handler.worksheet.values] == ["ネタ", "きさらぎ駅 (Kisaragi Station)", "八尺様 (Hachishakusama)"]
+
+    def test_archived_titles_still_deduplicated(self, handler):
+        """アーカイブ後もタイトル一覧（重複チェック）にはアーカイブ済みのタイトルが含まれる"""
+        handler.archive_completed(30)
+
+        titles = handler.get_all_titles()
+        assert "口裂け女 (Slit-Mouthed Woman)" in titles
+        assert "くねくね (Kunekune)" in titles
+        assert handler.get_all_titles(include_archived=False) == ["きさらぎ駅 (Kisaragi Station)", "八尺様 (Hachishakusama)"]
+
+    def test_indexes_rebuilt_after_archive(self, handler):
+        """行番号がずれても未処理キューとタイトル検索は正しい行を返す"""
+        handler.get_unprocessed_row()
+        handler.find_title_row("きさらぎ駅 (Kisaragi Station)")
+        handler.archive_completed(30)
+
+        assert handler.get_unprocessed_row()[0] == 2
+        assert handler.find_title_row("八尺様 (Hachishakusama)") == 3
+
+    def test_archive_refused_while_rows_below_are_leased(self, handler):
+        """削除で行番号がずれる行にリースがある間はアーカイブしない"""
+        handler.worksheet.values[2] += [f"worker-1|{int(time.time()) + 600}|nonce"]
+
+        with pytest.raises(RuntimeError, match="leased"):
+            handler.archive_completed(30)
+        assert len(handler.worksheet.values) == 5
+        assert "アーカイブ" not in handler.worksheet.spreadsheet.worksheets
+
+        # 期限切れのリースは無視する
+        handler.worksheet.values[2][6] = f"worker-1|{int(time.time()) - 1}|nonce"
+        assert handler.archive_completed(30) == [2, 5]
+
+    def test_auto_archive_runs_once_per_day(self, handler, monkeypatch):
+        """自動アーカイブは設定時のみ、1日1回まで"""
+        assert handler.maybe_auto_archive() == []
+
+        monkeypatch.setattr(Config, "SHEETS_ARCHIVE_AFTER_DAYS", 30)
+        assert handler.maybe_auto_archive() == [2, 5]
+        handler.worksheet.values.append(["x", "", "", "完了", "2020-01-01"])
+        assert handler.maybe_auto_archive() == []
+
+    def test_delete_requests_merge_contiguous_rows(self):
+        """連続する行は1つの deleteDimension にまとめ、下から削除する"""
+        requests = _delete_rows_requests(7, [2, 3, 4, 8])
+
+        assert [r["deleteDimension"]["range"]["startIndex"] for r in requests] == [7, 1]
+        assert [r["deleteDimension"]["range"]["endIndex"] for r in requests] == [8, 4]
+
+
+class TestLeaseClaim:
+    """リースによる行確保のテスト"""
+
+    @pytest.fixture
+    def handler(self, fake_handler, monkeypatch):
+        monkeypatch.setattr(Config, "SHEETS_LEASE_SETTLE_SEC", 0)
+        fake_handler.worksheet.values.append(["八尺様 (Hachishakusama)", "script", "prompt"])
+        return fake_handler
+
+    def test_workers_claim_different_rows(self, handler):
+        """2つのワーカーは別々の行を確保する"""
+        row_a, data_a = handler.claim_next_row("worker-a", 600)
+        row_b, data_b = handler.claim_next_row("worker-b", 600)
+
+        assert (row_a, row_b) == (3, 4)
+        assert data_b == ["八尺様 (Hachishakusama)", "script", "prompt", ""]
+        assert handler.worksheet.values[2][6].startswith("worker-a|")
+        assert handler.claim_next_row("worker-c", 600) == (None, None)
+
+    def test_expired_lease_can_be_taken_over(self, handler):
+        """期限切れのリースは他のワーカーが引き継げる"""
+        handler.worksheet.values[2] += ["", "", "", "worker-a|1|dead"]
+
+        row_idx, _ = handler.claim_next_row("worker-b", 600)
+
+        assert row_idx == 3
+        assert handler.worksheet.values[2][6].startswith("worker-b|")
+
+    def test_lost_race_moves_to_next_row(self, handler, monkeypatch):
+        """書き込み後の確認で他のワーカーに上書きされていたら次の候補へ進む"""
+        def rival_writes(seconds):
+            row = handler.worksheet.values[2]
+            if row[6].startswith("worker-a|"):
+                row[6] = "worker-b|9999999999|rival"
+        monkeypatch.setattr("src.sheets_handler.time.sleep", rival_writes)
+
+        row_idx, _ = handler.claim_next_row("worker-a", 600)
+
+        assert row_idx == 4
+        assert handler.worksheet.values[2][6] == "worker-b|9999999999|rival"
+
+    def test_renew_and_release(self, handler):
+        """リースの延長・解除は持ち主だけが行える"""
+        row_idx, _ = handler.claim_next_row("worker-a", 60)
+        old_expiry = int(handler.worksheet.values[2][6].split("|")[1])
+
+        assert handler.renew_lease(row_idx, "worker-b") is False
+        assert handler.renew_lease(row_idx, "worker-a", 3600) is True
+        assert int(handler.worksheet.values[2][6].split("|")[1]) > old_expiry
+
+        assert handler.release_lease(row_idx, "worker-b") is False
+        assert handler.release_lease(row_idx, "worker-a") is True
+        assert handler.worksheet.values[2][6] == ""
+        assert handler.claim_next_row("worker-b", 60)[0] == 3
@@ -0,0 +1,143 @@
+import os
+import pytest
+
+from src.config import Config
+from src.sheets_mirror import MirroredSheetsHandler, SheetsMirror
+
+
+class TestSheetsMirror:
+    """ローカルSQLiteミラーのテスト"""
+
+    @pytest.fixture
+    def mirror(self, tmp_path):
+        return SheetsMirror(db_path=os.path.join(tmp_path, "mirror.db"))
+
+    @pytest.fixture
+    def handler(self, fake_worksheet, mirror):
+        return MirroredSheetsHandler(mirror=mirror)
+
+    def test_initial_sync_and_local_reads(self, handler, fake_worksheet):
+        """初回同期後の読み取りはシートにアクセスしない"""
+        requests_before = len(fake_worksheet.requests)
+
+        assert handler.get_all_titles() == ["口裂け女 (Slit-Mouthed Woman)", "きさらぎ駅 (Kisaragi Station)"]
+        row_idx, row = handler.get_unprocessed_row()
+        assert row_idx == 3
+        assert row[0] == "きさらぎ駅 (Kisaragi Station)"
+        assert handler.find_title_row("きさらぎ駅 (KISARAGI Station)") == 3
+        assert len(fake_worksheet.requests) == requests_before
+
+    def test_pull_rewrites_only_changed_rows(self, mirror, fake_worksheet):
+        """ハッシュが変わった行だけを書き換える"""
+        assert mirror.pull(fake_worksheet.values) == 3
+        assert mirror.pull(fake_worksheet.values) == 0
+
+        values = [list(r) for r in fake_worksheet.values]
+        values[2][1] = "new script"
+        assert mirror.pull(values) == 1
+        assert mirror.get_row(3)[1] == "new script"
+
+    def test_writes_are_pushed_as_one_batch(self, handler, fake_worksheet):
+        """書き込みはローカルに即時反映され、シートには1回の batchUpdate で送られる"""
+        handler.update_row_data(3, "script", "prompt")
+        handler.mark_as_completed(3)
+
+        assert handler.mirror.get_row(3)[1:4] == ["script", "prompt", "完了"]
+        assert fake_worksheet.values[2][1:4] == ["script", "prompt", "完了"]
+        assert handler.mirror.pending_writes() == 0
+
+    def test_offline_writes_are_queued(self, handler, fake_worksheet):
+        """送信に失敗した書き込みは outbox に残り、次回の同期で送られる"""
+        def offline(*args, **kwargs):
+            raise ConnectionError("offline")
+        fake_worksheet.append_rows = offline
+        fake_worksheet.batch_update = offline
+
+        row_idx, created = handler.upsert_title_row("八尺様 (Hachishakusama)", "script", "prompts")
+        handler.mark_as_completed(3)
+
+        assert (row_idx, created) == (4, True)
+        assert handler.mirror.pending_writes() == 2
+        assert handler.get_unprocessed_row()[0] == 4
+
+        # 復帰後の同期で送信される
+        del fake_worksheet.append_rows
+        del fake_worksheet.batch_update
+        assert handler.sync() is True
+        assert handler.mirror.pending_writes() == 0
+        assert fake_worksheet.values[3][:3] == ["八尺様 (Hachishakusama)", "script", "prompts"]
+        assert fake_worksheet.values[2][3] == "完了"
+
+    def test_appended_row_is_renumbered(self, mirror, handler, fake_worksheet):
+        """他の人が先に追記していた場合、暫定の行番号を確定した行番号に付け替える"""
+        fake_worksheet.values.append(["くねくね (Kunekune)"])
+        handler.append_new_titles(["八尺様 (Hachishakusama)"])
+
+        assert mirror.find_title_row("八尺様 (Hachishakusama)") == 5
+        assert fake_worksheet.values[4][0] == "八尺様 (Hachishakusama)"
+
+    def test_appended_rows_shift_down(self, mirror, handler, fake_worksheet):
+        """リモートで行が削除され、追記した2行の行番号が前にずれても、別の未送信の行を消さずに付け替える"""
+        def offline(*args, **kwargs):
+            raise ConnectionError("offline")
+        fake_worksheet.append_rows = offline
+        fake_worksheet.batch_update = offline
+        handler.append_new_titles(["八尺様 (Hachishakusama)", "くねくね (Kunekune)"])
+        handler.update_row_data(5, "kunekune script", "kunekune prompt")
+        assert (mirror.find_title_row("八尺様 (Hachishakusama)"), mirror.find_title_row("くねくね (Kunekune)")) == (4, 5)
+
+        # オフラインの間に他の人が3行目をアーカイブした
+        del fake_worksheet.values[2]
+        del fake_worksheet.append_rows
+        del fake_worksheet.batch_update
+        assert mirror.push(handler) == 3
+
+        assert mirror.get_row(3)[0] == "八尺様 (Hachishakusama)"
+        assert mirror.get_row(4)[:3] == ["くねくね (Kunekune)", "kunekune script", "kunekune prompt"]
+        assert mirror.pending_writes() == 0
+        assert fake_worksheet.values[2][0] == "八尺様 (Hachishakusama)"
+        assert fake_worksheet.values[3][:3] == ["くねくね (Kunekune)", "kunekune script", "kunekune prompt"]
+
+    def test_upsert_verifies_title_after_remote_delete(self, mirror, fake_worksheet, tmp_path):
+        """同期後に他の人が行を削除しても、別のタイトルの行には書き込まない"""
+        fake_worksheet.values.append(["八尺様 (Hachishakusama)", "", "", "", "", ""])
+        handler = MirroredSheetsHandler(mirror=mirror)
+        del fake_worksheet.values[1]
+
+        row_idx, created = handler.upsert_title_row("きさらぎ駅 (Kisaragi Station)", "script", "prompts")
+
+        assert (row_idx, created) == (2, False)
+        assert fake_worksheet.values[1][:3] == ["きさらぎ駅 (Kisaragi Station)", "script", "prompts"]
+        assert fake_worksheet.values[2][:3] == ["八尺様 (Hachishakusama)", "", ""]
+        assert mirror.find_title_row("八尺様 (Hachishakusama)") == 3
+
+    def test_queued_writes_follow_moved_rows(self, mirror, handler, fake_worksheet):
+        """オフライン中に積んだ書き込みは、行がずれていればタイトルで付け替えて送る"""
+        def offline(*args, **kwargs):
+            raise ConnectionError("offline")
+        fake_worksheet.batch_update = offline
+        handler.update_row_data(3, "script", "prompt")
+        handler.mark_as_completed(2)
+
+        # オフラインの間に他の人が口裂け女の行をアーカイブし、新しい行を追加した
+        del fake_worksheet.values[1]
+        fake_worksheet.values.append(["八尺様 (Hachishakusama)", "", "", "", "", ""])
+        del fake_worksheet.batch_update
+        assert mirror.push(handler) == 1
+
+        assert fake_worksheet.values[1][:4] == ["きさらぎ駅 (Kisaragi Station)", "script", "prompt", ""]
+        assert fake_worksheet.values[2][:4] == ["八尺様 (Hachishakusama)", "", "", ""]
+        assert mirror.pending_writes() == 0
+        assert mirror.get_row(2)[:2] == ["きさらぎ駅 (Kisaragi Station)", "script"]
+        assert mirror.find_title_row("八尺様 (Hachishakusama)") == 3
+
+    def test_sync_does_not_pull_cached_snapshot(self, handler, fake_worksheet, monkeypatch):
+        """スナップショットのTTL内でも、更新時刻が変わっていればシートから直接読み直す"""
+        monkeypatch.setattr(Config, "SHEETS_CACHE_TTL", 3600)
+        handler._get_all_values()
+        fake_worksheet.values[2][1] = "edited elsewhere"
+        fake_worksheet.spreadsheet.revision = "rev-2"
+
+        assert handler.sync() is True
+        assert handler.mirror.get_row(3)[1] == "edited elsewhere"
+        assert handler.mirror.get_meta("revision") == "rev-2"
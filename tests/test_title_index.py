@@ -0,0 +1,112 @@
+import json
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.modules['google.generativeai'] = MagicMock()
+
+from src.ai_generator import AIGenerator
+from src.title_index import TitleIndex, split_title
+
+
+EXISTING = [
+    "口裂け女 (Slit-Mouthed Woman)",
+    "きさらぎ駅 (Kisaragi Station)",
+    "八尺様 (Hachishakusama)",
+    "くねくね (Kunekune)",
+]
+
+
+class TestTitleIndex:
+    """TitleIndex のテスト"""
+
+    @pytest.fixture
+    def index(self):
+        return TitleIndex(EXISTING)
+
+    def test_split_title(self):
+        assert split_title("きさらぎ駅 (Kisaragi Station)") == ("きさらぎ駅", "Kisaragi Station")
+        assert split_title("きさらぎ駅（Kisaragi Station）") == ("きさらぎ駅", "Kisaragi Station")
+        assert split_title("Kisaragi Station") == ("", "Kisaragi Station")
+        assert split_title("きさらぎ駅") == ("きさらぎ駅", "")
+
+    def test_finds_near_duplicates_in_either_language(self, index):
+        """日本語・英語のどちらかが似ていれば重複候補として返す"""
+        assert index.find_duplicate("口裂け女 (The Slit Mouth Woman)")[0] == "口裂け女 (Slit-Mouthed Woman)"
+        assert index.find_duplicate("如月駅 (Kisaragi Station)")[0] == "きさらぎ駅 (Kisaragi Station)"
+        assert index.find_duplicate("八尺様")[0] == "八尺様 (Hachishakusama)"
+
+    def test_unrelated_titles_are_not_duplicates(self, index):
+        assert index.find_duplicate("ひきこさん (Hikiko-san)") == (None, 0.0)
+
+    def test_sample_is_bounded(self):
+        index = TitleIndex([f"怪談{i} (Ghost Story {i})" for i in range(300)])
+        sample = index.sample(20)
+        assert len(sample) == 20
+        assert sample[0] == "怪談299 (Ghost Story 299)"
+
+    def test_sample_prefers_similar_titles(self, index):
+        sample = index.sample(2, query="きさらぎ駅の謎 (Mystery of Kisaragi Station)")
+        assert sample[0] == "きさらぎ駅 (Kisaragi Station)"
+        assert len(sample) == 2
+
+    def test_sample_from_given_titles(self, index):
+        """titles を渡すとその中から、末尾を新しいものとして選ぶ"""
+        index.add("ひきこさん (Hikiko-san)")
+        assert index.sample(2, titles=EXISTING[:2]) == ["きさらぎ駅 (Kisaragi Station)", "口裂け女 (Slit-Mouthed Woman)"]
+        assert index.sample(1, query="きさらぎ駅の謎 (Mystery of Kisaragi Station)", titles=EXISTING[2:]) == \
+            ["くねくね (Kunekune)"]
+
+
+class TestIdeaDeduplication:
+    """generate_new_ideas の既存ネタ抽出と重複判定のテスト"""
+
+    @pytest.fixture
+    def ai(self):
+        TitleIndex.reset_shared()
+        with patch('src.ai_generator.genai'):
+            ai = AIGenerator(use_cache=False)
+            ai.model = MagicMock()
+            ai.model.generate_content.return_value = MagicMock(text=json.dumps({
+                "discussion": "議論",
+                "ideas": [
+                    {"title": "口裂け女の逆襲 (Slit-Mouthed Woman Returns)", "overview": "o", "horror_point": "h"},
+                    {"title": "ひきこさん (Hikiko-san)", "overview": "o", "horror_point": "h"},
+                ],
+            }, ensure_ascii=False))
+            yield ai
+        TitleIndex.reset_shared()
+
+    def test_prompt_contains_bounded_sample(self, ai):
+        """プロンプトには上限件数までの既存ネタしか載せない"""
+        existing = [f"怪談{i} (Ghost Story {i})" for i in range(500)]
+        with patch('src.ai_generator.Config.AI_IDEAS_TITLE_SAMPLE', 10):
+            ai.generate_new_ideas(existing)
+
+        prompt = ai.model.generate_content.call_args.args[0]
+        assert "怪談499 (Ghost Story 499)" in prompt
+        assert "怪談0 (Ghost Story 0)" not in prompt
+        assert "全500件" in prompt
+
+    def test_archived_titles_only_used_for_duplicates(self, ai):
+        """直近のネタはシート上のタイトルから選び、アーカイブ済みのタイトルは重複判定にだけ使う"""
+        live = [f"怪談{i} (Ghost Story {i})" for i in range(5)]
+        with patch('src.ai_generator.Config.AI_IDEAS_TITLE_SAMPLE', 3):
+            ideas, _ = ai.generate_new_ideas(live, archived_titles=EXISTING)
+
+        prompt = ai.model.generate_content.call_args.args[0]
+        assert "怪談4 (Ghost Story 4)" in prompt
+        assert not any(title in prompt for title in EXISTING)
+        assert "全9件" in prompt
+        assert ideas["口裂け女の逆襲 (Slit-Mouthed Woman Returns)"]["duplicate_of"] == "口裂け女 (Slit-Mouthed Woman)"
+
+    def test_flags_near_duplicates(self, ai):
+        ideas, full_text = ai.generate_new_ideas(EXISTING)
+
+        assert ideas["口裂け女の逆襲 (Slit-Mouthed Woman Returns)"]["duplicate_of"] == "口裂け女 (Slit-Mouthed Woman)"
+        assert "duplicate_of" not in ideas["ひきこさん (Hikiko-san)"]
+        assert "既存ネタと類似" in full_text
+
+    def test_drop_duplicates(self, ai):
+        ideas, _ = ai.generate_new_ideas(EXISTING, drop_duplicates=True)
+        assert list(ideas) == ["ひきこさん (Hikiko-san)"]
@@ -1,4 +1,4 @@
-from src.deepl_translator import DeepLTranslator
+from src.deepl_translator import DeepLTranslator, TranslationError
 from src.config import Config
 
 def test_deepl():
@@ -11,14 +11,17 @@ def test_deepl():
         test_text = "Beyond this sign the law fades"
         print(f"Translating: '{test_text}'")
         
+        # 失敗時は TranslationError が送出される（エラー文字列を訳として返すことはない）
         result = translator.translate(test_text)
         print(f"Result: '{result}'")
         
-        if result and "[Translation Error]" not in result:
+        if result:
             print("[OK] DeepL API is working.")
         else:
             print("[FAIL] Unexpected translation result.")
             
+    except TranslationError as e:
+        print(f"[FAIL] DeepL translation failed (status: {e.status_code}): {e}")
     except Exception as e:
         print(f"[FAIL] DeepL API error: {e}")
 
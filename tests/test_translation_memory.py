@@ -0,0 +1,103 @@
+import json
+import os
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+from src.config import Config
+from src.deepl_translator import DeepLTranslator, TranslationError
+from src.translation_memory import TranslationMemory
+
+
+def fake_post(url, data=None, **kwargs):
+    texts = data["text"] if isinstance(data["text"], list) else [data["text"]]
+    body = {"translations": [{"text": f"訳:{text}"} for text in texts]}
+    response = MagicMock(status_code=200, headers={}, text=json.dumps(body, ensure_ascii=False))
+    response.json.return_value = body
+    return response
+
+
+class TestTranslationMemory:
+    """TranslationMemory のテスト"""
+
+    @pytest.fixture
+    def memory(self, tmp_path):
+        return TranslationMemory(db_path=os.path.join(tmp_path, "tm.db"), max_entries=3, max_bytes=1024)
+
+    def test_key_normalizes_source(self):
+        """空白の違い・Unicode 正規化の違いは同じ原文として扱う"""
+        base = TranslationMemory.make_key("The train stops.", "JA")
+        assert base == TranslationMemory.make_key("  The   train\tstops. ", "ja")
+        assert TranslationMemory.make_key("Café", "JA") == TranslationMemory.make_key("Café", "JA")
+        assert base != TranslationMemory.make_key("The train stops.", "DE")
+        assert base != TranslationMemory.make_key("The train stops.", "JA", glossary_version="v2")
+
+    def test_lookup_and_stats(self, memory):
+        """見つかった原文だけが返り、ヒット・ミスが記録される"""
+        memory.store({"Hello": "こんにちは"}, "JA")
+        assert memory.lookup(["Hello", "Goodbye"], "JA") == {"Hello": "こんにちは"}
+
+        stats = memory.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["hit_rate"] == pytest.approx(0.5)
+
+    def test_lru_eviction_by_count(self, memory):
+        """件数上限を超えると最後に使われた時刻が古いものから削除される"""
+        for text in ["a", "b", "c"]:
+            memory.store({text: text.upper()}, "JA")
+        memory.lookup(["a"], "JA")
+        memory.store({"d": "D"}, "JA")
+
+        assert memory.lookup(["a", "b", "c", "d"], "JA") == {"a": "A", "c": "C", "d": "D"}
+        assert memory.stats()["entries"] == 3
+
+    def test_eviction_by_size(self, memory):
+        """合計サイズの上限を超えると古いものから削除される"""
+        memory.store({"x": "x" * 600}, "JA")
+        memory.store({"y": "y" * 600}, "JA")
+        assert memory.lookup(["x", "y"], "JA") == {"y": "y" * 600}
+
+    def test_clear(self, memory):
+        memory.store({"Hello": "こんにちは"}, "JA")
+        memory.clear()
+        assert memory.stats()["entries"] == 0
+
+
+class TestTranslatorMemory:
+    """DeepLTranslator からの翻訳メモリ利用のテスト"""
+
+    @pytest.fixture
+    def post(self):
+        with patch.object(Config, "BACKEND_MODE", "live"), patch.object(Config, "DEEPL_API_KEY", "key:fx"), \
+                patch("requests.Session.post", side_effect=fake_post) as post:
+            yield post
+
+    def test_repeated_lines_are_not_sent_again(self, post):
+        """2回目以降は保存済みの訳を使い、新しい行だけを送る"""
+        translator = DeepLTranslator()
+        assert translator.translate_batch(["A", "B", "A"]) == ["訳:A", "訳:B", "訳:A"]
+        assert post.call_args.kwargs["data"]["text"] == ["A", "B"]
+
+        assert DeepLTranslator().translate_batch(["B", "C", ""]) == ["訳:B", "訳:C", ""]
+        assert post.call_args.kwargs["data"]["text"] == ["C"]
+        assert DeepLTranslator().translate("A") == "訳:A"
+        assert post.call_count == 2
+
+    def test_errors_are_not_stored(self, post):
+        """翻訳に失敗した結果は保存しない"""
+        post.side_effect = requests.ConnectionError("network")
+        with patch("src.deepl_translator.time.sleep"), pytest.raises(TranslationError):
+            DeepLTranslator().translate("A")
+
+        post.side_effect = fake_post
+        assert DeepLTranslator().translate("A") == "訳:A"
+
+    def test_glossary_version_invalidates(self, post):
+        DeepLTranslator(glossary_version="v1").translate("A")
+        DeepLTranslator(glossary_version="v2").translate("A")
+        assert post.call_count == 2
+
+    def test_memory_can_be_disabled(self, post):
+        DeepLTranslator(use_memory=False).translate("A")
+        DeepLTranslator(use_memory=False).translate("A")
+        assert post.call_count == 2
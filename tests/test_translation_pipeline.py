@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.deepl_translator import PartialTranslationError
+from src.translation_pipeline import TranslationPipeline
+
+
+class SlowTranslator:
+    """1回の translate_batch に delay 秒かかるテスト用の翻訳器"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def translate_batch(self, lines, target_lang="JA"):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append(list(lines))
+        return [f"訳:{line}" for line in lines]
+
+
+class TestTranslationPipeline:
+    """TranslationPipeline のテスト"""
+
+    def test_join_returns_results_in_order(self):
+        pipeline = TranslationPipeline(SlowTranslator())
+        pipeline.submit_all(["A", "B", "C"])
+        assert pipeline.join() == ["訳:A", "訳:B", "訳:C"]
+
+    def test_lines_queued_during_a_batch_form_the_next_batch(self):
+        """翻訳中に届いた行は1件ずつではなく、まとめて次のバッチで送る"""
+        translator = SlowTranslator(delay=0.1)
+        pipeline = TranslationPipeline(translator)
+        pipeline.submit(0, "A")
+        time.sleep(0.02)
+        for i, line in enumerate(["B", "C", "D"], 1):
+            pipeline.submit(i, line)
+
+        assert pipeline.join() == ["訳:A", "訳:B", "訳:C", "訳:D"]
+        assert translator.batches == [["A"], ["B", "C", "D"]]
+
+    def test_overlaps_with_generation(self):
+        """生成（行が届く間隔）と翻訳が重なり、合計時間は両者の和より短い"""
+        translator = SlowTranslator(delay=0.1)
+        pipeline = TranslationPipeline(translator)
+        started = time.perf_counter()
+        for i in range(4):
+            time.sleep(0.1)  # Gemini から次の行が届くまでの時間
+            pipeline.submit(i, f"line {i}")
+        results = pipeline.join()
+        elapsed = time.perf_counter() - started
+
+        assert results == [f"訳:line {i}" for i in range(4)]
+        # 直列なら 0.4（生成）+ 0.4（翻訳）秒、重なれば最後の1バッチ分だけ延びる
+        assert elapsed < 0.7
+
+    def test_poll_returns_each_translation_once(self):
+        pipeline = TranslationPipeline(SlowTranslator())
+        pipeline.submit_all(["A", "B"])
+        pipeline.join()
+        assert pipeline.poll() == [(0, "訳:A"), (1, "訳:B")]
+        assert pipeline.poll() == []
+
+    def test_failed_lines_are_blank(self):
+        """翻訳できなかった行は "" になり、翻訳できた行は使う"""
+        translator = MagicMock()
+        translator.translate_batch.side_effect = PartialTranslationError("1 failed", ["訳:A", ""], [1])
+        pipeline = TranslationPipeline(translator)
+        pipeline.submit_all(["A", "B"])
+        assert pipeline.join() == ["訳:A", ""]
+
+        translator.translate_batch.side_effect = RuntimeError("down")
+        pipeline = TranslationPipeline(translator)
+        pipeline.submit_all(["A"])
+        assert pipeline.join() == [""]
+
+    def test_without_translator_or_lines(self):
+        pipeline = TranslationPipeline(None)
+        pipeline.submit_all(["A"])
+        assert pipeline.join() == [""]
+        assert TranslationPipeline(SlowTranslator()).join() == []